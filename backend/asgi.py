@@ -0,0 +1,362 @@
+"""ASGI entry point: the same API with non-blocking Firestore and Gemini I/O.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+The routes main.py writes as coroutines (``io_route``) are awaited here on the
+event loop with AsyncIO, which reads and writes through Firestore's async
+client and calls ``generate_content_async``, so one process can hold hundreds
+of analyses in flight. They run inside a Flask request context, so paths,
+auth, hooks (CORS, Server-Timing) and response shapes are the ones
+``main.py`` serves. Every other route runs the regular Flask app on a thread
+pool. Request bodies are spooled to a temporary file, not held in memory,
+and refused with 413 past MAX_REQUEST_BYTES.
+"""
+import asyncio
+import contextvars
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import request
+from werkzeug.exceptions import HTTPException
+
+import main
+import metrics
+from lazy import LazyObject, load
+from storage import AsyncFirestoreRepository, create_async_repository
+
+# Threads for the blocking work left: translator calls, text extraction,
+# cache store reads and routes without an async version
+ASYNC_BLOCKING_WORKERS = int(os.getenv('ASYNC_BLOCKING_WORKERS', '64'))
+# Load libraries and clients during lifespan startup, before the first request
+ASGI_WARM_UP = os.getenv('ASGI_WARM_UP', 'true').lower() == 'true'
+# Request bodies up to this size stay in memory, larger ones go to a temporary file
+BODY_SPOOL_MEMORY_BYTES = 1024 * 1024
+
+blocking_executor = ThreadPoolExecutor(max_workers=ASYNC_BLOCKING_WORKERS, thread_name_prefix='async-blocking')
+
+def create_arepo():
+    # The memory backend shares main.repo (already timed); Firestore gets its own async client
+    async_repo = create_async_repository(main.repo, executor=blocking_executor)
+    if isinstance(async_repo, AsyncFirestoreRepository):
+        return metrics.TimedProxy(async_repo, 'storage')
+    return async_repo
+
+
+arepo = LazyObject(create_arepo, 'async repository')
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call on the thread pool, keeping the request context and stage timings"""
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, lambda: context.run(func, *args, **kwargs))
+
+
+async def generate_analysis_data(document_text):
+    with metrics.timed('prompt_build'):
+        prompt = main.DEJARGONIZER_PROMPT.format(document_text=document_text)
+
+    with metrics.timed('llm_call'):
+        response = await main.llm_guard.call_async(main.model.generate_content_async, prompt)
+
+    with metrics.timed('json_parse'):
+        return main.analysis_data_from_response(response.text)
+
+
+async def run_analysis(document_id, document, preferred_languages=()):
+    """main.run_analysis with the single-prompt Gemini call and persistence awaited"""
+    if document.get('revision_of'):
+        # Revisions fan out per section over the chunk pool and diff against their base
+        return await run_blocking(main.run_analysis, document_id, document, preferred_languages)
+
+    document_text, prompt_stats = await run_blocking(
+        main.compact_for_prompt, await arepo.load_text(document_id, document)
+    )
+    cache_key = main.document_analysis_key(document_text)
+    analysis_data = await run_blocking(main.analysis_cache.get, cache_key)
+
+    if analysis_data is None:
+        if main.is_fanned_out(document_text):
+            # Documents over the prompt budget fan out over the chunk pool
+            analysis_data = await run_blocking(
+                main.analysis_cache.get_or_compute,
+                cache_key,
+                lambda: main.analyze_document_text(document_text),
+                cacheable=lambda data: not data.get('parse_failed')
+            )
+        else:
+            analysis_data = main.with_section_hashes(
+                await generate_analysis_data(document_text), main.revision_units(document_text)
+            )
+            if not analysis_data.get('parse_failed'):
+                await run_blocking(main.analysis_cache.set, cache_key, analysis_data)
+
+    analysis = main.analysis_record(document_id, document, main.with_prompt_stats(analysis_data, prompt_stats))
+    await arepo.save_analysis(document_id, analysis, main.analyzed_document_fields(analysis))
+
+    # Indexes the analysis in SQLite and queues pre-translations
+    return await run_blocking(main.analysis_saved, document_id, document, analysis, preferred_languages)
+
+
+class AsyncIO:
+    """main.BlockingIO for the event loop: async storage and Gemini calls, blocking work on the thread pool"""
+
+    repo = arepo
+
+    async def load_user(self, user_id):
+        user = main.user_cache.get(user_id)
+
+        if user is None:
+            user = await arepo.get_user(user_id)
+            if user is None:
+                return None
+
+            main.user_cache.set(user_id, user)
+
+        return dict(user)
+
+    async def blocking(self, func, *args, **kwargs):
+        return await run_blocking(func, *args, **kwargs)
+
+    async def gather(self, *awaitables):
+        return await asyncio.gather(*awaitables)
+
+    async def analyze(self, document_id, document, preferred_languages=()):
+        # The flight main.analyze_once and the stream route use, so each document has one analysis in flight
+        return await main.analysis_flight.do_async(document_id, run_analysis, document_id, document, preferred_languages)
+
+
+async_io = AsyncIO()
+
+
+def async_view(view):
+    """Serve a route main.py wrote with io_route from the event loop"""
+    coroutine = view.coroutine
+    read_only = getattr(view, 'read_only', False)
+
+    async def serve(**kwargs):
+        current_user, error = await main.authenticate(async_io, read_only)
+        if error:
+            return error
+        return await coroutine(async_io, current_user, **kwargs)
+
+    return serve
+
+
+# Flask endpoint name -> coroutine view serving it
+ASYNC_VIEWS = {
+    endpoint: async_view(view)
+    for endpoint, view in main.app.view_functions.items()
+    if hasattr(view, 'coroutine')
+}
+
+
+def warm_up():
+    seconds = main.warm_up()
+    load(arepo)
+    return seconds
+
+
+def build_environ(scope, body, length):
+    """WSGI environ for an ASGI HTTP scope and its fully read body of ``length`` bytes"""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = name
+        else:
+            key = f'HTTP_{name}'
+        if key in environ and key.startswith('HTTP_'):
+            value = f"{environ[key]},{value}"
+        environ[key] = value
+
+    # What arrived, also for chunked bodies sent without a Content-Length
+    environ['CONTENT_LENGTH'] = str(length)
+    return environ
+
+
+def declared_length(scope):
+    for name, value in scope.get('headers', []):
+        if name.lower() == b'content-length':
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+async def too_large(send):
+    body = json.dumps({"error": f"Request body is larger than {main.MAX_REQUEST_BYTES // (1024 * 1024)} MB"})
+    await send_response(send, 413, [('Content-Type', 'application/json')], body.encode('utf-8'))
+
+
+class AsgiApp:
+    """Serves ASYNC_VIEWS natively and everything else through the Flask WSGI app"""
+
+    def __init__(self, flask_app, views):
+        self.flask_app = flask_app
+        self.views = views
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        if (declared_length(scope) or 0) > main.MAX_REQUEST_BYTES:
+            await too_large(send)
+            return
+
+        with tempfile.SpooledTemporaryFile(max_size=BODY_SPOOL_MEMORY_BYTES) as body:
+            length = 0
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                chunk = message.get('body', b'')
+                length += len(chunk)
+                if length > main.MAX_REQUEST_BYTES:
+                    await too_large(send)
+                    return
+                body.write(chunk)
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+
+            environ = build_environ(scope, body, length)
+            view = self.view_for(environ)
+            if view is None:
+                await self.call_wsgi(environ, send)
+            else:
+                await self.call_view(view, environ, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if ASGI_WARM_UP:
+                    try:
+                        seconds = await run_blocking(warm_up)
+                    except Exception as e:
+                        await send({'type': 'lifespan.startup.failed', 'message': f"Warm-up failed: {str(e)}"})
+                        return
+                    print(f"Warm-up finished in {seconds:.2f}s")
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                blocking_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def view_for(self, environ):
+        # CORS preflight, unknown paths and event streams are answered by Flask
+        # itself; call_wsgi sends a stream chunk by chunk
+        if environ['REQUEST_METHOD'] == 'OPTIONS' or 'text/event-stream' in environ.get('HTTP_ACCEPT', ''):
+            return None
+        try:
+            endpoint, _ = self.flask_app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return None
+        return self.views.get(endpoint)
+
+    async def call_view(self, view, environ, send):
+        app = self.flask_app
+        ctx = app.request_context(environ)
+        error = None
+        ctx.push()
+        try:
+            try:
+                try:
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        rv = await view(**request.view_args)
+                except Exception as e:
+                    rv = app.handle_user_exception(e)
+                response = app.finalize_request(rv)
+            except Exception as e:
+                error = e
+                response = app.handle_exception(e)
+
+            await send_response(send, response.status_code, response.headers.items(), response.get_data())
+        finally:
+            ctx.pop(error)
+
+    async def call_wsgi(self, environ, send):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = headers
+            return lambda data: None
+
+        # Every step runs in the same context: a streamed response keeps the
+        # request context it pushed alive across chunks
+        context = contextvars.Context()
+        loop = asyncio.get_running_loop()
+
+        def step(func, *args):
+            return loop.run_in_executor(blocking_executor, context.run, func, *args)
+
+        iterable = await step(self.flask_app, environ, start_response)
+        iterator = iter(iterable)
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': started['status'],
+                'headers': encode_headers(started['headers'])
+            })
+            # Pull one chunk at a time so streamed responses (SSE) go out as they are produced
+            while True:
+                chunk = await step(next, iterator, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(iterable, 'close'):
+                await step(iterable.close)
+
+
+def encode_headers(headers):
+    return [(name.lower().encode('latin-1'), str(value).encode('latin-1')) for name, value in headers]
+
+
+async def send_response(send, status, headers, body):
+    await send({'type': 'http.response.start', 'status': status, 'headers': encode_headers(headers)})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+app = AsgiApp(main.app, ASYNC_VIEWS)
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("The async serving mode needs an ASGI server: pip install uvicorn")
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv('PORT', '5000')))
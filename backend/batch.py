@@ -0,0 +1,381 @@
+"""Offline batch processing: extract and analyze many documents outside the HTTP API.
+
+Two sources:
+  --dir DIR     every PDF and image under DIR, extracted afresh (after a
+                change to the extraction code, say)
+  --query       documents already in the store, re-analyzed from their stored
+                text (after a change to DEJARGONIZER_PROMPT; bump
+                PROMPT_VERSION so cached analyses are not reused), narrowed
+                with --where field=value
+
+--query --reindex adds the stored text and analyses to this host's search
+index and nothing else: no Gemini calls and no writes to the store.
+
+PDF pages go to the extraction process pool and images to the OCR pool,
+--extract-workers files at a time; at most --llm-concurrency analyses run at
+once, still behind the app's Gemini admission control. Results are appended
+to --output as JSON lines and/or written back to the store (--write-store).
+Every finished item is recorded in a checkpoint file, so an interrupted run
+started again with the same arguments skips what is done and retries what
+failed. Throughput and per-stage timings are printed at the end.
+
+Usage (from backend/):
+    python batch.py --dir "../Test Files" --output results.jsonl
+    python batch.py --dir scans/ --write-store --owner <user_id>
+    python batch.py --query --where analyzed=false --write-store [--limit 1000]
+    python batch.py --query --reindex
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import main
+import metrics
+from llm_limits import LLM_MAX_IN_FLIGHT
+
+SCAN_PAGE_SIZE = 500
+PROGRESS_EVERY = 10
+
+
+def parse_where(values):
+    """``field=value`` arguments as (field, value) filters; values are read as JSON when they parse"""
+    filters = []
+    for value in values:
+        field, separator, raw = value.partition('=')
+        if not separator or not field:
+            raise ValueError(f"--where expects field=value, got {value!r}")
+        try:
+            filters.append((field, json.loads(raw)))
+        except json.JSONDecodeError:
+            filters.append((field, raw))
+    return filters
+
+
+def directory_items(directory):
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(name for name in dirs if not name.startswith('.'))
+        for filename in sorted(files):
+            if filename.startswith('.') or not filename.lower().endswith(main.UPLOAD_EXTENSIONS):
+                continue
+            path = os.path.join(root, filename)
+            yield {'key': os.path.relpath(path, directory), 'path': path, 'filename': filename}
+
+
+def store_items(filters, limit=None):
+    """Stored documents matching ``filters``, fetched a page at a time"""
+    start_after = None
+    count = 0
+    while True:
+        page = main.repo.scan_documents(filters, SCAN_PAGE_SIZE, start_after=start_after)
+        for document in page:
+            yield {'key': document['id'], 'document_id': document['id'], 'document': document,
+                   'filename': document.get('filename')}
+            count += 1
+            if limit and count >= limit:
+                return
+        if len(page) < SCAN_PAGE_SIZE:
+            return
+        start_after = page[-1]['id']
+
+
+class Checkpoint:
+    """Append-only JSONL record of finished items; the last status recorded for a key wins"""
+
+    def __init__(self, path, restart=False):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path) and not restart:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short when the previous run was killed
+                        continue
+                    if entry['status'] == 'done':
+                        self.done.add(entry['key'])
+                    else:
+                        self.done.discard(entry['key'])
+        self._file = open(path, 'w' if restart else 'a')
+
+    def record(self, key, status):
+        self._file.write(json.dumps({'key': key, 'status': status}) + '\n')
+        self._file.flush()
+        if status == 'done':
+            self.done.add(key)
+
+    def close(self):
+        self._file.close()
+
+
+def run_stage(item, name, func, *args):
+    """Run one pipeline stage of ``item``, adding its time and that of the app stages it went through"""
+    timings = item.setdefault('timings', {})
+    token = metrics.start_request()
+    started = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+        for stage, seconds in metrics.finish_request(token):
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+class BatchRunner:
+
+    def __init__(self, extract_workers, llm_concurrency, output=None, checkpoint=None,
+                 write_store=False, owner=None, extract_only=False, include_text=False, reindex=False):
+        self.extract_pool = ThreadPoolExecutor(max_workers=extract_workers, thread_name_prefix='batch-extract')
+        self.analysis_pool = ThreadPoolExecutor(max_workers=llm_concurrency, thread_name_prefix='batch-analyze')
+        # Items read ahead of the analysis pool; bounds memory on large sources
+        self.max_in_flight = extract_workers + 2 * llm_concurrency
+        self.output = output
+        self.checkpoint = checkpoint
+        self.write_store = write_store
+        self.owner = owner
+        self.extract_only = extract_only
+        self.include_text = include_text or extract_only
+        self.reindex = reindex
+        self.counts = {'done': 0, 'failed': 0, 'skipped': 0}
+        self.stage_seconds = {}
+
+    def load(self, item):
+        """First stage: the item's text, extracted from its file or loaded from the store"""
+        if 'path' in item:
+            text, item['source'] = run_stage(item, 'extract', main.extract_file_text, item['path'], item['filename'])
+            if not text or len(text.strip()) < 10:
+                raise ValueError(main.EMPTY_EXTRACTION_ERRORS[item['source']])
+        else:
+            text = run_stage(item, 'load_text', main.load_document_text, item['document_id'], item['document'])
+            item['source'] = item['document'].get('source')
+        item['text'] = text
+
+    def analyze(self, item):
+        """Second stage: analysis, then the write back to the store; or, with reindex, only the search index"""
+        if self.reindex:
+            run_stage(item, 'index', self.index, item)
+            return
+        if not self.extract_only:
+            item['analysis'] = run_stage(item, 'analyze', main.compute_analysis, item['text'])
+        if self.write_store:
+            run_stage(item, 'save', self.save, item)
+
+    def save(self, item):
+        if 'document_id' not in item:
+            document = main.new_document({'id': self.owner}, item['filename'], item['source'], {})
+            item['document_id'] = main.repo.create_document(document, item['text'])
+            main.invalidate_document_list(self.owner)
+            item['document'] = document
+        main.index_document(item['document_id'], item['document'], item['text'])
+
+        if 'analysis' in item:
+            main.save_analysis(item['document_id'], item['document'], item['analysis'])
+
+    def index(self, item):
+        """Index the stored document and its stored analysis; failures fail the item so a rerun retries it"""
+        document_id, document = item['document_id'], item['document']
+        main.search_index.index_document(document_id, document, item['text'])
+        analysis = main.repo.get_analysis(document_id) if document.get('analyzed') else None
+        if analysis:
+            main.search_index.index_analysis(document_id, document, analysis)
+
+    def record(self, item):
+        record = {
+            'key': item['key'],
+            'status': 'failed' if 'error' in item else 'done',
+            'filename': item.get('filename'),
+            'document_id': item.get('document_id'),
+            'source': item.get('source'),
+            'text_chars': len(item['text']) if 'text' in item else None,
+            'timings': item.get('timings', {}),
+        }
+        if 'error' in item:
+            record['error'] = item['error']
+        if 'analysis' in item:
+            analysis = item['analysis']
+            record['analysis'] = {field: analysis.get(field) for field in main.ANALYSIS_FIELDS}
+            for field in ('parse_failed', 'prompt_compaction'):
+                if field in analysis:
+                    record['analysis'][field] = analysis[field]
+        if self.include_text and 'text' in item:
+            record['text'] = item['text']
+        return record
+
+    def finish(self, item):
+        record = self.record(item)
+        if self.output:
+            self.output.write(json.dumps(record, default=str) + '\n')
+            self.output.flush()
+        self.checkpoint.record(item['key'], record['status'])
+
+        self.counts[record['status']] += 1
+        for stage, seconds in record['timings'].items():
+            self.stage_seconds.setdefault(stage, []).append(seconds)
+
+        finished = self.counts['done'] + self.counts['failed']
+        if record['status'] == 'failed':
+            print(f"[{finished}] {item['key']}: failed: {item['error']}")
+        elif finished % PROGRESS_EVERY == 0:
+            print(f"[{finished}] {self.counts['done']} done, {self.counts['failed']} failed")
+
+    def run(self, items):
+        items = iter(items)
+        exhausted = False
+        pending = {}
+
+        try:
+            while True:
+                while not exhausted and len(pending) < self.max_in_flight:
+                    item = next(items, None)
+                    if item is None:
+                        exhausted = True
+                    elif item['key'] in self.checkpoint.done:
+                        self.counts['skipped'] += 1
+                    else:
+                        pending[self.extract_pool.submit(self.load, item)] = (item, 'load')
+
+                if not pending:
+                    return
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    item, stage = pending.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        item['error'] = str(e)
+                    else:
+                        if stage == 'load' and (self.write_store or self.reindex or not self.extract_only):
+                            pending[self.analysis_pool.submit(self.analyze, item)] = (item, 'analyze')
+                            continue
+                    self.finish(item)
+        finally:
+            # On Ctrl-C, items still in flight are not checkpointed and run again next time
+            self.extract_pool.shutdown(wait=False, cancel_futures=True)
+            self.analysis_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def stage_summary(stage_seconds):
+    summary = {}
+    for stage, values in stage_seconds.items():
+        values = sorted(values)
+        summary[stage] = {
+            'count': len(values),
+            'total_s': sum(values),
+            'mean_ms': statistics.mean(values) * 1000,
+            'p50_ms': values[len(values) // 2] * 1000,
+            'p95_ms': values[min(len(values) - 1, int(len(values) * 0.95))] * 1000,
+        }
+    return summary
+
+
+def print_report(report):
+    counts = report['counts']
+    print(
+        f"\n{counts['done']} done, {counts['failed']} failed, {counts['skipped']} skipped (already done) "
+        f"in {report['elapsed_s']:.1f} s: {report['items_per_second']:.2f} items/s"
+    )
+
+    print(f"\n{'stage':22} {'count':>6} {'total s':>9} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    stages = sorted(report['stages'].items(), key=lambda entry: entry[1]['total_s'], reverse=True)
+    for stage, stats in stages:
+        print(
+            f"{stage:22} {stats['count']:>6} {stats['total_s']:>9.2f} {stats['mean_ms']:>9.1f} "
+            f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f}"
+        )
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0], formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='\n'.join(__doc__.splitlines()[2:])
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--dir', help='Directory of PDFs and images to process')
+    source.add_argument('--query', action='store_true', help='Process documents already in the store')
+    parser.add_argument('--where', action='append', default=[], metavar='FIELD=VALUE',
+                        help='With --query, only documents where FIELD equals VALUE (repeatable)')
+    parser.add_argument('--limit', type=int, default=None, help='With --query, stop after this many documents')
+    parser.add_argument('--output', help='Append results to this JSONL file')
+    parser.add_argument('--write-store', action='store_true',
+                        help='Save documents and analyses to the store (and the search index)')
+    parser.add_argument('--owner', help='With --dir --write-store, the user id the new documents belong to')
+    parser.add_argument('--extract-only', action='store_true', help='Skip analysis; results include the text')
+    parser.add_argument('--reindex', action='store_true',
+                        help='With --query, only add the stored text and analyses to the search index')
+    parser.add_argument('--include-text', action='store_true', help='Include the extracted text in the results')
+    parser.add_argument('--extract-workers', type=int, default=os.cpu_count() or 2,
+                        help='Files extracted or loaded at a time')
+    parser.add_argument('--llm-concurrency', type=int, default=LLM_MAX_IN_FLIGHT,
+                        help='Analyses running at a time')
+    parser.add_argument('--checkpoint', help='Progress file (defaults to the output file name + .checkpoint)')
+    parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint and start over')
+    parser.add_argument('--report', help='Also write throughput and stage timings to this JSON file')
+    args = parser.parse_args(argv)
+
+    if args.reindex and (args.dir or args.write_store or args.extract_only):
+        parser.error('--reindex only applies to --query, without --write-store or --extract-only')
+    if not args.output and not args.write_store and not args.reindex:
+        parser.error('nothing to write: pass --output and/or --write-store')
+    if args.dir and args.write_store and not args.owner:
+        parser.error('--dir with --write-store needs --owner')
+    if args.dir and (args.where or args.limit):
+        parser.error('--where and --limit only apply to --query')
+    try:
+        filters = parse_where(args.where)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.dir:
+        items = directory_items(args.dir)
+    else:
+        items = store_items(filters, args.limit)
+
+    checkpoint_path = args.checkpoint or f"{args.output or 'batch'}.checkpoint"
+    checkpoint = Checkpoint(checkpoint_path, restart=args.restart)
+    if checkpoint.done:
+        print(f"Resuming from {checkpoint_path}: {len(checkpoint.done)} items already done")
+
+    output = open(args.output, 'w' if args.restart else 'a') if args.output else None
+    runner = BatchRunner(
+        args.extract_workers, args.llm_concurrency, output=output, checkpoint=checkpoint,
+        write_store=args.write_store, owner=args.owner, extract_only=args.extract_only,
+        include_text=args.include_text, reindex=args.reindex
+    )
+
+    started = time.perf_counter()
+    interrupted = False
+    try:
+        runner.run(items)
+    except KeyboardInterrupt:
+        interrupted = True
+        print("\nInterrupted; run the same command again to resume")
+    finally:
+        checkpoint.close()
+        if output:
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    processed = runner.counts['done'] + runner.counts['failed']
+    report = {
+        'source': args.dir or {'query': dict(filters), 'limit': args.limit},
+        'counts': runner.counts,
+        'elapsed_s': elapsed,
+        'items_per_second': processed / elapsed if elapsed else 0.0,
+        'settings': {'extract_workers': args.extract_workers, 'llm_concurrency': args.llm_concurrency},
+        'stages': stage_summary(runner.stage_seconds),
+    }
+    print_report(report)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    return 130 if interrupted else (1 if runner.counts['failed'] else 0)
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
@@ -0,0 +1,71 @@
+"""Token reduction of the prompt compaction stage on each PDF in Test Files.
+
+Extracts each PDF the way uploads are extracted, compacts the text as the
+analysis path does before building the prompt and reports the estimated
+tokens before and after, what was removed and how long compaction took.
+
+Usage (from backend/):
+    python benchmarks/bench_compaction.py [--dir "../Test Files"] [--repeat 5]
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compaction import compact_text
+from extraction import count_pdf_pages, extract_pdf_text
+
+DEFAULT_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'Test Files')
+
+
+def time_compaction(text, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = compact_text(text)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dir', default=DEFAULT_DIR)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.dir, '*.pdf')))
+    if not paths:
+        print(f"No PDFs found in {args.dir}")
+        return
+
+    print(
+        f"{'document':45} {'pages':>5} {'tokens':>8} {'compact':>8} {'saved':>7} "
+        f"{'headers':>7} {'pagenos':>7} {'hyphens':>7} {'ms':>7}"
+    )
+    total_before = total_after = 0
+    for path in paths:
+        text = extract_pdf_text(path, parallel=False).strip()
+        seconds, (_, stats) = time_compaction(text, args.repeat)
+        total_before += stats['tokens_before']
+        total_after += stats['tokens_after']
+
+        saved = 1 - stats['tokens_after'] / stats['tokens_before'] if stats['tokens_before'] else 0
+        name = os.path.basename(path)[:45]
+        print(
+            f"{name:45} {count_pdf_pages(path):>5} {stats['tokens_before']:>8} {stats['tokens_after']:>8} "
+            f"{saved:>6.1%} {stats['repeated_lines_removed']:>7} {stats['page_numbers_removed']:>7} "
+            f"{stats['hyphens_joined']:>7} {seconds * 1000:>7.2f}"
+        )
+
+    if total_before:
+        print(
+            f"{'total':45} {'':>5} {total_before:>8} {total_after:>8} {1 - total_after / total_before:>6.1%}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Compare the page-level PDF extraction engine with the original serial extractor.
+
+Usage (from backend/):
+    python benchmarks/bench_extraction.py [--repeat 3] [--dir "../Test Files"]
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdfplumber
+import PyPDF2
+
+from extraction import count_pdf_pages, extract_pdf_text
+
+DEFAULT_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'Test Files')
+
+
+def legacy_extract_text_from_pdf(pdf_file):
+    """The serial extractor that main.py used before the page-level engine"""
+    text = ""
+    pdf_file.seek(0)
+    with pdfplumber.open(pdf_file) as pdf:
+        for page in pdf.pages:
+            page_text = page.extract_text()
+            if page_text:
+                text += page_text + "\n\n"
+
+    if len(text.strip()) < 100:
+        pdf_file.seek(0)
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        text = ""
+        for page in pdf_reader.pages:
+            page_text = page.extract_text()
+            if page_text:
+                text += page_text + "\n\n"
+
+    return text.strip()
+
+
+def time_call(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dir', default=DEFAULT_DIR)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.dir, '*.pdf')))
+    if not paths:
+        print(f"No PDFs found in {args.dir}")
+        return
+
+    # Start the pool up front so its fork cost is not charged to the first file
+    extract_pdf_text(paths[0], parallel=True)
+
+    print(f"{'document':45} {'pages':>5} {'legacy s':>9} {'serial s':>9} {'pool s':>9} {'speedup':>8} {'chars':>8}")
+    for path in paths:
+        def legacy():
+            with open(path, 'rb') as f:
+                return legacy_extract_text_from_pdf(f)
+
+        legacy_time, legacy_text = time_call(legacy, args.repeat)
+        serial_time, _ = time_call(lambda: extract_pdf_text(path, parallel=False), args.repeat)
+        pool_time, pool_text = time_call(lambda: extract_pdf_text(path, parallel=True), args.repeat)
+
+        name = os.path.basename(path)[:45]
+        print(
+            f"{name:45} {count_pdf_pages(path):>5} {legacy_time:>9.3f} {serial_time:>9.3f} "
+            f"{pool_time:>9.3f} {legacy_time / pool_time:>7.2f}x {len(pool_text) - len(legacy_text):>+8}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,370 @@
+"""End-to-end load and latency benchmark of the API with local fakes.
+
+Starts the Flask app on a local port with the in-memory storage backend, the
+fake translator and a fake Gemini model, then drives a weighted mix of
+endpoints at each concurrency level and reports throughput and p50/p95/p99
+latency per endpoint. Results are written as JSON; pass an earlier result as
+--baseline to print the change per endpoint.
+
+Usage (from backend/):
+    python benchmarks/bench_load.py [--concurrency 1,4,16] [--requests 200]
+        [--mix upload=1,analyze=1,documents=4,document=2,analysis=2,translate_analysis=1]
+        [--llm-latency 0.5] [--llm-payload-items 5] [--translator-latency 0.05]
+        [--storage-latency 0.01] [--output results.json] [--baseline old.json]
+"""
+import argparse
+import glob
+import importlib
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakes import FakeGeminiModel
+
+DEFAULT_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'Test Files')
+DEFAULT_MIX = 'upload=1,analyze=1,documents=4,document=2,analysis=2,translate_analysis=1'
+ENDPOINTS = ('upload', 'analyze', 'documents', 'document', 'analysis', 'translate_analysis')
+TRANSLATE_LANGUAGES = ('es', 'fr', 'de', 'hi', 'ta')
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint in --mix: {name} (expected one of {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def encode_multipart(fields, file_field, filename, data):
+    boundary = uuid.uuid4().hex
+    lines = []
+    for name, value in fields.items():
+        lines.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8'))
+    lines.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+        f'Content-Type: application/pdf\r\n\r\n'.encode('utf-8')
+    )
+    lines.append(data)
+    lines.append(f'\r\n--{boundary}--\r\n'.encode('utf-8'))
+    return b''.join(lines), f'multipart/form-data; boundary={boundary}'
+
+
+class Client:
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def request(self, method, path, token=None, json_body=None, body=None, content_type=None):
+        headers = {}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        if json_body is not None:
+            body = json.dumps(json_body).encode('utf-8')
+            content_type = 'application/json'
+        if content_type:
+            headers['Content-Type'] = content_type
+
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=300) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+class LoadRun:
+    """Seeds users and documents, then runs one list of operations at a concurrency level"""
+
+    def __init__(self, app_module, client, pdfs, texts, users):
+        self.app = app_module
+        self.client = client
+        self.pdfs = pdfs
+        self.texts = texts
+        self.users = users
+        self.analyzed = {user['id']: [] for user in users}
+        self.pending = {user['id']: [] for user in users}
+        self.pending_lock = threading.Lock()
+        self.analysis_payload = FakeGeminiModel.analysis(5)
+
+    def seed_documents(self, user, count, analyzed):
+        """Create documents straight in the repository; a unique line per copy keeps analysis caches cold"""
+        created = []
+        for _ in range(count):
+            name, text = self.texts[len(created) % len(self.texts)]
+            document = {
+                "title": name,
+                "type": "general",
+                "uploaded_at": self.app.repo.server_timestamp,
+                "analyzed": False,
+                "source": "pdf",
+                "filename": name,
+                "user_id": user['id']
+            }
+            created.append(self.app.repo.create_document(document, f"{text}\n\nBenchmark copy {uuid.uuid4().hex}"))
+
+        if analyzed:
+            for document_id in created:
+                self.app.save_analysis(
+                    document_id, self.app.repo.get_document(document_id), self.analysis_payload
+                )
+            self.analyzed[user['id']].extend(created)
+        else:
+            self.pending[user['id']].extend(created)
+
+    def run_operation(self, index, endpoint):
+        user = self.users[index % len(self.users)]
+        token = user['token']
+
+        if endpoint == 'upload':
+            name, data = self.pdfs[index % len(self.pdfs)]
+            body, content_type = encode_multipart({'title': name}, 'file', name, data)
+            return self.client.request('POST', '/api/upload', token, body=body, content_type=content_type)
+
+        if endpoint == 'analyze':
+            with self.pending_lock:
+                document_id = self.pending[user['id']].pop()
+            return self.client.request('POST', f'/api/analyze/{document_id}', token)
+
+        if endpoint == 'documents':
+            return self.client.request('GET', '/api/documents', token)
+
+        documents = self.analyzed[user['id']]
+        document_id = documents[index % len(documents)]
+
+        if endpoint == 'document':
+            return self.client.request('GET', f'/api/documents/{document_id}', token)
+
+        if endpoint == 'analysis':
+            return self.client.request('GET', f'/api/analysis/{document_id}', token)
+
+        lang = TRANSLATE_LANGUAGES[index % len(TRANSLATE_LANGUAGES)]
+        return self.client.request('POST', '/api/translate-analysis', token, json_body={
+            'analysis': self.analysis_payload,
+            'target_lang': lang
+        })
+
+    def run(self, operations, concurrency):
+        samples = {endpoint: [] for endpoint in set(operations)}
+        errors = {endpoint: 0 for endpoint in samples}
+        lock = threading.Lock()
+
+        def timed(index, endpoint):
+            start = time.perf_counter()
+            try:
+                status, _ = self.run_operation(index, endpoint)
+                failed = status >= 400
+            except Exception as e:
+                print(f"{endpoint} failed: {e}")
+                failed = True
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples[endpoint].append(elapsed)
+                if failed:
+                    errors[endpoint] += 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(lambda item: timed(*item), enumerate(operations)))
+        duration = time.perf_counter() - start
+
+        endpoints = {}
+        for endpoint, timings in sorted(samples.items()):
+            endpoints[endpoint] = {
+                'requests': len(timings),
+                'errors': errors[endpoint],
+                'throughput_rps': round(len(timings) / duration, 3),
+                'mean_ms': round(statistics.mean(timings) * 1000, 2),
+                'p50_ms': round(percentile(timings, 0.50) * 1000, 2),
+                'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+                'p99_ms': round(percentile(timings, 0.99) * 1000, 2),
+                'max_ms': round(max(timings) * 1000, 2),
+            }
+
+        return {
+            'concurrency': concurrency,
+            'requests': len(operations),
+            'duration_s': round(duration, 3),
+            'throughput_rps': round(len(operations) / duration, 3),
+            'endpoints': endpoints
+        }
+
+
+def plan_operations(mix, total, seed):
+    rng = random.Random(seed)
+    names = list(mix)
+    return rng.choices(names, weights=[mix[name] for name in names], k=total)
+
+
+def start_server(app):
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def print_level(level, baseline_level=None):
+    print(f"\nconcurrency {level['concurrency']}: {level['requests']} requests in "
+          f"{level['duration_s']:.2f}s ({level['throughput_rps']:.1f} req/s)")
+    print(f"{'endpoint':20} {'count':>6} {'errors':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+          + (f" {'p95 vs base':>12}" if baseline_level else ''))
+    for endpoint, stats in level['endpoints'].items():
+        line = (f"{endpoint:20} {stats['requests']:>6} {stats['errors']:>6} {stats['throughput_rps']:>8.1f} "
+                f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+        if baseline_level:
+            base = baseline_level['endpoints'].get(endpoint)
+            if base and base['p95_ms']:
+                line += f" {(stats['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100:>+11.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dir', default=DEFAULT_DIR)
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per concurrency level')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='endpoint=weight pairs')
+    parser.add_argument('--users', type=int, default=4)
+    parser.add_argument('--seed-documents', type=int, default=20, help='Analyzed documents per user for read endpoints')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='Seconds per fake Gemini call')
+    parser.add_argument('--llm-payload-items', type=int, default=5, help='Entries per list in the fake analysis')
+    parser.add_argument('--translator-latency', type=float, default=0.05, help='Seconds per fake translator batch')
+    parser.add_argument('--storage-latency', type=float, default=0.0, help='Seconds per in-memory storage call')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=None, help='Where to write the JSON results')
+    parser.add_argument('--baseline', default=None, help='Earlier JSON results to compare against')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    levels = [int(level) for level in args.concurrency.split(',') if level]
+
+    paths = sorted(glob.glob(os.path.join(args.dir, '*.pdf')))
+    if not paths:
+        print(f"No PDFs found in {args.dir}")
+        return
+
+    # The app reads these at import time
+    os.environ['STORAGE_BACKEND'] = 'memory'
+    os.environ['MEMORY_STORAGE_LATENCY'] = str(args.storage_latency)
+    os.environ['TRANSLATOR_BACKEND'] = 'fake'
+    os.environ['FAKE_TRANSLATOR_LATENCY'] = str(args.translator_latency)
+    os.environ['ANALYSIS_MODE'] = 'sync'
+    os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+    # A handful of simulated users issue every request; don't throttle them
+    os.environ.setdefault('LLM_USER_RATE_PER_MINUTE', '0')
+
+    app_module = importlib.import_module('main')
+    app_module.model = FakeGeminiModel(args.llm_latency, args.llm_payload_items)
+
+    from extraction import extract_pdf_text
+
+    pdfs = []
+    texts = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            pdfs.append((os.path.basename(path), f.read()))
+        texts.append((os.path.basename(path), extract_pdf_text(path)))
+
+    server, base_url = start_server(app_module.app)
+    client = Client(base_url)
+
+    users = []
+    for index in range(args.users):
+        status, body = client.request('POST', '/api/auth/register', json_body={
+            'email': f'bench{index}-{uuid.uuid4().hex[:8]}@example.com',
+            'password': 'benchmark',
+            'name': f'Benchmark {index}'
+        })
+        if status != 201:
+            raise SystemExit(f"Could not register benchmark user: {status} {body[:200]}")
+        data = json.loads(body)
+        users.append({'id': data['user']['id'], 'token': data['token']})
+
+    run = LoadRun(app_module, client, pdfs, texts, users)
+    for user in users:
+        run.seed_documents(user, args.seed_documents, analyzed=True)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {level['concurrency']: level for level in json.load(f)['levels']}
+
+    results = []
+    for offset, concurrency in enumerate(levels):
+        operations = plan_operations(mix, args.requests, args.seed + offset)
+        analyze_count = operations.count('analyze')
+        for index, user in enumerate(users):
+            # Operation i runs as user i % len(users)
+            needed = sum(1 for i, op in enumerate(operations) if op == 'analyze' and i % len(users) == index)
+            run.seed_documents(user, needed, analyzed=False)
+        print(f"Running {len(operations)} requests at concurrency {concurrency} ({analyze_count} analyses)...")
+
+        level = run.run(operations, concurrency)
+        results.append(level)
+        print_level(level, baseline.get(concurrency))
+
+    server.shutdown()
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'settings': {
+            'mix': mix,
+            'requests_per_level': args.requests,
+            'users': args.users,
+            'seed_documents': args.seed_documents,
+            'llm_latency_s': args.llm_latency,
+            'llm_payload_items': args.llm_payload_items,
+            'translator_latency_s': args.translator_latency,
+            'storage_latency_s': args.storage_latency,
+            'files': [name for name, _ in pdfs],
+            'cpu_count': os.cpu_count()
+        },
+        'levels': results
+    }
+
+    output = args.output or f"bench_load_{report['commit'] or 'local'}_{int(time.time())}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
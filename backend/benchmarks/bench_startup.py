@@ -0,0 +1,209 @@
+"""Cold-start benchmark: import time, warm-up and first-request latency of the API.
+
+Each run starts a fresh interpreter with the in-memory storage backend, the
+fake translator and a fake Gemini model (built behind the real client
+factory, so the first analysis still pays for loading google.generativeai),
+imports the app and times the first and second call to each of a PDF upload,
+its analysis and the document list. Every run is done twice: once loading
+everything lazily on first use, once calling main.warm_up() first as a
+pre-fork worker would. --importtime lists the slowest modules imported
+directly by main.
+
+Usage (from backend/):
+    python benchmarks/bench_startup.py [--runs 5] [--pdf "../Test Files/x.pdf"]
+        [--importtime] [--output results.json]
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DIR = os.path.join(BACKEND_DIR, '..', 'Test Files')
+MODES = ('lazy', 'warm_up')
+
+# Runs in a fresh interpreter; prints one JSON line with its timings
+CHILD = r'''
+import json, sys, time
+started = time.perf_counter()
+options = json.loads(sys.argv[1])
+sys.path[:0] = [options['backend_dir'], options['benchmarks_dir']]
+
+import main
+timings = {'import_s': time.perf_counter() - started}
+
+from fakes import FakeGeminiModel
+from lazy import LazyObject
+
+if options['warm_up']:
+    step_started = time.perf_counter()
+    main.warm_up()
+    timings['warm_up_s'] = time.perf_counter() - step_started
+
+fake = FakeGeminiModel(latency=0)
+if isinstance(main.model, LazyObject) and not main.model.loaded:
+    main.model = LazyObject(lambda: (main.create_model(), fake)[1], 'gemini')
+else:
+    main.model = fake
+
+client = main.app.test_client()
+
+def timed(name, method, path, **kwargs):
+    step_started = time.perf_counter()
+    response = client.open(path, method=method, **kwargs)
+    timings[name] = time.perf_counter() - step_started
+    if response.status_code >= 400:
+        raise SystemExit(f"{name}: {response.status_code} {response.get_data(as_text=True)[:200]}")
+    return response
+
+response = timed('register_s', 'POST', '/api/auth/register', json={'email': 'startup@example.com', 'password': 'benchmark'})
+headers = {'Authorization': 'Bearer ' + response.get_json()['token']}
+
+for attempt in ('first', 'second'):
+    with open(options['pdf'], 'rb') as f:
+        response = timed(f'upload_{attempt}_s', 'POST', '/api/upload', headers=headers,
+                         data={'file': (f, 'document.pdf')}, content_type='multipart/form-data')
+    document_id = response.get_json()['document_id']
+    timed(f'analyze_{attempt}_s', 'POST', f'/api/analyze/{document_id}', headers=headers)
+    timed(f'documents_{attempt}_s', 'GET', '/api/documents', headers=headers)
+
+timings['total_s'] = time.perf_counter() - started
+print(json.dumps(timings))
+'''
+
+
+def child_env():
+    env = dict(os.environ)
+    env.update({
+        'STORAGE_BACKEND': 'memory',
+        'TRANSLATOR_BACKEND': 'fake',
+        'ANALYSIS_MODE': 'sync',
+        'SERVER_TIMING': 'false',
+        'LLM_USER_RATE_PER_MINUTE': '0',
+        'PYTHONDONTWRITEBYTECODE': '1',
+    })
+    env.setdefault('GEMINI_API_KEY', 'benchmark')
+    return env
+
+
+def run_child(pdf, warm_up):
+    options = {
+        'backend_dir': BACKEND_DIR,
+        'benchmarks_dir': os.path.join(BACKEND_DIR, 'benchmarks'),
+        'pdf': os.path.abspath(pdf),
+        'warm_up': warm_up,
+    }
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD, json.dumps(options)],
+        cwd=BACKEND_DIR, env=child_env(), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Benchmark run failed:\n{result.stderr[-2000:]}{result.stdout[-500:]}")
+    # The app logs to stdout too; the timings are the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(limit=10):
+    """Modules imported directly by main, by cumulative import time, from -X importtime"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=BACKEND_DIR, env=child_env(), capture_output=True, text=True
+    )
+    # Each module is reported after the imports it triggered, indented two
+    # spaces per level, so main's direct imports are the level-one lines
+    # just before its own line
+    pending = []
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        if depth == 1:
+            pending.append({'module': name.strip(), 'cumulative_ms': int(cumulative) / 1000})
+        elif depth == 0:
+            if name.strip() == 'main':
+                imports = pending
+            pending = []
+    imports.sort(key=lambda item: item['cumulative_ms'], reverse=True)
+    return imports[:limit]
+
+
+def summarize(runs):
+    summary = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs]
+        summary[key] = {
+            'median_ms': statistics.median(values) * 1000,
+            'min_ms': min(values) * 1000,
+            'max_ms': max(values) * 1000,
+        }
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def print_summary(summaries):
+    keys = list(dict.fromkeys(key for summary in summaries.values() for key in summary))
+    print(f"\n{'median ms':22}" + ''.join(f"{mode:>12}" for mode in summaries))
+    for key in keys:
+        cells = ''.join(
+            f"{summaries[mode][key]['median_ms']:>12.1f}" if key in summaries[mode] else f"{'-':>12}"
+            for mode in summaries
+        )
+        print(f"{key[:-2]:22}{cells}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per mode')
+    parser.add_argument('--pdf', default=None, help='PDF to upload (defaults to the smallest one in Test Files)')
+    parser.add_argument('--importtime', action='store_true', help='Also list the slowest imports of main')
+    parser.add_argument('--output', default=None, help='Where to write the JSON results')
+    args = parser.parse_args()
+
+    pdf = args.pdf or min(glob.glob(os.path.join(DEFAULT_DIR, '*.pdf')), key=os.path.getsize, default=None)
+    if not pdf:
+        raise SystemExit(f"No PDF given and none found in {DEFAULT_DIR}")
+
+    summaries = {}
+    for mode in MODES:
+        print(f"Running {args.runs} cold starts ({mode})...")
+        summaries[mode] = summarize([run_child(pdf, warm_up=(mode == 'warm_up')) for _ in range(args.runs)])
+    print_summary(summaries)
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'settings': {'runs': args.runs, 'pdf': os.path.basename(pdf), 'cpu_count': os.cpu_count()},
+        'modes': summaries,
+    }
+
+    if args.importtime:
+        report['slowest_imports'] = slowest_imports()
+        print(f"\n{'slowest imports of main':40} {'cumulative ms':>14}")
+        for item in report['slowest_imports']:
+            print(f"{item['module']:40} {item['cumulative_ms']:>14.1f}")
+
+    output = args.output or f"bench_startup_{report['commit'] or 'local'}_{int(time.time())}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
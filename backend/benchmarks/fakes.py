@@ -0,0 +1,75 @@
+"""Deterministic stand-ins for external services, used by the benchmarks"""
+import asyncio
+import json
+import time
+
+
+class FakeResponse:
+
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """Answers every prompt with the same well-formed analysis after a fixed delay.
+
+    ``payload_items`` sets how many entries each analysis list gets, so the
+    size of the answer (and of everything derived from it) can be scaled.
+    Streaming answers are split into ``stream_chunk_chars`` pieces with the
+    delay spread evenly across them.
+    """
+
+    def __init__(self, latency=0.5, payload_items=5, stream_chunk_chars=64):
+        self.latency = latency
+        self.payload_items = payload_items
+        self.stream_chunk_chars = stream_chunk_chars
+        self.calls = 0
+        self.answer = "```json\n" + json.dumps(self.analysis(payload_items), indent=2) + "\n```"
+
+    @staticmethod
+    def analysis(items):
+        return {
+            "plain_summary": " ".join(
+                f"Sentence {index} of the plain language summary explains one part of the document."
+                for index in range(items)
+            ),
+            "key_terms": [
+                {"term": f"Term {index}", "explanation": f"Plain language explanation of term {index}."}
+                for index in range(items)
+            ],
+            "important_clauses": [
+                {"clause": f"Clause {index} text", "explanation": f"Why clause {index} matters.", "section": str(index)}
+                for index in range(items)
+            ],
+            "risks_and_concerns": [
+                {"risk": f"Risk {index}", "explanation": f"Why risk {index} may be risky based on the wording."}
+                for index in range(items)
+            ],
+            "unclear_items": [f"Unclear item {index}" for index in range(items)]
+        }
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+
+        if not stream:
+            if self.latency:
+                time.sleep(self.latency)
+            return FakeResponse(self.answer)
+
+        return self._stream()
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return FakeResponse(self.answer)
+
+    def _stream(self):
+        pieces = [
+            self.answer[start:start + self.stream_chunk_chars]
+            for start in range(0, len(self.answer), self.stream_chunk_chars)
+        ]
+        for piece in pieces:
+            if self.latency:
+                time.sleep(self.latency / len(pieces))
+            yield FakeResponse(piece)
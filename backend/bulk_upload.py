@@ -0,0 +1,168 @@
+import os
+import posixpath
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+BULK_UPLOAD_MAX_FILES = int(os.getenv('BULK_UPLOAD_MAX_FILES', '100'))
+# Checked against the size a ZIP member declares and again while copying it,
+# so a crafted archive cannot expand past it
+BULK_UPLOAD_MAX_FILE_BYTES = int(os.getenv('BULK_UPLOAD_MAX_FILE_BYTES', str(50 * 1024 * 1024)))
+BULK_EXTRACT_WORKERS = int(os.getenv('BULK_EXTRACT_WORKERS', str((os.cpu_count() or 2) * 2)))
+
+COPY_BLOCK_BYTES = 1024 * 1024
+
+_executor = ThreadPoolExecutor(max_workers=BULK_EXTRACT_WORKERS, thread_name_prefix='bulk-extract')
+
+
+class BulkUploadError(Exception):
+    pass
+
+
+class FileTooLargeError(Exception):
+    pass
+
+
+def _copy_limited(source, destination, limit=BULK_UPLOAD_MAX_FILE_BYTES):
+    copied = 0
+    while True:
+        block = source.read(COPY_BLOCK_BYTES)
+        if not block:
+            return copied
+        copied += len(block)
+        if copied > limit:
+            raise FileTooLargeError(f"File is larger than {limit // (1024 * 1024)} MB")
+        destination.write(block)
+
+
+def _is_archive(filename):
+    return filename.lower().endswith('.zip')
+
+
+def _skip_member(member):
+    name = member.filename
+    return (
+        member.is_dir()
+        or name.startswith('__MACOSX/')
+        or posixpath.basename(name).startswith('.')
+    )
+
+
+class Spooler:
+    """Writes uploads to ``directory`` one file at a time, recording an entry per file.
+
+    Each entry is ``{'filename': ..., 'path': ...}`` once the file is on disk
+    or ``{'filename': ..., 'error': ...}`` when it was rejected.
+    """
+
+    def __init__(self, directory, extensions, max_files=BULK_UPLOAD_MAX_FILES):
+        self.directory = directory
+        self.extensions = extensions
+        self.max_files = max_files
+        self.entries = []
+
+    def add(self, upload):
+        if _is_archive(upload.filename):
+            self._add_archive(upload.stream, upload.filename)
+        else:
+            self._add_file(upload.stream, upload.filename)
+
+    def _reserve(self, filename):
+        if len(self.entries) >= self.max_files:
+            raise BulkUploadError(f"Too many files. At most {self.max_files} files can be uploaded at once.")
+        entry = {'filename': filename}
+        self.entries.append(entry)
+        return entry
+
+    def _add_file(self, stream, filename):
+        entry = self._reserve(filename)
+        path = self._path_for(entry)
+        if path is None:
+            return
+
+        try:
+            with open(path, 'wb') as destination:
+                _copy_limited(stream, destination)
+        except FileTooLargeError as e:
+            os.remove(path)
+            entry['error'] = str(e)
+            return
+
+        entry['path'] = path
+
+    def _path_for(self, entry):
+        filename = entry['filename']
+        if _is_archive(filename):
+            entry['error'] = "Nested archives are not supported"
+        elif not filename.lower().endswith(self.extensions):
+            entry['error'] = "Unsupported file format"
+        else:
+            return os.path.join(self.directory, f"{len(self.entries):05d}{os.path.splitext(filename)[1].lower()}")
+        return None
+
+    def _add_archive(self, stream, filename):
+        try:
+            archive = zipfile.ZipFile(stream)
+        except zipfile.BadZipFile:
+            self._reserve(filename)['error'] = "Not a valid ZIP archive"
+            return
+
+        with archive:
+            for member in archive.infolist():
+                if not _skip_member(member):
+                    self._add_member(archive, member, f"{filename}/{member.filename}")
+
+    def _add_member(self, archive, member, filename):
+        entry = self._reserve(filename)
+        path = self._path_for(entry)
+        if path is None:
+            return
+
+        if member.file_size > BULK_UPLOAD_MAX_FILE_BYTES:
+            entry['error'] = f"File is larger than {BULK_UPLOAD_MAX_FILE_BYTES // (1024 * 1024)} MB"
+            return
+
+        try:
+            with archive.open(member) as source, open(path, 'wb') as destination:
+                _copy_limited(source, destination)
+        except (FileTooLargeError, zipfile.BadZipFile, RuntimeError, NotImplementedError) as e:
+            # Oversized, corrupt, encrypted or unsupported-compression members
+            if os.path.exists(path):
+                os.remove(path)
+            entry['error'] = str(e)
+            return
+
+        entry['path'] = path
+
+
+def spool_uploads(uploads, directory, extensions):
+    """Stream every upload, and every member of uploaded ZIP archives, to files in ``directory``.
+
+    Raises BulkUploadError when the request holds more than BULK_UPLOAD_MAX_FILES files.
+    """
+    spooler = Spooler(directory, extensions)
+    for upload in uploads:
+        spooler.add(upload)
+    return spooler.entries
+
+
+def extract_all(entries, extract):
+    """Run ``extract(path, filename)`` for every spooled entry across the worker pool.
+
+    Successful entries get 'text' and 'source' from the (text, source_type)
+    result, failed ones an 'error'.
+    """
+    futures = [
+        (entry, _executor.submit(metrics.propagate(extract), entry['path'], entry['filename']))
+        for entry in entries
+        if 'path' in entry
+    ]
+
+    for entry, future in futures:
+        try:
+            entry['text'], entry['source'] = future.result()
+        except Exception as e:
+            entry['error'] = str(e)
+
+    return entries
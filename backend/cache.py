@@ -0,0 +1,293 @@
+import asyncio
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_hash(*parts):
+    """Stable sha256 over the given strings, with whitespace runs collapsed"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(' '.join(str(part).split()).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache"""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ``ttl`` seconds after being set.
+
+    Keeps hit/miss/eviction counters so the effect of the cache can be observed.
+    """
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                    self.evictions += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        # (loop, future) of coroutines waiting for the call
+        self.waiters = []
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight block until it finishes and get a copy of the same result
+    (or the same exception). Threads (``do``, ``stream``) and coroutines
+    (``do_async``) share the keys: a coroutine waits for a thread's call on
+    its event loop, and the other way round.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+
+    async def do_async(self, key, func, *args, **kwargs):
+        """do for a coroutine function"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                waiter = loop.create_future()
+                call.waiters.append((loop, waiter))
+
+        if not leader:
+            await waiter
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = await func(*args, **kwargs)
+            return call.result
+        except asyncio.CancelledError:
+            call.error = RuntimeError('The call was abandoned, please retry')
+            raise
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+
+    def stream(self, key, func, *args, **kwargs):
+        """do for a generator function, used with ``yield from``.
+
+        The first caller yields ``func``'s items as they come and the value
+        ``func`` returns is the shared result; callers arriving meanwhile yield
+        nothing and wait for it. Returns (result, whether this caller led).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result), False
+
+        try:
+            call.result = yield from func(*args, **kwargs)
+            return call.result, True
+        except GeneratorExit:
+            # The leader's consumer went away before the result was ready
+            call.error = RuntimeError('The call was abandoned, please retry')
+            raise
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+
+    def _finish(self, key, call):
+        with self._lock:
+            del self._calls[key]
+        call.event.set()
+        for loop, waiter in call.waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # Its loop has closed
+                pass
+
+
+class TieredCache:
+    """In-memory LRU tier in front of a persistent key/value store.
+
+    Persistent hits are promoted into memory. ``get_or_compute`` coalesces
+    concurrent misses on the same key so the value is only computed once.
+    """
+
+    def __init__(self, store=None, max_size=256):
+        self.memory = LRUCache(max_size)
+        self.store = store
+        self._flight = SingleFlight()
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        if self.store is not None:
+            try:
+                value = self.store.get(key)
+            except Exception as e:
+                print(f"Cache store read failed for {key}: {e}")
+                value = None
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.store is not None:
+            try:
+                self.store.set(key, value)
+            except Exception as e:
+                print(f"Cache store write failed for {key}: {e}")
+
+    def delete(self, key):
+        self.memory.delete(key)
+        if self.store is not None:
+            self.store.delete(key)
+
+    def get_or_compute(self, key, compute, cacheable=None):
+        """Return the cached value or compute it once; ``cacheable(value)`` can veto storing it"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        return self._flight.do(key, self._compute_and_set, key, compute, cacheable)
+
+    def _compute_and_set(self, key, compute, cacheable):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if cacheable is None or cacheable(value):
+                self.set(key, value)
+        return value
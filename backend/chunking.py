@@ -0,0 +1,231 @@
+import hashlib
+import re
+import zlib
+
+# Lines that usually open a new section in contracts, policies and circulars:
+# "1.", "2.3", "(a)", "Section 4", "ARTICLE IV", "CLAUSE 7", or a short all-caps title
+NUMBERED_HEADING = re.compile(
+    r'^\s*('
+    r'\d+(\.\d+)*[.)]?\s+\S'
+    r'|\([a-zA-Z0-9]{1,3}\)\s+\S'
+    r'|(section|article|clause|schedule|annexure|appendix|chapter|part)\b'
+    r')',
+    re.IGNORECASE
+)
+CAPS_HEADING = re.compile(r'^\s*[A-Z][A-Z0-9 ,&/\-]{3,60}$')
+
+
+def is_heading(line):
+    return bool(NUMBERED_HEADING.match(line) or CAPS_HEADING.match(line))
+
+
+def split_sections(text):
+    """Split text into sections on blank lines (page/paragraph breaks) and heading lines"""
+    sections = []
+    for block in re.split(r'\n\s*\n', text):
+        current = []
+        for line in block.split('\n'):
+            if current and is_heading(line) and not is_heading(current[-1]):
+                sections.append('\n'.join(current).strip())
+                current = []
+            current.append(line)
+        if current:
+            sections.append('\n'.join(current).strip())
+    return [section for section in sections if section]
+
+
+def _split_oversized(section, max_chars):
+    """Break a section longer than max_chars on line boundaries, then hard-wrap"""
+    pieces = []
+    current = ''
+    for line in section.split('\n'):
+        while len(line) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if current and len(current) + len(line) + 1 > max_chars:
+            pieces.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _is_unit_boundary(section):
+    # Roughly one section in four ends a unit; decided by the section's own text
+    return zlib.crc32(_normalize(section).encode('utf-8')) % 4 == 0
+
+
+def section_units(text, target_chars, min_chars=None):
+    """Group sections into units of roughly target_chars for section-level analysis.
+
+    A unit only ends after a section whose content marks it as a boundary
+    (once it holds min_chars, a quarter of target_chars by default) or once it
+    reaches target_chars, so editing one section changes the unit holding it
+    and leaves the other units, and their hashes, as they were.
+    """
+    if min_chars is None:
+        min_chars = target_chars // 4
+    units = []
+    current = []
+    size = 0
+
+    for section in split_sections(text):
+        for piece in (_split_oversized(section, target_chars) if len(section) > target_chars else [section]):
+            current.append(piece)
+            size += len(piece) + 2
+            if size >= target_chars or (size >= min_chars and _is_unit_boundary(piece)):
+                units.append('\n\n'.join(current))
+                current = []
+                size = 0
+
+    if current:
+        units.append('\n\n'.join(current))
+    return units
+
+
+# Finer and finer places to break text that is too long: paragraphs, lines,
+# sentences, words
+_BREAKS = (
+    re.compile(r'\n\s*\n'),
+    re.compile(r'\n'),
+    re.compile(r'(?<=[.!?;。！？])\s+'),
+    re.compile(r'\s+'),
+)
+
+
+def _split_after(text, pattern):
+    """Split text after every match of pattern; the pieces concatenate back to text"""
+    pieces = []
+    start = 0
+    for match in pattern.finditer(text):
+        pieces.append(text[start:match.end()])
+        start = match.end()
+    if start < len(text):
+        pieces.append(text[start:])
+    return pieces
+
+
+def _break_pieces(text, max_chars, level=0):
+    if len(text) <= max_chars:
+        return [text]
+    if level == len(_BREAKS):
+        return [text[start:start + max_chars] for start in range(0, len(text), max_chars)]
+
+    pieces = []
+    for piece in _split_after(text, _BREAKS[level]):
+        pieces.extend(_break_pieces(piece, max_chars, level + 1))
+    return pieces
+
+
+def split_for_translation(text, max_chars):
+    """Split free text into chunks of at most max_chars that concatenate back to exactly text.
+
+    Chunks end on paragraph breaks where possible, else on line, sentence or
+    word breaks, and whitespace between them stays with the chunks. Like
+    section_units, a chunk ends after a piece whose content marks a boundary,
+    so editing part of a text leaves the other chunks, and their cached
+    translations, as they were.
+    """
+    chunks = []
+    current = ''
+
+    for piece in _break_pieces(text, max_chars):
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = ''
+        current += piece
+        if len(current) >= max_chars // 4 and _is_unit_boundary(piece):
+            chunks.append(current)
+            current = ''
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def section_hash(unit):
+    """Hash of a unit's text, insensitive to whitespace and case changes"""
+    return hashlib.sha256(_normalize(unit).encode('utf-8')).hexdigest()[:32]
+
+
+def _normalize(value):
+    return ' '.join(str(value or '').lower().split())
+
+
+def _dedupe(items, key):
+    seen = set()
+    merged = []
+    for item in items:
+        identity = key(item)
+        if not identity or identity in seen:
+            continue
+        seen.add(identity)
+        merged.append(item)
+    return merged
+
+
+def _field_key(field):
+    return lambda item: _normalize(item.get(field)) if isinstance(item, dict) else _normalize(item)
+
+
+_term_key = _field_key('term')
+_clause_key = _field_key('clause')
+_risk_key = _field_key('risk')
+
+
+def merge_analyses(parts):
+    """Merge per-chunk analyses, keeping the first occurrence of each term, clause, risk and item"""
+    return {
+        'key_terms': _dedupe(
+            (term for part in parts for term in part.get('key_terms') or []),
+            _term_key
+        ),
+        'important_clauses': _dedupe(
+            (clause for part in parts for clause in part.get('important_clauses') or []),
+            _clause_key
+        ),
+        'risks_and_concerns': _dedupe(
+            (risk for part in parts for risk in part.get('risks_and_concerns') or []),
+            _risk_key
+        ),
+        'unclear_items': _dedupe(
+            (item for part in parts for item in part.get('unclear_items') or []),
+            _normalize
+        ),
+    }
+
+
+def _diff_items(old_items, new_items, key):
+    old_items = old_items or []
+    new_items = new_items or []
+    old_keys = {key(item) for item in old_items}
+    new_keys = {key(item) for item in new_items}
+    return {
+        'added': [item for item in new_items if key(item) not in old_keys],
+        'removed': [item for item in old_items if key(item) not in new_keys],
+    }
+
+
+def diff_analyses(old, new):
+    """Clauses and risks found in only one of two analyses"""
+    return {
+        'clauses': _diff_items(old.get('important_clauses'), new.get('important_clauses'), _clause_key),
+        'risks': _diff_items(old.get('risks_and_concerns'), new.get('risks_and_concerns'), _risk_key),
+    }
+
+
+def diff_sections(old_hashes, new_hashes):
+    """Counts of section units kept, changed or dropped between two revisions"""
+    old_hashes = set(old_hashes or ())
+    unchanged = sum(1 for unit_hash in new_hashes if unit_hash in old_hashes)
+    return {
+        'total': len(new_hashes),
+        'unchanged': unchanged,
+        'changed': len(new_hashes) - unchanged,
+        'removed': len(old_hashes - set(new_hashes)),
+    }
@@ -0,0 +1,166 @@
+import math
+import os
+import re
+from collections import Counter
+
+import metrics
+
+# Compact document text before it goes into the analysis prompt; the stored text is never changed
+PROMPT_COMPACTION = os.getenv('PROMPT_COMPACTION', 'true').lower() == 'true'
+# A line near the top or bottom of a page is a running header or footer when
+# it repeats on at least this many pages and this share of them
+REPEATED_LINE_MIN_PAGES = int(os.getenv('REPEATED_LINE_MIN_PAGES', '3'))
+REPEATED_LINE_MIN_SHARE = float(os.getenv('REPEATED_LINE_MIN_SHARE', '0.5'))
+# Lines at each end of a page searched for headers and footers; page numbers
+# are only looked for on the first and last line
+PAGE_EDGE_LINES = 2
+REPEATED_LINE_MAX_CHARS = 120
+# Rough ratio for English prose; only used to report the saving
+CHARS_PER_TOKEN = 4
+
+_PAGE_BREAK = re.compile(r'\n\s*\n')
+_PAGE_NUMBER = re.compile(r'^(?:page\s*)?[-–—(\[]?\s*\d{1,4}\s*[-–—)\]]?(?:\s*(?:of|/)\s*\d{1,4})?$', re.IGNORECASE)
+_PAGE_LABEL = re.compile(r'\b(?:page\s*)?\d{1,4}\s*(?:of|/)\s*\d{1,4}\b|\bpage\s*\d{1,4}\b', re.IGNORECASE)
+_HYPHEN_BREAK = re.compile(r'\b([A-Za-z]+)-\n([a-z]+)\b')
+_WORD = re.compile(r'\w+')
+_INLINE_SPACE = re.compile(r'[ \t\xa0]+')
+# Dot leaders in tables of contents, underscores marking blanks to fill in
+_FILLER = re.compile(r'([._\-=*])\1{3,}')
+
+prompt_tokens = metrics.registry.counter(
+    'prompt_tokens_estimated_total', 'Estimated document tokens sent for analysis, before and after compaction'
+)
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _rejoin_hyphens(text):
+    """Rejoin words split across lines, dropping the hyphen only when the joined word occurs elsewhere.
+
+    Most line-end hyphens in contracts and policies belong to compounds
+    ("third-party", "decision-making"), which keep theirs.
+    """
+    words = set(_WORD.findall(text.lower()))
+    joined = 0
+
+    def rejoin(match):
+        nonlocal joined
+        head, tail = match.groups()
+        if (head + tail).lower() in words:
+            joined += 1
+            return head + tail
+        return f"{head}-{tail}"
+
+    return _HYPHEN_BREAK.sub(rejoin, text), joined
+
+
+def _line_key(line):
+    # "Lease | Page 3 of 12" and "Lease | Page 4 of 12" are the same footer
+    return ' '.join(_PAGE_LABEL.sub('#', line.lower()).split())
+
+
+def _edge_indexes(lines):
+    count = len(lines)
+    return set(range(min(PAGE_EDGE_LINES, count))) | set(range(max(0, count - PAGE_EDGE_LINES), count))
+
+
+def _repeated_lines(pages):
+    """Keys of the edge lines that repeat on enough pages to be running headers or footers"""
+    seen = Counter()
+    for lines in pages:
+        seen.update({
+            _line_key(lines[index]) for index in _edge_indexes(lines)
+            if len(lines[index].strip()) <= REPEATED_LINE_MAX_CHARS
+        })
+
+    min_pages = max(REPEATED_LINE_MIN_PAGES, math.ceil(len(pages) * REPEATED_LINE_MIN_SHARE))
+    return {key for key, pages_seen in seen.items() if key and pages_seen >= min_pages}
+
+
+def _page_number_style(line):
+    """The style of a bare page number line, such as 'page #' or '- # -', else None"""
+    line = _INLINE_SPACE.sub(' ', line).strip()
+    return re.sub(r'\d+', '#', line.lower()) if _PAGE_NUMBER.match(line) else None
+
+
+def _page_number_styles(pages):
+    """Page number styles found on the first or last line of enough pages to be the document's numbering.
+
+    A lone "12" closing one paragraph is a figure, not a page number.
+    """
+    seen = Counter()
+    for lines in pages:
+        seen.update({_page_number_style(lines[index]) for index in {0, len(lines) - 1}} - {None})
+    return {style for style, pages_seen in seen.items() if pages_seen >= REPEATED_LINE_MIN_PAGES}
+
+
+def compact_text(text):
+    """Strip what costs tokens without informing the analysis.
+
+    Drops running headers and footers (edge lines repeated across pages) and
+    page numbers, rejoins words hyphenated across line breaks and collapses
+    runs of spaces, blank lines and filler such as dot leaders. Pages are the
+    blank-line separated blocks extraction produces. Returns
+    (compacted_text, stats).
+    """
+    pages = [page.split('\n') for page in _PAGE_BREAK.split(text)]
+    repeated = _repeated_lines(pages)
+    numbering = _page_number_styles(pages)
+
+    removed_repeated = 0
+    removed_page_numbers = 0
+    kept_pages = []
+    for lines in pages:
+        edges = _edge_indexes(lines)
+        ends = {0, len(lines) - 1}
+        kept = []
+        repeated_here = page_numbers_here = 0
+        for index, line in enumerate(lines):
+            line = _FILLER.sub(r'\1\1\1', _INLINE_SPACE.sub(' ', line)).strip()
+            if index in edges and _line_key(line) in repeated:
+                repeated_here += 1
+            elif index in ends and _page_number_style(line) in numbering:
+                page_numbers_here += 1
+            elif line:
+                kept.append(line)
+
+        if not kept:
+            # Never drop a whole page; a short one may just look like boilerplate
+            kept = [line for line in (_INLINE_SPACE.sub(' ', line).strip() for line in lines) if line]
+            repeated_here = page_numbers_here = 0
+        removed_repeated += repeated_here
+        removed_page_numbers += page_numbers_here
+        if kept:
+            kept_pages.append('\n'.join(kept))
+
+    compacted, hyphens_joined = _rejoin_hyphens('\n\n'.join(kept_pages))
+
+    return compacted, {
+        'chars_before': len(text),
+        'chars_after': len(compacted),
+        'tokens_before': estimate_tokens(text),
+        'tokens_after': estimate_tokens(compacted),
+        'repeated_lines_removed': removed_repeated,
+        'page_numbers_removed': removed_page_numbers,
+        'hyphens_joined': hyphens_joined,
+    }
+
+
+def compact_for_prompt(text, enabled=PROMPT_COMPACTION, record=True):
+    """The text to build the analysis prompt from, with its compaction stats (None when disabled).
+
+    With record=False the text is not going into a prompt and is left out of the metrics.
+    """
+    if not enabled:
+        return text, None
+
+    with metrics.timed('compact'):
+        compacted, stats = compact_text(text)
+
+    if record:
+        prompt_tokens.inc(stats['tokens_before'], stage='raw')
+        prompt_tokens.inc(stats['tokens_after'], stage='compacted')
+
+    return compacted, stats
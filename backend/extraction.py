@@ -0,0 +1,133 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import pdfplumber
+import PyPDF2
+
+import metrics
+
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', str(os.cpu_count() or 2)))
+PDF_PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', '8'))
+# Below this many pages the pool overhead outweighs the parallelism
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '12'))
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', '0')) or None
+PDF_EXTRACT_TIME_BUDGET = float(os.getenv('PDF_EXTRACT_TIME_BUDGET', '0')) or None
+# OCR pages that have no text layer (scanned PDFs)
+PDF_OCR_FALLBACK = os.getenv('PDF_OCR_FALLBACK', 'true').lower() == 'true'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS)
+        return _pool
+
+
+def _extract_page_range(path, start, stop, deadline=None):
+    """Extract pages [start, stop) with pdfplumber, falling back to PyPDF2 per empty page.
+
+    Runs inside a pool worker. Returns (page_index, text) pairs; pages not
+    reached before the deadline are left out.
+    """
+    results = []
+    fallback_reader = None
+
+    with pdfplumber.open(path) as pdf:
+        for index in range(start, stop):
+            if deadline and time.time() > deadline:
+                break
+
+            page = pdf.pages[index]
+            page_text = page.extract_text() or ''
+            page.flush_cache()
+
+            if not page_text.strip():
+                try:
+                    if fallback_reader is None:
+                        fallback_reader = PyPDF2.PdfReader(path)
+                    page_text = fallback_reader.pages[index].extract_text() or ''
+                except Exception:
+                    page_text = ''
+
+            results.append((index, page_text.strip()))
+
+    return results
+
+
+def count_pdf_pages(path):
+    return len(PyPDF2.PdfReader(path).pages)
+
+
+def extract_pdf_pages(path, max_pages=PDF_MAX_PAGES, time_budget=PDF_EXTRACT_TIME_BUDGET, parallel=True,
+                      ocr_fallback=PDF_OCR_FALLBACK, parallel_min_pages=PDF_PARALLEL_MIN_PAGES):
+    """Extract the text of each page of the PDF at ``path``.
+
+    Returns a list with one entry per page considered; an entry is None when
+    the page was not reached within ``time_budget`` seconds. Pages without a
+    text layer are rasterized and OCRed when ``ocr_fallback`` is set. Callers
+    extracting many files at once lower ``parallel_min_pages`` so small PDFs
+    also go to the pool instead of contending for the GIL.
+    """
+    page_count = count_pdf_pages(path)
+    if max_pages:
+        page_count = min(page_count, max_pages)
+
+    pages = [None] * page_count
+    deadline = time.time() + time_budget if time_budget else None
+
+    with metrics.timed('pdf_text_layer'):
+        if not parallel or page_count < parallel_min_pages or PDF_EXTRACT_WORKERS <= 1:
+            for index, text in _extract_page_range(path, 0, page_count, deadline):
+                pages[index] = text
+        else:
+            _extract_in_pool(path, pages, deadline)
+
+    empty_pages = [index for index, text in enumerate(pages) if text == '']
+    if ocr_fallback and empty_pages and (not deadline or time.time() < deadline):
+        from ocr import ocr_pdf_pages
+
+        with metrics.timed('pdf_ocr'):
+            for index, text in ocr_pdf_pages(path, empty_pages).items():
+                pages[index] = text
+
+    return pages
+
+
+def _extract_in_pool(path, pages, deadline):
+    page_count = len(pages)
+
+    pool = get_pool()
+    futures = [
+        pool.submit(_extract_page_range, path, start, min(start + PDF_PAGES_PER_TASK, page_count), deadline)
+        for start in range(0, page_count, PDF_PAGES_PER_TASK)
+    ]
+
+    done, not_done = wait(futures, timeout=(deadline - time.time()) if deadline else None)
+    for future in not_done:
+        future.cancel()
+
+    for future in done:
+        for index, text in future.result():
+            pages[index] = text
+
+
+def extract_pdf_text(pdf_file, **kwargs):
+    """Extract text from a PDF file object or path, one page per paragraph block"""
+    if isinstance(pdf_file, (str, os.PathLike)):
+        pages = extract_pdf_pages(pdf_file, **kwargs)
+    else:
+        pdf_file.seek(0)
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as spool:
+            shutil.copyfileobj(pdf_file, spool)
+            spool.flush()
+            pages = extract_pdf_pages(spool.name, **kwargs)
+
+    return "\n\n".join(page for page in pages if page)
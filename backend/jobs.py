@@ -0,0 +1,218 @@
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobOverrunError(QueueFullError):
+    """A timed-out job with the same key is still running"""
+
+
+class JobQueue:
+    """Bounded background worker pool that tracks job status by id.
+
+    At most ``max_workers`` jobs run at once and at most ``max_queue`` more
+    wait behind them; anything beyond that is rejected with QueueFullError
+    instead of piling up. A job running longer than ``job_timeout`` seconds is
+    reported as failed and its late result is discarded. Threads cannot be
+    cancelled, so an overrunning job keeps its worker and its slot until the
+    function returns, and its key stays taken: resubmitting it raises
+    JobOverrunError rather than starting a second copy.
+
+    With a ``store`` (a key/value store such as ``repo.kv_store('jobs')``) every
+    status change is written through, so any worker process can answer for a
+    job another one runs.
+    """
+
+    def __init__(self, max_workers=4, max_queue=100, job_timeout=300, retention=3600, name='job', store=None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.job_timeout = job_timeout
+        self.retention = retention
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._active_keys = {}
+        self._running = set()
+
+    def submit(self, owner_id, func, *args, key=None, meta=None, **kwargs):
+        """Queue ``func(*args, **kwargs)`` and return a snapshot of the job.
+
+        If ``key`` is given and a job with the same key is still queued or
+        running, that job is returned instead of queueing a duplicate.
+        """
+        with self._lock:
+            expired = self._prune()
+            if key is not None and key in self._active_keys:
+                existing = self._jobs.get(self._active_keys[key])
+                if existing:
+                    self._check_timeout(existing)
+                if existing and existing['status'] in (JOB_QUEUED, JOB_RUNNING):
+                    return self._snapshot(existing)
+                if existing and existing['status'] == JOB_FAILED:
+                    raise JobOverrunError('A previous run of this job is still finishing, please retry later')
+
+            if not self._slots.acquire(blocking=False):
+                raise QueueFullError('Analysis queue is full, please retry later')
+
+            job = {
+                'id': uuid.uuid4().hex,
+                'owner_id': owner_id,
+                'key': key,
+                'status': JOB_QUEUED,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'result': None,
+                'error': None,
+            }
+            if meta:
+                job.update(meta)
+            self._jobs[job['id']] = job
+            if key is not None:
+                self._active_keys[key] = job['id']
+
+        for job_id in expired:
+            self._forget(job_id)
+        self._save(job)
+        try:
+            self._executor.submit(self._run, job, func, args, kwargs)
+        except Exception:
+            self._slots.release()
+            with self._lock:
+                self._jobs.pop(job['id'], None)
+                if key is not None:
+                    self._active_keys.pop(key, None)
+            self._forget(job['id'])
+            raise
+
+        return self._snapshot(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                self._check_timeout(job)
+                return self._snapshot(job)
+
+        # Queued or run by another worker process
+        if self.store is None or not _JOB_ID.match(job_id or ''):
+            return None
+        try:
+            job = self.store.get(job_id)
+        except Exception as e:
+            print(f"Job store read failed for {job_id}: {e}")
+            return None
+        if not job:
+            return None
+        self._check_timeout(job)
+        if job['finished_at'] and job['finished_at'] < time.time() - self.retention:
+            return None
+        return self._snapshot(job)
+
+    def stats(self):
+        with self._lock:
+            counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_DONE: 0, JOB_FAILED: 0}
+            for job in self._jobs.values():
+                self._check_timeout(job)
+                counts[job['status']] += 1
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'job_timeout': self.job_timeout,
+                'jobs': counts,
+                # Timed out but still holding a worker and a slot
+                'overrunning': len(self._running) - counts[JOB_RUNNING],
+            }
+
+    def _run(self, job, func, args, kwargs):
+        try:
+            with self._lock:
+                job['status'] = JOB_RUNNING
+                job['started_at'] = time.time()
+                self._running.add(job['id'])
+            self._save(job)
+
+            try:
+                result = func(*args, **kwargs)
+                error = None
+            except Exception as e:
+                result = None
+                error = str(e)
+
+            with self._lock:
+                self._check_timeout(job)
+                if job['status'] == JOB_RUNNING:
+                    job['finished_at'] = time.time()
+                    if error is None:
+                        job['status'] = JOB_DONE
+                        job['result'] = result
+                    else:
+                        job['status'] = JOB_FAILED
+                        job['error'] = error
+            self._save(job)
+        finally:
+            with self._lock:
+                self._running.discard(job['id'])
+                if job['key'] is not None and self._active_keys.get(job['key']) == job['id']:
+                    del self._active_keys[job['key']]
+            self._slots.release()
+
+    def _check_timeout(self, job):
+        if job['status'] != JOB_RUNNING or not self.job_timeout:
+            return
+        if time.time() - job['started_at'] > self.job_timeout:
+            job['status'] = JOB_FAILED
+            job['error'] = f'Job timed out after {self.job_timeout} seconds'
+            job['finished_at'] = time.time()
+
+    def _save(self, job):
+        if self.store is None:
+            return
+        with self._lock:
+            record = {k: v for k, v in job.items() if k != 'key'}
+        try:
+            self.store.set(job['id'], record)
+        except Exception as e:
+            print(f"Job store write failed for {job['id']}: {e}")
+
+    def _forget(self, job_id):
+        if self.store is None:
+            return
+        try:
+            self.store.delete(job_id)
+        except Exception as e:
+            print(f"Job store delete failed for {job_id}: {e}")
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['finished_at'] and job['finished_at'] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return expired
+
+    @staticmethod
+    def _snapshot(job):
+        snapshot = {k: v for k, v in job.items() if k != 'key'}
+        for field in ('created_at', 'started_at', 'finished_at'):
+            if snapshot[field]:
+                snapshot[field] = datetime.utcfromtimestamp(snapshot[field]).isoformat()
+        return snapshot
@@ -0,0 +1,42 @@
+import threading
+
+
+class LazyObject:
+    """Stands in for the object ``factory`` returns, building it on first attribute access.
+
+    Lets modules declare clients (Firestore, Gemini) as globals without
+    creating them at import time, so importing the app stays fast and a
+    pre-fork server can import it before forking and build the clients in
+    each worker. ``load()`` builds the object ahead of the first request.
+    """
+
+    def __init__(self, factory, name=None):
+        self._factory = factory
+        self._name = name or getattr(factory, '__name__', 'object')
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._instance is not None
+
+    def load(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f"<LazyObject {self._name} ({state})>"
+
+
+def load(value):
+    """Build ``value`` if it is a LazyObject; anything else (a test double, say) is returned as is"""
+    if isinstance(value, LazyObject):
+        return value.load()
+    return value
@@ -0,0 +1,434 @@
+import asyncio
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+LLM_MAX_IN_FLIGHT = int(os.getenv('LLM_MAX_IN_FLIGHT', '8'))
+# Seconds a call may wait for a free slot before it is rejected
+LLM_QUEUE_TIMEOUT = float(os.getenv('LLM_QUEUE_TIMEOUT', '30'))
+LLM_MAX_ATTEMPTS = int(os.getenv('LLM_MAX_ATTEMPTS', '4'))
+LLM_RETRY_BASE_DELAY = float(os.getenv('LLM_RETRY_BASE_DELAY', '0.5'))
+LLM_RETRY_MAX_DELAY = float(os.getenv('LLM_RETRY_MAX_DELAY', '8'))
+# Consecutive failed calls (after retries) that open the circuit, and how long it stays open
+LLM_BREAKER_THRESHOLD = int(os.getenv('LLM_BREAKER_THRESHOLD', '5'))
+LLM_BREAKER_RESET = float(os.getenv('LLM_BREAKER_RESET', '30'))
+# Analyses each user may start per minute, with bursts up to LLM_USER_BURST; 0 disables the limit
+LLM_USER_RATE_PER_MINUTE = float(os.getenv('LLM_USER_RATE_PER_MINUTE', '20'))
+LLM_USER_BURST = int(os.getenv('LLM_USER_BURST', '20'))
+
+# HTTP statuses google.api_core errors carry in ``code`` that are worth retrying
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+llm_retries = metrics.registry.counter('llm_retries_total', 'Gemini calls retried after a retryable error')
+llm_rejected = metrics.registry.counter('llm_rejected_total', 'Gemini calls or analyses refused by admission control')
+
+
+class LLMUnavailableError(Exception):
+    """The call was refused without reaching the model; ``retry_after`` is a hint in seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class OverloadedError(LLMUnavailableError):
+    pass
+
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+
+def is_retryable(error):
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return getattr(error, 'code', None) in RETRYABLE_STATUS
+
+
+def backoff_delay(attempt, base=LLM_RETRY_BASE_DELAY, cap=LLM_RETRY_MAX_DELAY):
+    """Full-jitter exponential backoff before retry number ``attempt`` (0-based)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class ConcurrencyLimiter:
+    """At most ``max_in_flight`` holders at once; waiters give up after ``queue_timeout`` seconds.
+
+    Threads wait with ``acquire`` and coroutines with ``acquire_async``, which
+    waits on the event loop rather than tying up a thread.
+    """
+
+    def __init__(self, max_in_flight=LLM_MAX_IN_FLIGHT, queue_timeout=LLM_QUEUE_TIMEOUT):
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+        # (loop, future) of coroutines waiting for a slot
+        self._async_waiters = []
+
+    def _overloaded(self):
+        llm_rejected.inc(reason='queue_timeout')
+        return OverloadedError(
+            "Too many analyses are running right now. Please try again shortly.",
+            retry_after=max(1, round(self.queue_timeout))
+        )
+
+    def acquire(self):
+        """Take a slot, returning the seconds spent waiting for it; raises OverloadedError on timeout"""
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+
+        with self._condition:
+            self.waiting += 1
+            try:
+                while self.in_flight >= self.max_in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._overloaded()
+                    self._condition.wait(remaining)
+                self.in_flight += 1
+            finally:
+                self.waiting -= 1
+
+        return time.monotonic() - started
+
+    async def acquire_async(self):
+        """acquire for coroutines"""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+
+        with self._condition:
+            self.waiting += 1
+        try:
+            while True:
+                with self._condition:
+                    if self.in_flight < self.max_in_flight:
+                        self.in_flight += 1
+                        return time.monotonic() - started
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._overloaded()
+                    waiter = (loop, loop.create_future())
+                    self._async_waiters.append(waiter)
+                try:
+                    await asyncio.wait_for(waiter[1], remaining)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    with self._condition:
+                        if waiter in self._async_waiters:
+                            self._async_waiters.remove(waiter)
+        finally:
+            with self._condition:
+                self.waiting -= 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+            # Every waiting coroutine checks again; those that lose the race wait again
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # Its loop has closed
+                pass
+
+    @contextmanager
+    def slot(self):
+        metrics.observe('llm_queue', self.acquire())
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'max_in_flight': self.max_in_flight,
+                'queue_timeout': self.queue_timeout,
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+            }
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class CircuitBreaker:
+    """Fails calls fast after ``threshold`` consecutive failures, for ``reset_timeout`` seconds.
+
+    Once the timeout passes a single trial call is let through (half open);
+    its outcome closes the circuit again or reopens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold=LLM_BREAKER_THRESHOLD, reset_timeout=LLM_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless the call may go ahead; returns True for the half-open trial call"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+
+        llm_rejected.inc(reason='circuit_open')
+        raise CircuitOpenError(
+            "The analysis service is temporarily unavailable. Please try again shortly.",
+            retry_after=max(1, round(remaining))
+        )
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def end_trial(self):
+        """Let another trial call through when this one ended without an outcome"""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'threshold': self.threshold,
+                'reset_timeout': self.reset_timeout,
+                'times_opened': self.times_opened,
+            }
+            if self.state == self.OPEN:
+                stats['retry_after'] = max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+            return stats
+
+
+class RateLimiter:
+    """Token bucket per key: ``rate_per_minute`` tokens refill continuously up to ``burst``"""
+
+    def __init__(self, rate_per_minute=LLM_USER_RATE_PER_MINUTE, burst=LLM_USER_BURST, max_keys=10000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def try_acquire(self, key, cost=1):
+        """Return (True, 0) and spend ``cost`` tokens, or (False, seconds until they are available)"""
+        if not self.enabled:
+            return True, 0
+
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+            if tokens < cost:
+                self._buckets[key] = (tokens, now)
+                llm_rejected.inc(reason='rate_limited')
+                return False, (cost - tokens) / self.rate
+
+            self._buckets[key] = (tokens - cost, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return True, 0
+
+    def _prune(self, now):
+        # Buckets that have refilled completely hold no state worth keeping
+        for key, (tokens, updated) in list(self._buckets.items()):
+            if tokens + (now - updated) * self.rate >= self.burst:
+                del self._buckets[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'rate_per_minute': self.rate * 60,
+                'burst': self.burst,
+                'tracked_keys': len(self._buckets),
+            }
+
+
+class LLMGuard:
+    """Admission control around model calls: circuit breaker, concurrency slot and retries.
+
+    The slot is only held while a call is running, not while backing off
+    between attempts or while a streamed answer is sent on to the client. A
+    call that still fails after its retries counts as one failure towards
+    opening the circuit.
+    """
+
+    def __init__(self, limiter=None, breaker=None, max_attempts=LLM_MAX_ATTEMPTS):
+        self.limiter = limiter or ConcurrencyLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_attempts = max_attempts
+
+    def _failed(self, error, attempt, trial):
+        """Record a failed attempt; returns True when it should be retried"""
+        retryable = is_retryable(error)
+        if retryable and attempt + 1 < self.max_attempts and not trial:
+            llm_retries.inc()
+            return True
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            # The upstream answered; the request itself was bad
+            self.breaker.record_success()
+        return False
+
+    def call(self, func, *args, **kwargs):
+        for attempt in range(self.max_attempts):
+            trial = self.breaker.before_call()
+            try:
+                with self.limiter.slot():
+                    result = func(*args, **kwargs)
+            except LLMUnavailableError:
+                raise
+            except Exception as e:
+                if not self._failed(e, attempt, trial):
+                    raise
+                time.sleep(backoff_delay(attempt))
+                continue
+            finally:
+                if trial:
+                    self.breaker.end_trial()
+
+            self.breaker.record_success()
+            return result
+
+    def _buffered(self, func, args, kwargs):
+        """Items of ``func(*args, **kwargs)``, read under a slot on a thread of their own.
+
+        The thread drains the model into a buffer and frees the slot as soon as
+        the model is done, however slowly the caller consumes the items.
+        """
+        items = queue.Queue()
+        stopped = threading.Event()
+
+        def read():
+            try:
+                with self.limiter.slot():
+                    for item in func(*args, **kwargs):
+                        if stopped.is_set():
+                            break
+                        items.put((True, item))
+            except BaseException as e:
+                items.put((False, e))
+            else:
+                items.put((False, None))
+
+        threading.Thread(target=metrics.propagate(read), name='llm-stream', daemon=True).start()
+        try:
+            while True:
+                is_item, value = items.get()
+                if is_item:
+                    yield value
+                elif value is None:
+                    return
+                else:
+                    raise value
+        finally:
+            stopped.set()
+
+    def stream(self, func, *args, **kwargs):
+        """Like call for a function returning an iterator; retries only until the first item arrives"""
+        for attempt in range(self.max_attempts):
+            trial = self.breaker.before_call()
+            started = False
+            try:
+                for item in self._buffered(func, args, kwargs):
+                    started = True
+                    yield item
+            except LLMUnavailableError:
+                raise
+            except Exception as e:
+                if started:
+                    if is_retryable(e):
+                        self.breaker.record_failure()
+                    raise
+                if not self._failed(e, attempt, trial):
+                    raise
+                time.sleep(backoff_delay(attempt))
+                continue
+            finally:
+                if trial:
+                    self.breaker.end_trial()
+
+            self.breaker.record_success()
+            return
+
+    async def call_async(self, func, *args, **kwargs):
+        """call for a coroutine function"""
+        for attempt in range(self.max_attempts):
+            trial = self.breaker.before_call()
+            try:
+                metrics.observe('llm_queue', await self.limiter.acquire_async())
+                try:
+                    result = await func(*args, **kwargs)
+                finally:
+                    self.limiter.release()
+            except LLMUnavailableError:
+                raise
+            except Exception as e:
+                if not self._failed(e, attempt, trial):
+                    raise
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+            finally:
+                if trial:
+                    self.breaker.end_trial()
+
+            self.breaker.record_success()
+            return result
+
+    def stats(self):
+        return {
+            'concurrency': self.limiter.stats(),
+            'circuit_breaker': self.breaker.stats(),
+            'retry': {
+                'max_attempts': self.max_attempts,
+                'base_delay': LLM_RETRY_BASE_DELAY,
+                'max_delay': LLM_RETRY_MAX_DELAY,
+            },
+        }
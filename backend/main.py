@@ -1,89 +1,223 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-import firebase_admin
-from firebase_admin import credentials, firestore, storage
 import os
-from datetime import datetime, timedelta
-import google.generativeai as genai
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-import PyPDF2
-import pdfplumber
 import io
 import base64
 import bcrypt
 import jwt
 from functools import wraps
-from deep_translator import GoogleTranslator
-from PIL import Image
-import pytesseract
 import uuid
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import json
+import re
+import hmac
+import time
+import metrics
+from jobs import JobQueue, QueueFullError
+from bulk_upload import BulkUploadError, extract_all, spool_uploads
+from resumable_upload import ChunkTooLargeError, OffsetMismatchError, UploadSessionNotFound, UploadSessions
+from llm_limits import LLMGuard, LLMUnavailableError, RateLimiter
+from compression import compress_response
+from compaction import compact_for_prompt
+from cache import SingleFlight, TieredCache, TTLCache, content_hash
+from chunking import diff_analyses, diff_sections, merge_analyses, section_hash, section_units
+from streaming import AnalysisStreamParser, sse_event
+from storage import STORAGE_BACKEND, InlineAsyncRepository, create_repository
+from lazy import LazyObject, load
+from search_index import SEARCH_INDEX_PATH, SEARCH_MAX_PAGE_SIZE, SEARCH_PAGE_SIZE, SearchIndex
+from translation import TranslationService, create_backend
+from translation import translate_analysis as translate_analysis_fields
 
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app)
+# Routes live on a blueprint so create_app() can build the app; the
+# PDF/OCR/translator libraries, Firestore and Gemini load on first use
+api = Blueprint('api', __name__)
 
 SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-change-this-in-production')
 
-service_account_path = os.getenv('FIREBASE_SERVICE_ACCOUNT_PATH', './serviceAccountKey.json')
-storage_bucket = os.getenv('FIREBASE_STORAGE_BUCKET')
+# /api/documents returns pages of metadata only; the extracted text is left out
+# unless requested with ?fields=text
+DOCUMENT_LIST_FIELDS = ['title', 'type', 'uploaded_at', 'analyzed', 'analyzed_at', 'source', 'filename', 'user_id',
+                        'revision_of', 'revision']
+DOCUMENTS_PAGE_SIZE = int(os.getenv('DOCUMENTS_PAGE_SIZE', '50'))
+DOCUMENTS_MAX_PAGE_SIZE = int(os.getenv('DOCUMENTS_MAX_PAGE_SIZE', '200'))
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate(service_account_path)
-    firebase_admin.initialize_app(cred, {
-        'storageBucket': storage_bucket
-    })
+# Listing pages cached per user and list version; see document_list_version
+document_list_cache = TTLCache(
+    max_size=int(os.getenv('DOCUMENT_LIST_CACHE_SIZE', '5000')),
+    ttl=float(os.getenv('DOCUMENT_LIST_CACHE_TTL', '60'))
+)
+
+# Read-only routes may build the user from the signed token claims instead of
+# Firestore; a deleted user then keeps read access until the token expires
+TRUST_TOKEN_CLAIMS = os.getenv('TRUST_TOKEN_CLAIMS', 'false').lower() == 'true'
+
+user_cache = TTLCache(
+    max_size=int(os.getenv('USER_CACHE_SIZE', '10000')),
+    ttl=float(os.getenv('USER_CACHE_TTL', '300'))
+)
+
+# Firestore by default; STORAGE_BACKEND=memory runs fully in-process. Every
+# call is timed as the 'storage' stage.
+repository = LazyObject(create_repository, 'repository')
+repo = metrics.TimedProxy(repository, 'storage')
+
+# Per-stage breakdown on every response; browsers only show it cross-origin
+# when Timing-Allow-Origin permits the web client
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'true').lower() == 'true'
+TIMING_ALLOW_ORIGIN = os.getenv('TIMING_ALLOW_ORIGIN', '*')
+
+def create_model():
+    import google.generativeai as genai
+    
+    genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+    return genai.GenerativeModel('gemini-2.5-flash')
+
+model = LazyObject(create_model, 'gemini')
+
+# Every Gemini call goes through the guard (concurrency cap, retries, circuit
+# breaker); each user may start a limited number of analyses per minute
+llm_guard = LLMGuard()
+analysis_rate_limiter = RateLimiter()
+
+# 'sync' runs the Gemini call inside the request, 'async' queues it and returns 202
+ANALYSIS_MODE = os.getenv('ANALYSIS_MODE', 'sync')
+
+# Job records are written through to the repository so a status poll can land on any worker
+job_store = LazyObject(lambda: repo.kv_store('analysis_jobs'), 'job_store')
+analysis_jobs = JobQueue(
+    max_workers=int(os.getenv('ANALYSIS_WORKERS', '4')),
+    max_queue=int(os.getenv('ANALYSIS_QUEUE_SIZE', '100')),
+    job_timeout=float(os.getenv('ANALYSIS_JOB_TIMEOUT', '300')),
+    name='analysis-job',
+    store=metrics.TimedProxy(job_store, 'job_store')
+)
+
+# Documents longer than this many characters (roughly 4 per token) exceed the prompt
+# budget: they are split into section units of about ANALYSIS_CHUNK_SIZE that are
+# analyzed concurrently and merged. Units are cached by content, so a revision of a
+# long document only sends the units that changed
+ANALYSIS_CHUNK_THRESHOLD = int(os.getenv('ANALYSIS_CHUNK_THRESHOLD', '60000'))
+ANALYSIS_CHUNK_SIZE = int(os.getenv('ANALYSIS_CHUNK_SIZE', '20000'))
+# Every analysis stores the hashes of section units of about this size, which the
+# diff of a later revision compares; they do not affect how the document is analyzed
+REVISION_SECTION_CHARS = int(os.getenv('REVISION_SECTION_CHARS', '4000'))
+chunk_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('ANALYSIS_CHUNK_CONCURRENCY', '4')),
+    thread_name_prefix='analysis-chunk'
+)
+
+# Analyses keyed by content hash, shared across documents and users
+analysis_store = LazyObject(lambda: repo.kv_store('analysis_cache'), 'analysis_cache')
+analysis_cache = TieredCache(
+    store=metrics.TimedProxy(analysis_store, 'cache_store'),
+    max_size=int(os.getenv('ANALYSIS_CACHE_SIZE', '256'))
+)
+analysis_flight = SingleFlight()
 
-db = firestore.client()
+# A token per user naming the current version of their document list; uploads,
+# analyses and deletes replace it, so pages any worker cached under the old one
+# are never served again
+document_list_version_store = LazyObject(lambda: repo.kv_store('document_list_versions'), 'document_list_versions')
+document_list_versions = metrics.TimedProxy(document_list_version_store, 'cache_store')
 
-users_collection = db.collection('users')
-documents_collection = db.collection('documents')
-analyses_collection = db.collection('analyses')
+translation_store = LazyObject(lambda: repo.kv_store('translation_cache'), 'translation_cache')
+translation_service = TranslationService(
+    create_backend(),
+    store=metrics.TimedProxy(translation_store, 'cache_store')
+)
+translation_flight = SingleFlight()
 
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-model = genai.GenerativeModel('gemini-2.5-flash')
+def create_search_index():
+    # The in-memory backend forgets its documents on restart, so its index does too
+    return SearchIndex(':memory:' if STORAGE_BACKEND == 'memory' else SEARCH_INDEX_PATH)
+
+# Local full-text index of document text, titles and analyses behind /api/search
+text_index = LazyObject(create_search_index, 'search_index')
+search_index = metrics.TimedProxy(text_index, 'search_index')
+
+# Chunked uploads spooled to disk until they are complete
+upload_sessions = LazyObject(UploadSessions, 'upload_sessions')
+
+# Background pre-translation into each user's preferred languages
+translation_jobs = JobQueue(
+    max_workers=int(os.getenv('TRANSLATION_JOB_WORKERS', '2')),
+    max_queue=int(os.getenv('TRANSLATION_JOB_QUEUE_SIZE', '200')),
+    job_timeout=float(os.getenv('TRANSLATION_JOB_TIMEOUT', '300')),
+    name='translation-job'
+)
 
 def extract_text_from_image(image_file):
-    """Extract text from image using OCR (pytesseract)"""
+    """Extract text from an image file object or path using OCR (pytesseract), one frame at a time across the OCR pool"""
+    from ocr import ocr_image
+    
     try:
-        image_file.seek(0)
-        image = Image.open(image_file)
-        
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        text = pytesseract.image_to_string(image)
-        
-        return text.strip()
+        with metrics.timed('extract_image'):
+            return ocr_image(image_file).strip()
     
     except Exception as e:
         raise Exception(f"Error extracting text from image: {str(e)}")
 
-def extract_text_from_pdf(pdf_file):
-    text = ""
+def extract_text_from_pdf(pdf_file, **options):
+    """Extract text from PDF page by page across the extraction process pool"""
+    from extraction import extract_pdf_text
     
     try:
-        pdf_file.seek(0)
-        with pdfplumber.open(pdf_file) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n\n"
-        
-        if len(text.strip()) < 100:
-            pdf_file.seek(0)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            text = ""
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n\n"
-        
-        return text.strip()
+        with metrics.timed('extract_pdf'):
+            return extract_pdf_text(pdf_file, **options).strip()
     
     except Exception as e:
         raise Exception(f"Error extracting text from PDF: {str(e)}")
 
+SUPPORTED_LANGUAGES = {
+    'en': 'English',
+    'es': 'Spanish',
+    'fr': 'French',
+    'de': 'German',
+    'it': 'Italian',
+    'pt': 'Portuguese',
+    'ru': 'Russian',
+    'ja': 'Japanese',
+    'ko': 'Korean',
+    'zh-cn': 'Chinese (Simplified)',
+    'zh-tw': 'Chinese (Traditional)',
+    'ar': 'Arabic',
+    'hi': 'Hindi',
+    'bn': 'Bengali',
+    'ta': 'Tamil',
+    'te': 'Telugu',
+    'ml': 'Malayalam',
+    'kn': 'Kannada',
+    'mr': 'Marathi',
+    'gu': 'Gujarati',
+    'pa': 'Punjabi',
+    'ur': 'Urdu',
+    'nl': 'Dutch',
+    'pl': 'Polish',
+    'tr': 'Turkish',
+    'vi': 'Vietnamese',
+    'th': 'Thai',
+    'id': 'Indonesian',
+    'ms': 'Malay',
+    'fil': 'Filipino',
+    'sv': 'Swedish',
+    'da': 'Danish',
+    'no': 'Norwegian',
+    'fi': 'Finnish'
+}
+
+# Language the model writes analyses in; other languages are stored translations
+ANALYSIS_LANGUAGE = 'en'
+
+ANALYSIS_FIELDS = ('plain_summary', 'key_terms', 'important_clauses', 'risks_and_concerns', 'unclear_items')
+
+# Bump whenever DEJARGONIZER_PROMPT changes so cached analyses are not reused
+PROMPT_VERSION = '1'
+
 DEJARGONIZER_PROMPT = """You are a Document De-Jargonizer AI.
 
 Your role is to explain complex legal, medical, or government documents
@@ -129,43 +263,231 @@ Provide your analysis in the following JSON structure:
 }}
 """
 
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
+CHUNK_PROMPT_NOTE = """The document text below is ONE SECTION of a longer document.
+Analyze only this section; your answer will be combined with the analyses of the other sections.
+
+"""
+
+SUMMARY_PROMPT = """You are a Document De-Jargonizer AI.
+
+The plain language summaries below were written for consecutive sections of ONE document.
+Combine them into a single plain language summary of the whole document (Grade 8 level).
+Use ONLY the information in these summaries. Do NOT add advice, guesses or new facts,
+and do NOT drop important details.
+
+Section summaries:
+{section_summaries}
+
+Provide your answer in the following JSON structure:
+{{
+  "plain_summary": "Your summary here"
+}}
+"""
+
+def load_user(user_id):
+    """Return the user record, from the in-process cache when possible"""
+    user = user_cache.get(user_id)
+    
+    if user is None:
+        user = repo.get_user(user_id)
+        if user is None:
+            return None
         
-        if not token:
-            return jsonify({'error': 'Token is missing'}), 401
+        user_cache.set(user_id, user)
+    
+    return dict(user)
+
+def invalidate_user(user_id):
+    user_cache.delete(user_id)
+
+def claims_user(data):
+    """The cached user record, or one built from the signed token claims"""
+    current_user = user_cache.get(data['user_id'])
+    if current_user is None:
+        return {
+            'id': data['user_id'],
+            'email': data.get('email', ''),
+            'name': data.get('name', '')
+        }
+    return dict(current_user)
+
+class BlockingIO:
+    """The I/O routes written as coroutines (see io_route) use under the WSGI app.
+    
+    Every call runs on the request thread, so those coroutines never suspend
+    and run_inline finishes them without an event loop. asgi.py passes its
+    own implementation that awaits the async Firestore and Gemini clients.
+    """
+    
+    @property
+    def repo(self):
+        return InlineAsyncRepository(repo)
+    
+    async def load_user(self, user_id):
+        return load_user(user_id)
+    
+    async def blocking(self, func, *args, **kwargs):
+        return func(*args, **kwargs)
+    
+    async def gather(self, *awaitables):
+        return [await awaitable for awaitable in awaitables]
+    
+    async def analyze(self, document_id, document, preferred_languages=()):
+        return analyze_once(document_id, document, preferred_languages)
+
+blocking_io = BlockingIO()
+
+def run_inline(coroutine):
+    """Finish a coroutine that never suspends, such as a route awaiting blocking_io"""
+    try:
+        coroutine.send(None)
+    except StopIteration as done:
+        return done.value
+    coroutine.close()
+    raise RuntimeError("Coroutine suspended outside an event loop")
+
+async def authenticate(io, read_only=False):
+    """Return (user, None) for the request's bearer token, or (None, error response).
+    
+    With ``read_only=True`` and TRUST_TOKEN_CLAIMS enabled, a cache miss is
+    answered from the signed token claims instead of a Firestore read.
+    """
+    token = request.headers.get('Authorization')
+    
+    if not token:
+        return None, (jsonify({'error': 'Token is missing'}), 401)
+    
+    try:
+        if token.startswith('Bearer '):
+            token = token[7:]
         
-        try:
-            if token.startswith('Bearer '):
-                token = token[7:]
-            
+        with metrics.timed('auth'):
             data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            user_doc = users_collection.document(data['user_id']).get()
             
-            if not user_doc.exists:
-                return jsonify({'error': 'User not found'}), 401
+            if read_only and TRUST_TOKEN_CLAIMS:
+                current_user = claims_user(data)
+            else:
+                current_user = await io.load_user(data['user_id'])
+        
+        if current_user is None:
+            return None, (jsonify({'error': 'User not found'}), 401)
             
-            current_user = user_doc.to_dict()
-            current_user['id'] = user_doc.id
-                
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
-        except Exception as e:
-            return jsonify({'error': 'Authentication failed'}), 401
+    except jwt.ExpiredSignatureError:
+        return None, (jsonify({'error': 'Token has expired'}), 401)
+    except jwt.InvalidTokenError:
+        return None, (jsonify({'error': 'Invalid token'}), 401)
+    except Exception:
+        return None, (jsonify({'error': 'Authentication failed'}), 401)
+    
+    return current_user, None
+
+def token_required(f=None, read_only=False):
+    """Authenticate the request and pass the user to the route"""
+    if f is None:
+        return lambda func: token_required(func, read_only=read_only)
+    
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        current_user, error = run_inline(authenticate(blocking_io, read_only))
+        if error:
+            return error
         
         return f(current_user, *args, **kwargs)
     
+    decorated.read_only = read_only
     return decorated
 
-@app.route('/api/health', methods=['GET'])
+def io_route(view):
+    """Write a route once as a coroutine taking the I/O to use, then the user and URL arguments.
+    
+    The WSGI app runs it with blocking_io; asgi.py finds it through the
+    ``coroutine`` attribute and awaits it on the event loop.
+    """
+    @wraps(view)
+    def run(current_user, *args, **kwargs):
+        return run_inline(view(blocking_io, current_user, *args, **kwargs))
+    
+    run.coroutine = view
+    return run
+
+@api.before_app_request
+def start_request_timing():
+    g.request_started = time.perf_counter()
+    g.timings_token = metrics.start_request()
+
+@api.after_app_request
+def record_request_timing(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.request_seconds.observe(elapsed, method=request.method, route=route)
+    metrics.requests_total.inc(method=request.method, route=route, status=response.status_code)
+    
+    if SERVER_TIMING:
+        response.headers['Server-Timing'] = metrics.server_timing_header(metrics.current_timings(), total=elapsed)
+        if TIMING_ALLOW_ORIGIN:
+            response.headers['Timing-Allow-Origin'] = TIMING_ALLOW_ORIGIN
+    
+    return response
+
+@api.after_app_request
+def compress_body(response):
+    return compress_response(response, request.accept_encodings)
+
+@api.teardown_app_request
+def finish_request_timing(error=None):
+    token = g.pop('timings_token', None)
+    if token is not None:
+        metrics.finish_request(token)
+
+# Bearer token for the operational endpoints (metrics, limits, cache stats); unset, they are not served
+INTERNAL_API_TOKEN = os.getenv('INTERNAL_API_TOKEN', '')
+
+def internal_only(f):
+    """Serve the route only to callers presenting INTERNAL_API_TOKEN"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not INTERNAL_API_TOKEN:
+            return jsonify({'error': 'Not found'}), 404
+        
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied.encode(), INTERNAL_API_TOKEN.encode()):
+            return jsonify({'error': 'Internal token is missing or invalid'}), 401
+        
+        return f(*args, **kwargs)
+    
+    return decorated
+
+@api.route('/api/metrics', methods=['GET'])
+@internal_only
+def get_metrics():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@api.route('/api/limits', methods=['GET'])
+@internal_only
+def get_limits():
+    return jsonify({
+        'llm': llm_guard.stats(),
+        'user_rate_limit': analysis_rate_limiter.stats(),
+        'analysis_jobs': analysis_jobs.stats()
+    }), 200
+
+@api.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "healthy", "timestamp": datetime.utcnow().isoformat()})
 
-@app.route('/api/auth/register', methods=['POST'])
+@api.route('/api/cache/stats', methods=['GET'])
+@internal_only
+def cache_stats():
+    return jsonify({
+        'user_cache': user_cache.stats(),
+        'trust_token_claims': TRUST_TOKEN_CLAIMS
+    }), 200
+
+@api.route('/api/auth/register', methods=['POST'])
 def register():
     try:
         data = request.get_json()
@@ -180,8 +502,7 @@ def register():
         if '@' not in email or '.' not in email:
             return jsonify({'error': 'Invalid email format'}), 400
         
-        existing_users = users_collection.where('email', '==', email).limit(1).stream()
-        if any(existing_users):
+        if repo.find_user_by_email(email):
             return jsonify({'error': 'User with this email already exists'}), 409
         
         hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
@@ -190,17 +511,16 @@ def register():
             'email': email,
             'password': hashed_password,
             'name': name,
-            'created_at': firestore.SERVER_TIMESTAMP,
+            'created_at': repo.server_timestamp,
             'last_login': None
         }
         
-        doc_ref = users_collection.document()
-        doc_ref.set(user)
-        user_id = doc_ref.id
+        user_id = repo.create_user(user)
         
         token = jwt.encode({
             'user_id': user_id,
             'email': email,
+            'name': name,
             'exp': datetime.utcnow() + timedelta(days=7)
         }, SECRET_KEY, algorithm='HS256')
         
@@ -217,7 +537,7 @@ def register():
     except Exception as e:
         return jsonify({'error': f'Registration failed: {str(e)}'}), 500
 
-@app.route('/api/auth/login', methods=['POST'])
+@api.route('/api/auth/login', methods=['POST'])
 def login():
     try:
         data = request.get_json()
@@ -228,14 +548,7 @@ def login():
         email = data['email'].lower().strip()
         password = data['password']
         
-        users = users_collection.where('email', '==', email).limit(1).stream()
-        user_doc = None
-        user_id = None
-        
-        for doc in users:
-            user_doc = doc.to_dict()
-            user_id = doc.id
-            break
+        user_doc = repo.find_user_by_email(email)
         
         if not user_doc:
             return jsonify({'error': 'Invalid email or password'}), 401
@@ -243,13 +556,16 @@ def login():
         if not bcrypt.checkpw(password.encode('utf-8'), user_doc['password']):
             return jsonify({'error': 'Invalid email or password'}), 401
         
-        users_collection.document(user_id).update({
-            'last_login': firestore.SERVER_TIMESTAMP
+        user_id = user_doc['id']
+        repo.update_user(user_id, {
+            'last_login': repo.server_timestamp
         })
+        invalidate_user(user_id)
         
         token = jwt.encode({
             'user_id': user_id,
             'email': email,
+            'name': user_doc.get('name', ''),
             'exp': datetime.utcnow() + timedelta(days=7)
         }, SECRET_KEY, algorithm='HS256')
         
@@ -266,7 +582,7 @@ def login():
     except Exception as e:
         return jsonify({'error': f'Login failed: {str(e)}'}), 500
 
-@app.route('/api/auth/verify', methods=['GET'])
+@api.route('/api/auth/verify', methods=['GET'])
 @token_required
 def verify_token(current_user):
     return jsonify({
@@ -274,194 +590,1028 @@ def verify_token(current_user):
         'user': {
             'id': current_user['id'],
             'email': current_user['email'],
-            'name': current_user.get('name', '')
+            'name': current_user.get('name', ''),
+            'preferred_languages': current_user.get('preferred_languages', [])
         }
     }), 200
 
-@app.route('/api/upload', methods=['POST'])
+@api.route('/api/auth/preferences', methods=['PUT'])
 @token_required
-def upload_document(current_user):
+def update_preferences(current_user):
     try:
-        if 'file' not in request.files:
-            return jsonify({"error": "No file provided. Please upload a PDF or image document."}), 400
+        data = request.get_json() or {}
+        languages = data.get('preferred_languages', [])
         
-        file = request.files['file']
+        if not isinstance(languages, list):
+            return jsonify({'error': 'preferred_languages must be a list'}), 400
         
-        if file.filename == '':
-            return jsonify({"error": "No file selected"}), 400
+        unsupported = [lang for lang in languages if lang not in SUPPORTED_LANGUAGES]
+        if unsupported:
+            return jsonify({'error': f"Unsupported languages: {', '.join(unsupported)}"}), 400
         
-        filename_lower = file.filename.lower()
-        allowed_extensions = ['.pdf', '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp']
+        languages = list(dict.fromkeys(languages))
+        repo.update_user(current_user['id'], {
+            'preferred_languages': languages
+        })
+        invalidate_user(current_user['id'])
         
-        if not any(filename_lower.endswith(ext) for ext in allowed_extensions):
-            return jsonify({"error": "Unsupported file format. Please upload a PDF or image file (JPG, PNG, GIF, BMP, TIFF, WEBP)."}), 400
+        return jsonify({'preferred_languages': languages}), 200
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to update preferences: {str(e)}'}), 500
+
+UPLOAD_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp')
+
+EMPTY_EXTRACTION_ERRORS = {
+    "pdf": "Could not extract text from PDF. The PDF might be empty or its scanned pages could not be read. Please ensure the PDF has selectable text or a clear scan.",
+    "image": "Could not extract text from image. The image might be unclear or empty. Please ensure the image contains readable text."
+}
+
+def check_upload_file(files):
+    """Return (file, None) for a usable upload, or (None, error message)"""
+    if 'file' not in files:
+        return None, "No file provided. Please upload a PDF or image document."
+    
+    file = files['file']
+    
+    if file.filename == '':
+        return None, "No file selected"
+    
+    if not file.filename.lower().endswith(UPLOAD_EXTENSIONS):
+        return None, "Unsupported file format. Please upload a PDF or image file (JPG, PNG, GIF, BMP, TIFF, WEBP)."
+    
+    return file, None
+
+def extract_upload_text(file):
+    """Extract the text of an uploaded PDF or image; returns (text, source_type)"""
+    if file.filename.lower().endswith('.pdf'):
+        return extract_text_from_pdf(file), "pdf"
+    return extract_text_from_image(file), "image"
+
+def extract_file_text(path, filename):
+    """extract_upload_text for an upload already written to ``path``.
+
+    Used for bulk and resumable uploads, which are spooled to disk; even
+    short PDFs are split across the process pool rather than parsed on the
+    calling thread.
+    """
+    if filename.lower().endswith('.pdf'):
+        return extract_text_from_pdf(path, parallel_min_pages=1), "pdf"
+    return extract_text_from_image(path), "image"
+
+def revision_fields(base_id, base):
+    """Fields linking a new upload to the document it revises"""
+    return {
+        "revision_of": base_id,
+        "revision_root": base.get('revision_root', base_id),
+        "revision": base.get('revision', 1) + 1
+    }
+
+def new_document(current_user, filename, source_type, form):
+    title = form.get('title', filename)
+    doc_type = form.get('type', 'general')
+    
+    print(f"Creating document: title={title}, type={doc_type}, user_id={current_user['id']}")
+    
+    return {
+        "title": title,
+        "type": doc_type,
+        "uploaded_at": repo.server_timestamp,
+        "analyzed": False,
+        "source": source_type,
+        "filename": filename,
+        "user_id": current_user['id']
+    }
+
+def revision_base(current_user, revision_of):
+    """The user's document a new upload revises, or None"""
+    base = repo.get_document(revision_of)
+    if base is None or base['user_id'] != current_user['id']:
+        return None
+    return base
+
+def store_upload(current_user, filename, source_type, extracted_text, form, revision_of=None, base=None):
+    """Create the document for an extracted upload and index it; returns its id"""
+    document = new_document(current_user, filename, source_type, form)
+    if revision_of:
+        document.update(revision_fields(revision_of, base))
+    
+    document_id = repo.create_document(document, extracted_text)
+    invalidate_document_list(current_user['id'])
+    index_document(document_id, document, extracted_text)
+    
+    print(f"Document created successfully with ID: {document_id}")
+    return document_id
+
+def index_document(document_id, document, text):
+    """Add a new document to the search index; a failure is logged, never fails the upload"""
+    try:
+        search_index.index_document(document_id, document, text)
+    except Exception as e:
+        print(f"Failed to index document {document_id} for search: {str(e)}")
+
+def index_analysis(document_id, document, analysis):
+    try:
+        search_index.index_analysis(document_id, document, analysis)
+    except Exception as e:
+        print(f"Failed to index the analysis of {document_id} for search: {str(e)}")
+
+def unindex_document(document_id):
+    try:
+        search_index.remove_document(document_id)
+    except Exception as e:
+        print(f"Failed to remove {document_id} from the search index: {str(e)}")
+
+@api.route('/api/upload', methods=['POST'])
+@token_required
+def upload_document(current_user):
+    try:
+        file, error = check_upload_file(request.files)
+        if error:
+            return jsonify({"error": error}), 400
+        
+        revision_of = request.form.get('revision_of')
+        base = None
+        if revision_of:
+            base = revision_base(current_user, revision_of)
+            if base is None:
+                return jsonify({"error": "Document to revise not found"}), 404
         
         try:
-            if filename_lower.endswith('.pdf'):
-                extracted_text = extract_text_from_pdf(file)
-                source_type = "pdf"
-            else:
-                extracted_text = extract_text_from_image(file)
-                source_type = "image"
+            extracted_text, source_type = extract_upload_text(file)
             
             if not extracted_text or len(extracted_text.strip()) < 10:
-                if source_type == "pdf":
-                    return jsonify({
-                        "error": "Could not extract text from PDF. The PDF might be scanned, image-only, or empty. Please ensure your PDF has selectable text."
-                    }), 400
-                else:
-                    return jsonify({
-                        "error": "Could not extract text from image. The image might be unclear or empty. Please ensure the image contains readable text."
-                    }), 400
+                return jsonify({"error": EMPTY_EXTRACTION_ERRORS[source_type]}), 400
             
         except Exception as e:
             return jsonify({"error": f"Failed to process file: {str(e)}"}), 400
         
-        title = request.form.get('title', file.filename)
-        doc_type = request.form.get('type', 'general')
+        document_id = store_upload(
+            current_user, file.filename, source_type, extracted_text, request.form, revision_of, base
+        )
         
-        print(f"Creating document: title={title}, type={doc_type}, user_id={current_user['id']}")
-        
-        document = {
-            "text": extracted_text,
-            "title": title,
-            "type": doc_type,
-            "uploaded_at": firestore.SERVER_TIMESTAMP,
-            "analyzed": False,
-            "source": source_type,
-            "filename": file.filename,
-            "user_id": current_user['id']
-        }
+        return jsonify({
+            "message": "Document uploaded successfully",
+            "document_id": document_id
+        }), 201
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def upload_session_fields(session):
+    return {
+        "upload_id": session['upload_id'],
+        "filename": session['filename'],
+        "size": session['size'],
+        "offset": session['offset'],
+        "chunk_size": upload_sessions.max_chunk_bytes,
+        "expires_at": datetime.fromtimestamp(session['expires_at'], timezone.utc).isoformat(),
+        "upload_url": f"/api/uploads/{session['upload_id']}"
+    }
+
+@api.route('/api/uploads', methods=['POST'])
+@token_required
+def create_upload(current_user):
+    """Start a resumable upload.
+    
+    Send {filename, size, title?, type?, revision_of?}, then PUT the file's
+    bytes to upload_url in chunks of at most chunk_size, each with its
+    starting byte in the Upload-Offset header, and finish with a POST to
+    upload_url + '/complete'. After a dropped connection, GET upload_url
+    tells where to resume.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        filename = data.get('filename') or ''
+        size = data.get('size')
         
-        doc_ref = documents_collection.document()
-        doc_ref.set(document)
+        if not filename.lower().endswith(UPLOAD_EXTENSIONS):
+            return jsonify({"error": "Unsupported file format. Please upload a PDF or image file (JPG, PNG, GIF, BMP, TIFF, WEBP)."}), 400
+        if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+            return jsonify({"error": "size must be the file size in bytes"}), 400
+        if data.get('revision_of') and revision_base(current_user, data['revision_of']) is None:
+            return jsonify({"error": "Document to revise not found"}), 404
         
-        print(f"Document created successfully with ID: {doc_ref.id}")
+        fields = {field: data[field] for field in ('title', 'type', 'revision_of') if data.get(field)}
+        try:
+            session = upload_sessions.create(current_user['id'], filename, size, fields)
+        except ChunkTooLargeError as e:
+            return jsonify({"error": str(e)}), 413
+        
+        return jsonify(upload_session_fields(session)), 201
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/api/uploads/<upload_id>', methods=['GET'])
+@token_required
+def get_upload(current_user, upload_id):
+    try:
+        return jsonify(upload_session_fields(upload_sessions.get(upload_id, current_user['id']))), 200
+    except UploadSessionNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/api/uploads/<upload_id>', methods=['PUT'])
+@token_required
+def upload_chunk(current_user, upload_id):
+    """Append the request body to the upload at the byte given by Upload-Offset"""
+    try:
+        try:
+            offset = int(request.headers.get('Upload-Offset', request.args.get('offset', '')))
+        except ValueError:
+            return jsonify({"error": "Upload-Offset header is required"}), 400
+        
+        try:
+            session = upload_sessions.write_chunk(
+                upload_id, current_user['id'], offset, request.stream, request.content_length
+            )
+        except UploadSessionNotFound as e:
+            return jsonify({"error": str(e)}), 404
+        except OffsetMismatchError as e:
+            return jsonify({"error": str(e), "offset": e.offset}), 409
+        except ChunkTooLargeError as e:
+            return jsonify({"error": str(e)}), 413
+        
+        return jsonify(upload_session_fields(session)), 200
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+@token_required
+def complete_upload(current_user, upload_id):
+    """Extract the assembled file and create its document, as /api/upload does.
+    
+    The session is only discarded once the document exists; after a failure
+    the client can call complete again, or cancel the upload.
+    """
+    try:
+        try:
+            fields = upload_sessions.get(upload_id, current_user['id'])['fields']
+            revision_of = fields.get('revision_of')
+            base = None
+            if revision_of:
+                base = revision_base(current_user, revision_of)
+                if base is None:
+                    return jsonify({"error": "Document to revise not found"}), 404
+            
+            with upload_sessions.completing(upload_id, current_user['id']) as (session, path):
+                try:
+                    extracted_text, source_type = extract_file_text(path, session['filename'])
+                except Exception as e:
+                    return jsonify({"error": f"Failed to process file: {str(e)}"}), 400
+                
+                if not extracted_text or len(extracted_text.strip()) < 10:
+                    return jsonify({"error": EMPTY_EXTRACTION_ERRORS[source_type]}), 400
+                
+                document_id = store_upload(
+                    current_user, session['filename'], source_type, extracted_text, fields, revision_of, base
+                )
+                upload_sessions.discard(upload_id)
+        
+        except UploadSessionNotFound as e:
+            return jsonify({"error": str(e)}), 404
+        except OffsetMismatchError as e:
+            return jsonify({"error": "Upload is incomplete", "offset": e.offset}), 409
         
         return jsonify({
             "message": "Document uploaded successfully",
-            "document_id": doc_ref.id
+            "document_id": document_id
         }), 201
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/analyze/<document_id>', methods=['POST'])
+@api.route('/api/uploads/<upload_id>', methods=['DELETE'])
 @token_required
-def analyze_document(current_user, document_id):
+def cancel_upload(current_user, upload_id):
     try:
-        doc_ref = documents_collection.document(document_id)
-        doc = doc_ref.get()
+        upload_sessions.get(upload_id, current_user['id'])
+        upload_sessions.discard(upload_id)
+        return jsonify({"message": "Upload cancelled"}), 200
+    except UploadSessionNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def bulk_upload_files(files):
+    """Files posted to the bulk endpoint, under either 'files' or 'file'"""
+    return [file for file in files.getlist('files') + files.getlist('file') if file.filename]
+
+def extracted_upload_error(entry):
+    if 'error' in entry:
+        return f"Failed to process file: {entry['error']}"
+    if len(entry['text'].strip()) < 10:
+        return EMPTY_EXTRACTION_ERRORS[entry['source']]
+    return None
+
+def queue_document_analysis(current_user, document_id, document):
+    """Submit a background analysis job; returns the job fields for the response"""
+    allowed, retry_after = analysis_rate_limiter.try_acquire(current_user['id'])
+    if not allowed:
+        return {"analysis_error": "Analysis rate limit reached", "retry_after": max(1, round(retry_after))}
+    
+    try:
+        job = analysis_jobs.submit(
+            current_user['id'], analyze_once, document_id, document,
+            current_user.get('preferred_languages', ()),
+            key=document_id, meta={'document_id': document_id}
+        )
+    except QueueFullError as e:
+        return {"analysis_error": str(e)}
+    
+    return {"job_id": job['id'], "status_url": f"/api/jobs/{job['id']}"}
+
+@api.route('/api/upload/bulk', methods=['POST'])
+@token_required
+def bulk_upload_documents(current_user):
+    """Upload several PDFs/images, or ZIP archives of them, in one request.
+    
+    Files are streamed to a temporary directory, extracted in parallel and
+    stored with batched writes. Every file gets its own entry in 'results'
+    with either a document_id or an error; with analyze=true each new
+    document is also queued for analysis.
+    """
+    try:
+        files = bulk_upload_files(request.files)
+        if not files:
+            return jsonify({"error": "No files provided. Please upload PDF or image documents, or a ZIP archive of them."}), 400
         
-        if not doc.exists:
-            return jsonify({"error": "Document not found"}), 404
+        queue_analysis = request.form.get('analyze', request.args.get('analyze', 'false')).lower() == 'true'
+        doc_type = request.form.get('type', 'general')
+        
+        with tempfile.TemporaryDirectory(prefix='bulk-upload-') as directory:
+            try:
+                entries = spool_uploads(files, directory, UPLOAD_EXTENSIONS)
+            except BulkUploadError as e:
+                return jsonify({"error": str(e)}), 400
+            
+            extract_all(entries, extract_file_text)
+        
+        results = []
+        created = []
+        for entry in entries:
+            result = {"filename": entry['filename']}
+            results.append(result)
+            
+            error = extracted_upload_error(entry)
+            if error:
+                result['error'] = error
+                continue
+            
+            filename = os.path.basename(entry['filename'])
+            document = new_document(current_user, filename, entry['source'], {'type': doc_type})
+            created.append((result, document, entry['text']))
+        
+        if created:
+            document_ids = repo.create_documents([(document, text) for _, document, text in created])
+            invalidate_document_list(current_user['id'])
+            
+            for (result, document, text), document_id in zip(created, document_ids):
+                result['document_id'] = document_id
+                index_document(document_id, document, text)
+                if queue_analysis:
+                    result.update(queue_document_analysis(current_user, document_id, document))
         
-        document = doc.to_dict()
+        print(f"Bulk upload: {len(created)} of {len(results)} files created for user_id={current_user['id']}")
         
-        if document['user_id'] != current_user['id']:
+        return jsonify({
+            "message": f"{len(created)} of {len(results)} files uploaded successfully",
+            "created": len(created),
+            "failed": len(results) - len(created),
+            "results": results
+        }), 201 if created else 400
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def parse_model_json(response_text):
+    """Parse a JSON answer from the model, unwrapping a ```json fence if present"""
+    json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
+    if json_match:
+        response_text = json_match.group(1)
+    
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError:
+        return None
+
+def analysis_data_from_response(analysis_text):
+    """Parse the model's analysis, falling back to the raw text as the summary"""
+    analysis_data = parse_model_json(analysis_text)
+    if analysis_data is None:
+        analysis_data = {
+            "plain_summary": analysis_text,
+            "key_terms": [],
+            "important_clauses": [],
+            "risks_and_concerns": [],
+            "unclear_items": [],
+            "parse_failed": True
+        }
+    
+    return analysis_data
+
+def generate_analysis_data(document_text, prompt_prefix=''):
+    """Call Gemini on the document text and parse its JSON answer"""
+    with metrics.timed('prompt_build'):
+        prompt = prompt_prefix + DEJARGONIZER_PROMPT.format(document_text=document_text)
+    
+    with metrics.timed('llm_call'):
+        response = llm_guard.call(model.generate_content, prompt)
+    
+    with metrics.timed('json_parse'):
+        return analysis_data_from_response(response.text)
+
+def analyze_chunk(chunk):
+    """Analyze one section unit of a long document; successful units are cached so retries and revisions skip them"""
+    return analysis_cache.get_or_compute(
+        content_hash(PROMPT_VERSION, 'chunk', chunk),
+        lambda: generate_analysis_data(chunk, prompt_prefix=CHUNK_PROMPT_NOTE),
+        cacheable=lambda data: not data.get('parse_failed')
+    )
+
+def summarize_chunks(summaries):
+    """Final reduce pass: combine per-chunk summaries into one plain language summary"""
+    section_summaries = "\n\n".join(
+        f"Section {index}: {summary}" for index, summary in enumerate(summaries, start=1)
+    )
+    
+    with metrics.timed('llm_call'):
+        response = llm_guard.call(model.generate_content, SUMMARY_PROMPT.format(section_summaries=section_summaries))
+    
+    with metrics.timed('json_parse'):
+        summary_data = parse_model_json(response.text)
+    if summary_data is None:
+        return {"plain_summary": response.text}
+    
+    return {"plain_summary": summary_data.get('plain_summary', '')}
+
+def analyze_chunks(chunks):
+    """Map-reduce analysis: analyze chunks concurrently, merge them, then summarize once"""
+    futures = [chunk_executor.submit(metrics.propagate(analyze_chunk), chunk) for chunk in chunks]
+    
+    parts = []
+    errors = []
+    for future in futures:
+        try:
+            parts.append(future.result())
+        except Exception as e:
+            errors.append(e)
+    
+    if errors:
+        raise Exception(f"{len(errors)} of {len(chunks)} document chunks failed to analyze: {errors[0]}")
+    
+    analysis_data = merge_analyses(parts)
+    
+    summaries = [part['plain_summary'] for part in parts if part.get('plain_summary')]
+    if len(summaries) == 1:
+        analysis_data['plain_summary'] = summaries[0]
+    elif summaries:
+        analysis_data['plain_summary'] = analysis_cache.get_or_compute(
+            content_hash(PROMPT_VERSION, 'summary', *summaries),
+            lambda: summarize_chunks(summaries)
+        )['plain_summary']
+    else:
+        analysis_data['plain_summary'] = ''
+    
+    if any(part.get('parse_failed') for part in parts):
+        analysis_data['parse_failed'] = True
+    
+    return analysis_data
+
+def revision_units(document_text):
+    return section_units(document_text, REVISION_SECTION_CHARS)
+
+def analysis_chunks(document_text):
+    # Every chunk is a model call: only close one early past half the target size
+    return section_units(document_text, ANALYSIS_CHUNK_SIZE, min_chars=ANALYSIS_CHUNK_SIZE // 2)
+
+def with_section_hashes(analysis_data, units):
+    """Record the hash of every unit, so the analysis of a revision can tell which units changed"""
+    return dict(analysis_data, section_hashes=[section_hash(unit) for unit in units])
+
+def is_fanned_out(document_text):
+    """Whether the document is too long for one prompt and is analyzed in units on the chunk pool"""
+    return len(document_text) > ANALYSIS_CHUNK_THRESHOLD
+
+def document_analysis_key(document_text):
+    if is_fanned_out(document_text):
+        return content_hash(PROMPT_VERSION, 'chunks', ANALYSIS_CHUNK_SIZE, REVISION_SECTION_CHARS, document_text)
+    return content_hash(PROMPT_VERSION, 'sections', REVISION_SECTION_CHARS, document_text)
+
+def analyze_document_text(document_text):
+    """Analyze a document in one prompt, or in cached section units when it exceeds the prompt budget"""
+    if is_fanned_out(document_text):
+        analysis_data = analyze_chunks(analysis_chunks(document_text))
+    else:
+        analysis_data = generate_analysis_data(document_text)
+    
+    return with_section_hashes(analysis_data, revision_units(document_text))
+
+def stored_section_hashes(document_id, analysis):
+    """Section hashes of an analysis, recomputed from the document's text for analyses saved without them"""
+    if analysis.get('section_hashes') is not None:
+        return analysis['section_hashes']
+    
+    document = repo.get_document(document_id)
+    if document is None:
+        return None
+    document_text, _ = compact_for_prompt(load_document_text(document_id, document), record=False)
+    return with_section_hashes({}, revision_units(document_text))['section_hashes']
+
+def revision_diff(document, analysis_data):
+    """What changed since the revised document's analysis, if it has one"""
+    base_id = document['revision_of']
+    base_analysis = repo.get_analysis(base_id)
+    if base_analysis is None:
+        return {"base_document_id": base_id, "base_analyzed": False}
+    
+    diff = diff_analyses(base_analysis, analysis_data)
+    diff.update({
+        "base_document_id": base_id,
+        "base_analyzed": True,
+        "sections": diff_sections(
+            stored_section_hashes(base_id, base_analysis), analysis_data.get('section_hashes', [])
+        )
+    })
+    
+    return diff
+
+def load_document_text(document_id, document):
+    """Extracted text of a document, loaded from its text chunks unless stored inline"""
+    return repo.load_text(document_id, document)
+
+def load_prompt_text(document_id, document):
+    """The document text the analysis is built from and its compaction stats; the stored text stays as extracted"""
+    return compact_for_prompt(load_document_text(document_id, document))
+
+def with_prompt_stats(analysis_data, stats):
+    if stats is None:
+        return analysis_data
+    return dict(analysis_data, prompt_compaction=stats)
+
+def analysis_version(analysis):
+    """Hash of the analysis content, used to tell stale stored translations apart"""
+    return content_hash(json.dumps({field: analysis.get(field) for field in ANALYSIS_FIELDS}, sort_keys=True))
+
+def build_translated_analysis(document_id, analysis, lang, version):
+    """Translate the analysis into ``lang`` and store it next to the analysis"""
+    translated = translate_analysis_fields(analysis, lang, translation_service)
+    
+    stored = {field: translated.get(field, analysis.get(field)) for field in ANALYSIS_FIELDS}
+    stored.update({
+        "document_id": document_id,
+        "title": analysis.get('title', ''),
+        "analyzed_at": analysis.get('analyzed_at', ''),
+        "lang": lang,
+        "analysis_version": version,
+        "translated_at": datetime.utcnow().isoformat()
+    })
+    
+    repo.save_translation(document_id, lang, stored)
+    
+    return stored
+
+def get_translated_analysis(document_id, lang, version=None, analysis=None):
+    """Return the stored translation of an analysis, building it once if missing or stale.
+    
+    Analyses saved before they were versioned get their version from their
+    content, so their stored translations are reused like any other.
+    """
+    translation = repo.get_translation(document_id, lang)
+    if version and translation and translation.get('analysis_version') == version:
+        return translation
+    
+    if analysis is None:
+        analysis = repo.get_analysis(document_id)
+        if analysis is None:
+            return None
+        serialize_timestamps(analysis, 'analyzed_at')
+    
+    version = analysis.get('version') or analysis_version(analysis)
+    if translation and translation.get('analysis_version') == version:
+        return translation
+    
+    return translation_flight.do(
+        f"{document_id}:{lang}", build_translated_analysis, document_id, analysis, lang, version
+    )
+
+def schedule_pretranslation(owner_id, document_id, analysis, languages):
+    for lang in languages:
+        if lang == ANALYSIS_LANGUAGE or lang not in SUPPORTED_LANGUAGES:
+            continue
+        try:
+            translation_jobs.submit(
+                owner_id, build_translated_analysis, document_id, analysis, lang, analysis['version'],
+                key=f"{document_id}:{lang}", meta={'document_id': document_id, 'lang': lang}
+            )
+        except QueueFullError:
+            print(f"Skipping pre-translation of {document_id} into {lang}: queue full")
+
+def compute_analysis(document_text):
+    """Analysis data for a document's extracted text, reusing any cached result for identical text"""
+    document_text, prompt_stats = compact_for_prompt(document_text)
+    analysis_data = analysis_cache.get_or_compute(
+        document_analysis_key(document_text),
+        lambda: analyze_document_text(document_text),
+        cacheable=lambda data: not data.get('parse_failed')
+    )
+    
+    return with_prompt_stats(analysis_data, prompt_stats)
+
+def run_analysis(document_id, document, preferred_languages=()):
+    """Analyze the document, persist and return it"""
+    analysis_data = compute_analysis(load_document_text(document_id, document))
+    
+    return save_analysis(document_id, document, analysis_data, preferred_languages)
+
+# Stored with the analysis, outside the translated fields
+EXTRA_ANALYSIS_FIELDS = ('section_hashes', 'revision_diff', 'prompt_compaction')
+
+def analysis_record(document_id, document, analysis_data):
+    """The analysis as stored, with its content version"""
+    analysis = {
+        "document_id": document_id,
+        "title": document.get('title', 'Untitled Document'),
+        "analyzed_at": repo.server_timestamp,
+        "plain_summary": analysis_data.get('plain_summary', ''),
+        "key_terms": analysis_data.get('key_terms', []),
+        "important_clauses": analysis_data.get('important_clauses', []),
+        "risks_and_concerns": analysis_data.get('risks_and_concerns', []),
+        "unclear_items": analysis_data.get('unclear_items', [])
+    }
+    for field in EXTRA_ANALYSIS_FIELDS:
+        if field in analysis_data:
+            analysis[field] = analysis_data[field]
+    analysis['version'] = analysis_version(analysis)
+    
+    return analysis
+
+def analyzed_document_fields(analysis):
+    return {
+        "analyzed": True,
+        "analyzed_at": repo.server_timestamp,
+        "analysis_version": analysis['version']
+    }
+
+def save_analysis(document_id, document, analysis_data, preferred_languages=()):
+    """Persist the analysis, mark the document analyzed and return the analysis as served"""
+    if document.get('revision_of'):
+        analysis_data = dict(analysis_data, revision_diff=revision_diff(document, analysis_data))
+    
+    analysis = analysis_record(document_id, document, analysis_data)
+    
+    # Analysis and document flag go out in one batch
+    repo.save_analysis(document_id, analysis, analyzed_document_fields(analysis))
+    
+    return analysis_saved(document_id, document, analysis, preferred_languages)
+
+def analysis_saved(document_id, document, analysis, preferred_languages=()):
+    """Drop stale listings, queue pre-translations and return the saved analysis as served"""
+    invalidate_document_list(document['user_id'])
+    index_analysis(document_id, document, analysis)
+    
+    analysis['id'] = document_id
+    analysis['analyzed_at'] = datetime.utcnow().isoformat()
+    
+    if preferred_languages:
+        schedule_pretranslation(document['user_id'], document_id, dict(analysis), preferred_languages)
+    
+    return analysis
+
+def check_analysis_rate(current_user):
+    """None when the user may start another analysis, else the 429 response"""
+    allowed, retry_after = analysis_rate_limiter.try_acquire(current_user['id'])
+    if allowed:
+        return None
+    
+    retry_after = max(1, round(retry_after))
+    response = jsonify({
+        "error": "You are starting analyses too quickly. Please try again shortly.",
+        "retry_after": retry_after
+    })
+    return response, 429, {'Retry-After': str(retry_after)}
+
+def llm_unavailable_response(error):
+    response = jsonify({"error": str(error), "retry_after": error.retry_after})
+    return response, 503, {'Retry-After': str(error.retry_after)}
+
+def analyze_once(document_id, document, preferred_languages=()):
+    """run_analysis, coalescing concurrent callers for the same document into one call"""
+    return analysis_flight.do(document_id, run_analysis, document_id, document, preferred_languages)
+
+async def owned_document(io, current_user, document_id):
+    document = await io.repo.get_document(document_id)
+    if document is None or document['user_id'] != current_user['id']:
+        return None
+    return document
+
+@api.route('/api/analyze/<document_id>', methods=['POST'])
+@token_required
+@io_route
+async def analyze_document(io, current_user, document_id):
+    try:
+        document = await owned_document(io, current_user, document_id)
+        if document is None:
             return jsonify({"error": "Document not found"}), 404
         
-        existing_analysis_doc = analyses_collection.document(document_id).get()
-        if existing_analysis_doc.exists:
-            existing_analysis = existing_analysis_doc.to_dict()
-            existing_analysis['id'] = existing_analysis_doc.id
-            if 'analyzed_at' in existing_analysis and hasattr(existing_analysis['analyzed_at'], 'isoformat'):
-                existing_analysis['analyzed_at'] = existing_analysis['analyzed_at'].isoformat()
+        existing_analysis = await io.repo.get_analysis(document_id)
+        if existing_analysis is not None:
+            serialize_timestamps(existing_analysis, 'analyzed_at')
             return jsonify(existing_analysis), 200
         
-        prompt = DEJARGONIZER_PROMPT.format(document_text=document['text'])
+        throttled = check_analysis_rate(current_user)
+        if throttled:
+            return throttled
         
-        response = model.generate_content(prompt)
-        analysis_text = response.text
+        mode = request.args.get('mode', ANALYSIS_MODE)
         
-        import json
-        import re
+        if mode == 'async':
+            try:
+                job = await io.blocking(
+                    analysis_jobs.submit, current_user['id'], analyze_once, document_id, document,
+                    current_user.get('preferred_languages', ()),
+                    key=document_id, meta={'document_id': document_id}
+                )
+            except QueueFullError as e:
+                return jsonify({"error": str(e)}), 503
+            
+            return jsonify({
+                "job_id": job['id'],
+                "status": job['status'],
+                "document_id": document_id,
+                "status_url": f"/api/jobs/{job['id']}"
+            }), 202
         
-        json_match = re.search(r'```json\s*(.*?)\s*```', analysis_text, re.DOTALL)
-        if json_match:
-            analysis_text = json_match.group(1)
+        analysis = await io.analyze(document_id, document, current_user.get('preferred_languages', ()))
         
-        try:
-            analysis_data = json.loads(analysis_text)
-        except json.JSONDecodeError:
-            analysis_data = {
-                "plain_summary": analysis_text,
-                "key_terms": [],
-                "important_clauses": [],
-                "risks_and_concerns": [],
-                "unclear_items": []
-            }
+        return jsonify(analysis), 200
+    
+    except LLMUnavailableError as e:
+        return llm_unavailable_response(e)
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/api/jobs/<job_id>', methods=['GET'])
+@token_required(read_only=True)
+def get_job(current_user, job_id):
+    job = analysis_jobs.get(job_id)
+    
+    if not job or job['owner_id'] != current_user['id']:
+        return jsonify({"error": "Job not found"}), 404
+    
+    job.pop('owner_id')
+    
+    return jsonify(job), 200
+
+def analysis_stream(document_id, document, preferred_languages=()):
+    """Yield SSE events for each analysis section as the model produces it; returns the saved analysis"""
+    document_text, prompt_stats = load_prompt_text(document_id, document)
+    cache_key = document_analysis_key(document_text)
+    analysis_data = analysis_cache.get(cache_key)
+    
+    if analysis_data is None and is_fanned_out(document_text):
+        analysis_data = analysis_cache.get_or_compute(
+            cache_key,
+            lambda: analyze_document_text(document_text),
+            cacheable=lambda data: not data.get('parse_failed')
+        )
+    
+    if analysis_data is None:
+        parser = AnalysisStreamParser()
+        parts = []
+        
+        with metrics.timed('prompt_build'):
+            prompt = DEJARGONIZER_PROMPT.format(document_text=document_text)
+        
+        # Includes the time spent sending events to the client
+        llm_started = time.perf_counter()
+        for chunk in llm_guard.stream(model.generate_content, prompt, stream=True):
+            parts.append(chunk.text)
+            for event in parser.feed(chunk.text):
+                if event[0] == 'item':
+                    yield sse_event('item', {'section': event[1], 'index': event[2], 'value': event[3]})
+                else:
+                    yield sse_event('section', {'section': event[1], 'value': event[2]})
         
-        analysis = {
-            "document_id": document_id,
-            "title": document.get('title', 'Untitled Document'),
-            "analyzed_at": firestore.SERVER_TIMESTAMP,
-            "plain_summary": analysis_data.get('plain_summary', ''),
-            "key_terms": analysis_data.get('key_terms', []),
-            "important_clauses": analysis_data.get('important_clauses', []),
-            "risks_and_concerns": analysis_data.get('risks_and_concerns', []),
-            "unclear_items": analysis_data.get('unclear_items', [])
-        }
+        metrics.observe('llm_call', time.perf_counter() - llm_started, mode='stream')
         
-        analyses_collection.document(document_id).set(analysis)
+        with metrics.timed('json_parse'):
+            analysis_data = with_section_hashes(
+                analysis_data_from_response(''.join(parts)), revision_units(document_text)
+            )
+        if not analysis_data.get('parse_failed'):
+            analysis_cache.set(cache_key, analysis_data)
+    else:
+        yield from analysis_section_events(analysis_data)
+    
+    return save_analysis(
+        document_id, document, with_prompt_stats(analysis_data, prompt_stats), preferred_languages
+    )
+
+def analysis_section_events(analysis):
+    for field in ANALYSIS_FIELDS:
+        yield sse_event('section', {'section': field, 'value': analysis.get(field)})
+
+def stream_analysis_events(document_id, document, preferred_languages=()):
+    """SSE events of the document's analysis, then persist.
+    
+    Shares analyze_once's single flight: a stream that arrives while the
+    document is already being analyzed waits for that analysis and sends its
+    sections instead of calling the model again.
+    """
+    yield sse_event('status', {'status': 'started', 'document_id': document_id})
+    
+    try:
+        analysis, led = yield from analysis_flight.stream(
+            document_id, analysis_stream, document_id, document, preferred_languages
+        )
+        if not led:
+            yield from analysis_section_events(analysis)
         
-        doc_ref.update({
-            "analyzed": True,
-            "analyzed_at": firestore.SERVER_TIMESTAMP
-        })
+        yield sse_event('done', analysis)
+    
+    except LLMUnavailableError as e:
+        yield sse_event('error', {'error': str(e), 'retry_after': e.retry_after})
+    
+    except Exception as e:
+        yield sse_event('error', {'error': str(e)})
+
+@api.route('/api/analyze/<document_id>/stream', methods=['GET'])
+@token_required
+def stream_analysis(current_user, document_id):
+    try:
+        document = repo.get_document(document_id)
         
-        analysis['id'] = document_id
-        analysis['analyzed_at'] = datetime.utcnow().isoformat()
+        if document is None or document['user_id'] != current_user['id']:
+            return jsonify({"error": "Document not found"}), 404
         
-        return jsonify(analysis), 200
+        existing_analysis = repo.get_analysis(document_id)
+        if existing_analysis is not None:
+            serialize_timestamps(existing_analysis, 'analyzed_at')
+            
+            events = [*analysis_section_events(existing_analysis), sse_event('done', existing_analysis)]
+        else:
+            throttled = check_analysis_rate(current_user)
+            if throttled:
+                return throttled
+            
+            events = stream_analysis_events(document_id, document, current_user.get('preferred_languages', ()))
+        
+        return Response(
+            stream_with_context(events),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/documents', methods=['GET'])
-@token_required
-def get_documents(current_user):
+def serialize_timestamps(record, *fields):
+    """Replace datetime fields with ISO strings so the record can be returned as JSON"""
+    for field in fields:
+        if field in record and hasattr(record[field], 'isoformat'):
+            record[field] = record[field].isoformat()
+    return record
+
+def encode_document_cursor(document):
+    uploaded_at = document.get('uploaded_at')
+    cursor = {
+        'uploaded_at': uploaded_at.isoformat() if hasattr(uploaded_at, 'isoformat') else None,
+        'id': document['id']
+    }
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode('utf-8')).decode('ascii')
+
+def decode_document_cursor(cursor):
     try:
-        print(f"Fetching documents for user: {current_user['id']}")
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        uploaded_at = datetime.fromisoformat(data['uploaded_at']) if data.get('uploaded_at') else datetime.min
+        if uploaded_at.tzinfo is None:
+            uploaded_at = uploaded_at.replace(tzinfo=timezone.utc)
+        return {'uploaded_at': uploaded_at, 'id': data['id']}
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def invalidate_document_list(user_id):
+    """Start a new version of the user's document list; returns it"""
+    version = uuid.uuid4().hex
+    document_list_versions.set(user_id, {'version': version})
+    return version
+
+def document_list_version(user_id):
+    record = document_list_versions.get(user_id)
+    return record['version'] if record else invalidate_document_list(user_id)
+
+def not_modified(etag):
+    """The 304 response when the request's If-None-Match already holds ``etag``, else None"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    return with_etag(Response(status=304), etag)
+
+def with_etag(response, etag):
+    response.set_etag(etag, weak=True)
+    # Clients may keep the body but must revalidate before using it
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def document_etag(document_id, document):
+    uploaded_at = document.get('uploaded_at')
+    return content_hash(
+        'document', document_id,
+        uploaded_at.isoformat() if hasattr(uploaded_at, 'isoformat') else '',
+        document.get('analysis_version') or ''
+    )[:32]
+
+def analysis_etag(document_id, version, lang):
+    return content_hash('analysis', document_id, version, lang or ANALYSIS_LANGUAGE)[:32]
+
+def page_etag(payload):
+    return content_hash(json.dumps(payload, sort_keys=True, default=str))[:32]
+
+def parse_document_list_args(args):
+    """(limit, cursor, fields, include_text) from the query string; raises ValueError for bad input"""
+    try:
+        limit = min(int(args.get('limit', DOCUMENTS_PAGE_SIZE)), DOCUMENTS_MAX_PAGE_SIZE)
+    except ValueError:
+        raise ValueError("limit must be a number")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    
+    cursor = args.get('cursor')
+    extra_fields = [field for field in args.get('fields', '').split(',') if field]
+    fields = list(dict.fromkeys(DOCUMENT_LIST_FIELDS + extra_fields))
+    include_text = 'text' in fields
+    if include_text:
+        fields += ['text_storage', 'text_chunks']
+    
+    return limit, cursor, fields, include_text
+
+def cached_document_page(user_id, version, cache_key):
+    """(payload, etag) of a listing page cached under the list ``version``, or None"""
+    return (document_list_cache.get((user_id, version)) or {}).get(cache_key)
+
+def cache_document_page(user_id, version, cache_key, payload):
+    """Cache a listing page under the list ``version``; returns its ETag"""
+    etag = page_etag(payload)
+    cached_pages = dict(document_list_cache.get((user_id, version)) or {})
+    cached_pages[cache_key] = (payload, etag)
+    document_list_cache.set((user_id, version), cached_pages)
+    return etag
+
+def document_page_response(payload, etag):
+    return not_modified(etag) or with_etag(jsonify(payload), etag)
+
+def split_document_page(page, limit):
+    """Trim the extra row fetched past ``limit``; returns (page, next_cursor)"""
+    if len(page) > limit:
+        page = page[:limit]
+        return page, encode_document_cursor(page[-1])
+    return page, None
+
+def serialize_listed_document(doc_data):
+    doc_data['_id'] = doc_data['id']
+    if 'uploaded_at' in doc_data and doc_data['uploaded_at'] is None:
+        doc_data['uploaded_at'] = datetime.utcnow().isoformat()
+    return serialize_timestamps(doc_data, 'uploaded_at', 'analyzed_at')
+
+@api.route('/api/documents', methods=['GET'])
+@token_required(read_only=True)
+@io_route
+async def get_documents(io, current_user):
+    try:
+        try:
+            limit, cursor, fields, include_text = parse_document_list_args(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Read before the listing, so a change landing meanwhile retires this page
+        version = await io.blocking(document_list_version, current_user['id'])
+        cache_key = (limit, cursor, tuple(fields))
+        cached_page = cached_document_page(current_user['id'], version, cache_key)
+        if cached_page is not None:
+            return document_page_response(*cached_page)
         
         try:
-            docs_query = documents_collection.where('user_id', '==', current_user['id']).order_by('uploaded_at', direction=firestore.Query.DESCENDING).stream()
-            documents = []
-            for doc in docs_query:
-                doc_data = doc.to_dict()
-                doc_data['id'] = doc.id
-                doc_data['_id'] = doc.id
-                
-                if 'uploaded_at' in doc_data and hasattr(doc_data['uploaded_at'], 'isoformat'):
-                    doc_data['uploaded_at'] = doc_data['uploaded_at'].isoformat()
-                if 'analyzed_at' in doc_data and hasattr(doc_data['analyzed_at'], 'isoformat'):
-                    doc_data['analyzed_at'] = doc_data['analyzed_at'].isoformat()
-                
-                documents.append(doc_data)
-                
-        except Exception as order_error:
-            print(f"Order by failed (index not ready), fetching without ordering: {order_error}")
-            docs_query = documents_collection.where('user_id', '==', current_user['id']).stream()
-            documents = []
-            for doc in docs_query:
-                doc_data = doc.to_dict()
-                doc_data['id'] = doc.id
-                doc_data['_id'] = doc.id
-                
-                if 'uploaded_at' in doc_data and hasattr(doc_data['uploaded_at'], 'isoformat'):
-                    doc_data['uploaded_at'] = doc_data['uploaded_at'].isoformat()
-                elif 'uploaded_at' in doc_data and doc_data['uploaded_at'] is None:
-                    doc_data['uploaded_at'] = datetime.utcnow().isoformat()
-                    
-                if 'analyzed_at' in doc_data and hasattr(doc_data['analyzed_at'], 'isoformat'):
-                    doc_data['analyzed_at'] = doc_data['analyzed_at'].isoformat()
-                
-                documents.append(doc_data)
-            
-            documents.sort(key=lambda x: x.get('uploaded_at', ''), reverse=True)
+            start_after = decode_document_cursor(cursor) if cursor else None
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        
+        # One extra row tells us whether there is a next page
+        page = await io.repo.list_documents(current_user['id'], fields, limit + 1, start_after=start_after)
+        page, next_cursor = split_document_page(page, limit)
         
-        print(f"Found {len(documents)} documents")
-        return jsonify({"documents": documents}), 200
+        if include_text:
+            texts = await io.gather(*(io.repo.load_text(doc_data['id'], doc_data) for doc_data in page))
+            for doc_data, text in zip(page, texts):
+                doc_data['text'] = text
+        
+        payload = {"documents": [serialize_listed_document(doc_data) for doc_data in page], "next_cursor": next_cursor}
+        etag = cache_document_page(current_user['id'], version, cache_key, payload)
+        
+        return document_page_response(payload, etag)
     
     except Exception as e:
         print(f"Error fetching documents: {str(e)}")
@@ -469,89 +1619,149 @@ def get_documents(current_user):
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/documents/<document_id>', methods=['GET'])
-@token_required
-def get_document(current_user, document_id):
+@api.route('/api/documents/<document_id>', methods=['GET'])
+@token_required(read_only=True)
+@io_route
+async def get_document(io, current_user, document_id):
     try:
-        doc_ref = documents_collection.document(document_id)
-        doc = doc_ref.get()
-        
-        if not doc.exists:
-            return jsonify({"error": "Document not found"}), 404
-        
-        document = doc.to_dict()
-        
-        if document['user_id'] != current_user['id']:
+        # The text lives in separate chunks, so a 304 costs one small read
+        document = await owned_document(io, current_user, document_id)
+        if document is None:
             return jsonify({"error": "Document not found"}), 404
         
-        document['id'] = doc.id
-        document['_id'] = doc.id
+        etag = document_etag(document_id, document)
+        unchanged = not_modified(etag)
+        if unchanged:
+            return unchanged
         
-        if 'uploaded_at' in document and hasattr(document['uploaded_at'], 'isoformat'):
-            document['uploaded_at'] = document['uploaded_at'].isoformat()
-        if 'analyzed_at' in document and hasattr(document['analyzed_at'], 'isoformat'):
-            document['analyzed_at'] = document['analyzed_at'].isoformat()
+        document['text'] = await io.repo.load_text(document_id, document)
+        document['_id'] = document_id
+        serialize_timestamps(document, 'uploaded_at', 'analyzed_at')
         
-        return jsonify(document), 200
+        return with_etag(jsonify(document), etag), 200
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/analysis/<document_id>', methods=['GET'])
-@token_required
-def get_analysis(current_user, document_id):
+@api.route('/api/analysis/<document_id>', methods=['GET'])
+@token_required(read_only=True)
+@io_route
+async def get_analysis(io, current_user, document_id):
     try:
-        doc_ref = documents_collection.document(document_id)
-        doc = doc_ref.get()
+        lang = request.args.get('lang')
         
-        if not doc.exists:
+        document = await owned_document(io, current_user, document_id)
+        if document is None:
             return jsonify({"error": "Document not found"}), 404
         
-        document = doc.to_dict()
-        if document['user_id'] != current_user['id']:
-            return jsonify({"error": "Document not found"}), 404
+        version = document.get('analysis_version')
+        if version:
+            unchanged = not_modified(analysis_etag(document_id, version, lang))
+            if unchanged:
+                return unchanged
         
-        analysis_doc = analyses_collection.document(document_id).get()
+        if lang and lang != ANALYSIS_LANGUAGE:
+            if lang not in SUPPORTED_LANGUAGES:
+                return jsonify({"error": f"Unsupported language: {lang}"}), 400
+            
+            translation = await io.blocking(
+                get_translated_analysis, document_id, lang, version=document.get('analysis_version')
+            )
+            if translation is None:
+                return jsonify({"error": "Analysis not found"}), 404
+            
+            translation['id'] = document_id
+            translation['_id'] = document_id
+            
+            etag = analysis_etag(document_id, translation['analysis_version'], lang)
+            return with_etag(jsonify(translation), etag), 200
         
-        if not analysis_doc.exists:
+        analysis = await io.repo.get_analysis(document_id)
+        
+        if analysis is None:
             return jsonify({"error": "Analysis not found"}), 404
         
-        analysis = analysis_doc.to_dict()
-        analysis['id'] = analysis_doc.id
-        analysis['_id'] = analysis_doc.id
+        analysis['_id'] = document_id
         
-        if 'analyzed_at' in analysis and hasattr(analysis['analyzed_at'], 'isoformat'):
-            analysis['analyzed_at'] = analysis['analyzed_at'].isoformat()
+        serialize_timestamps(analysis, 'analyzed_at')
         
-        return jsonify(analysis), 200
+        etag = analysis_etag(document_id, analysis.get('version') or analysis_version(analysis), lang)
+        return with_etag(jsonify(analysis), etag), 200
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/documents/<document_id>', methods=['DELETE'])
+@api.route('/api/documents/<document_id>', methods=['DELETE'])
 @token_required
-def delete_document(current_user, document_id):
+@io_route
+async def delete_document(io, current_user, document_id):
     try:
-        doc_ref = documents_collection.document(document_id)
-        doc = doc_ref.get()
-        
-        if not doc.exists:
+        document = await owned_document(io, current_user, document_id)
+        if document is None:
             return jsonify({"error": "Document not found"}), 404
         
-        document = doc.to_dict()
-        if document['user_id'] != current_user['id']:
-            return jsonify({"error": "Document not found"}), 404
-        
-        doc_ref.delete()
+        # Document, text chunks, analysis and stored translations in one batch
+        await io.repo.delete_document(document_id, document)
         
-        analyses_collection.document(document_id).delete()
+        await io.blocking(invalidate_document_list, current_user['id'])
+        await io.blocking(unindex_document, document_id)
         
         return jsonify({"message": "Document deleted successfully"}), 200
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/translate', methods=['POST'])
+def parse_search_args(args):
+    """(query, limit, offset) from the query string; raises ValueError for bad input"""
+    query = args.get('q', '').strip()
+    if not query:
+        raise ValueError("q is required")
+    
+    try:
+        limit = min(int(args.get('limit', SEARCH_PAGE_SIZE)), SEARCH_MAX_PAGE_SIZE)
+        offset = int(args.get('offset', 0))
+    except ValueError:
+        raise ValueError("limit and offset must be numbers")
+    if limit < 1 or offset < 0:
+        raise ValueError("limit must be at least 1 and offset at least 0")
+    
+    return query, limit, offset
+
+@api.route('/api/search', methods=['GET'])
+@token_required(read_only=True)
+def search_documents(current_user):
+    """Ranked full-text search over the user's documents and analyses, served from the local index"""
+    try:
+        try:
+            query, limit, offset = parse_search_args(request.args)
+            results, has_more = search_index.search(current_user['id'], query, limit, offset)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        return jsonify({
+            "query": query,
+            "results": results,
+            "next_offset": offset + len(results) if has_more else None
+        }), 200
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def wants_event_stream():
+    return 'text/event-stream' in request.headers.get('Accept', '')
+
+def translation_events(text, target_lang):
+    """SSE events for a chunked translation: one 'chunk' per translated chunk, in order, then 'done'"""
+    count = 0
+    try:
+        for index, chunk in enumerate(translation_service.translate_chunks(text, target_lang)):
+            count += 1
+            yield sse_event('chunk', {'index': index, 'text': chunk})
+        yield sse_event('done', {'target_lang': target_lang, 'chunks': count})
+    except Exception as e:
+        yield sse_event('error', {'error': f'Translation failed: {str(e)}'})
+
+@api.route('/api/translate', methods=['POST'])
 @token_required
 def translate_text(current_user):
     try:
@@ -562,8 +1772,14 @@ def translate_text(current_user):
         if not text:
             return jsonify({'error': 'Text is required'}), 400
         
-        translator = GoogleTranslator(source='auto', target=target_lang)
-        translated_text = translator.translate(text)
+        if wants_event_stream():
+            return Response(
+                stream_with_context(translation_events(text, target_lang)),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+        
+        translated_text = translation_service.translate_text(text, target_lang)
         
         return jsonify({
             'translated_text': translated_text,
@@ -573,7 +1789,7 @@ def translate_text(current_user):
     except Exception as e:
         return jsonify({'error': f'Translation failed: {str(e)}'}), 500
 
-@app.route('/api/translate-analysis', methods=['POST'])
+@api.route('/api/translate-analysis', methods=['POST'])
 @token_required
 def translate_analysis(current_user):
     try:
@@ -591,55 +1807,7 @@ def translate_analysis(current_user):
             print("ERROR: No analysis data provided")
             return jsonify({'error': 'Analysis data is required'}), 400
         
-        print("Initializing translator...")
-        translator = GoogleTranslator(source='auto', target=target_lang)
-        
-        translated_analysis = {}
-        
-        if analysis.get('plain_summary'):
-            print("Translating plain_summary...")
-            translated_analysis['plain_summary'] = translator.translate(
-                analysis['plain_summary']
-            )
-        
-        if analysis.get('key_terms'):
-            translated_analysis['key_terms'] = []
-            for term in analysis['key_terms']:
-                translated_term = {
-                    'term': translator.translate(term.get('term', '')),
-                    'explanation': translator.translate(term.get('explanation', ''))
-                }
-                translated_analysis['key_terms'].append(translated_term)
-        
-        if analysis.get('important_clauses'):
-            translated_analysis['important_clauses'] = []
-            for clause in analysis['important_clauses']:
-                translated_clause = {
-                    'clause': translator.translate(clause.get('clause', '')),
-                    'explanation': translator.translate(clause.get('explanation', '')),
-                    'section': translator.translate(clause.get('section', '')) if clause.get('section') else ''
-                }
-                translated_analysis['important_clauses'].append(translated_clause)
-        
-        if analysis.get('risks_and_concerns'):
-            translated_analysis['risks_and_concerns'] = []
-            for risk in analysis['risks_and_concerns']:
-                translated_risk = {
-                    'risk': translator.translate(risk.get('risk', '')),
-                    'explanation': translator.translate(risk.get('explanation', ''))
-                }
-                translated_analysis['risks_and_concerns'].append(translated_risk)
-        
-        if analysis.get('unclear_items'):
-            translated_analysis['unclear_items'] = []
-            for item in analysis['unclear_items']:
-                translated_analysis['unclear_items'].append(
-                    translator.translate(item)
-                )
-        
-        translated_analysis['title'] = analysis.get('title', '')
-        translated_analysis['analyzed_at'] = analysis.get('analyzed_at', '')
-        translated_analysis['document_id'] = analysis.get('document_id', '')
+        translated_analysis = translate_analysis_fields(analysis, target_lang, translation_service)
         
         print("Translation completed successfully")
         return jsonify({
@@ -653,45 +1821,47 @@ def translate_analysis(current_user):
         traceback.print_exc()
         return jsonify({'error': f'Translation failed: {str(e)}'}), 500
 
-@app.route('/api/languages', methods=['GET'])
+@api.route('/api/languages', methods=['GET'])
 def get_supported_languages():
-    languages = {
-        'en': 'English',
-        'es': 'Spanish',
-        'fr': 'French',
-        'de': 'German',
-        'it': 'Italian',
-        'pt': 'Portuguese',
-        'ru': 'Russian',
-        'ja': 'Japanese',
-        'ko': 'Korean',
-        'zh-cn': 'Chinese (Simplified)',
-        'zh-tw': 'Chinese (Traditional)',
-        'ar': 'Arabic',
-        'hi': 'Hindi',
-        'bn': 'Bengali',
-        'ta': 'Tamil',
-        'te': 'Telugu',
-        'ml': 'Malayalam',
-        'kn': 'Kannada',
-        'mr': 'Marathi',
-        'gu': 'Gujarati',
-        'pa': 'Punjabi',
-        'ur': 'Urdu',
-        'nl': 'Dutch',
-        'pl': 'Polish',
-        'tr': 'Turkish',
-        'vi': 'Vietnamese',
-        'th': 'Thai',
-        'id': 'Indonesian',
-        'ms': 'Malay',
-        'fil': 'Filipino',
-        'sv': 'Swedish',
-        'da': 'Danish',
-        'no': 'Norwegian',
-        'fi': 'Finnish'
-    }
-    return jsonify({'languages': languages}), 200
+    return jsonify({'languages': SUPPORTED_LANGUAGES}), 200
+
+# Largest request body accepted, bulk uploads included; larger ones get 413
+MAX_REQUEST_BYTES = int(os.getenv('MAX_REQUEST_BYTES', str(512 * 1024 * 1024)))
+
+def create_app():
+    """Build the Flask app around the API blueprint; cheap, nothing heavy is loaded here"""
+    app = Flask(__name__)
+    app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
+    CORS(app)
+    app.register_blueprint(api)
+    return app
+
+def preload_modules():
+    """Import the heavy libraries. Safe before forking: no clients, threads or pools are created"""
+    import extraction
+    import ocr
+    import google.generativeai
+    import deep_translator
+    if STORAGE_BACKEND == 'firestore':
+        import firebase_admin.firestore
+
+def warm_up():
+    """Load what the first request would otherwise pay for; returns the seconds it took.
+    
+    Creates the Firestore and Gemini clients, so call it in each worker
+    after the fork (gunicorn's post_worker_init, or the ASGI lifespan startup)
+    rather than in a preloading master process.
+    """
+    started = time.perf_counter()
+    preload_modules()
+    load(repository)
+    load(model)
+    load(analysis_store)
+    load(translation_store)
+    load(text_index)
+    return time.perf_counter() - started
+
+app = create_app()
 
 
 if __name__ == '__main__':
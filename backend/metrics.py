@@ -0,0 +1,218 @@
+import contextvars
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_PREFIX = os.getenv('METRICS_PREFIX', 'dejargonizer')
+
+# Seconds; covers in-memory lookups up to long Gemini calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Stage timings of the request being served, for the Server-Timing header
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][index] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, **kwargs):
+        name = f"{METRICS_PREFIX}_{name}"
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name, help_text):
+        return self._get_or_create(Counter, name, help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def render(self):
+        """Prometheus text exposition format"""
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram('stage_duration_seconds', 'Time spent in each stage of the request path')
+stage_errors = registry.counter('stage_errors_total', 'Stages that raised an exception')
+request_seconds = registry.histogram('request_duration_seconds', 'Request latency by route')
+requests_total = registry.counter('requests_total', 'Requests served by route and status')
+
+
+def observe(stage, seconds, **labels):
+    """Record a stage duration in the histogram and in the current request's timings"""
+    stage_seconds.observe(seconds, stage=stage, **labels)
+
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(stage=stage, **labels)
+        raise
+    finally:
+        observe(stage, time.perf_counter() - start, **labels)
+
+
+def start_request():
+    """Begin collecting stage timings for the request served by this context"""
+    return _request_timings.set([])
+
+
+def current_timings():
+    return list(_request_timings.get() or [])
+
+
+def finish_request(token):
+    """Stop collecting and return the request's stage timings as (stage, seconds) pairs"""
+    timings = _request_timings.get() or []
+    _request_timings.reset(token)
+    return timings
+
+
+def server_timing_header(timings, total=None):
+    """Server-Timing value with one entry per stage; repeated stages are summed"""
+    totals = {}
+    counts = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+        counts[stage] = counts.get(stage, 0) + 1
+
+    entries = []
+    for stage, seconds in totals.items():
+        entry = f"{stage};dur={seconds * 1000:.1f}"
+        if counts[stage] > 1:
+            entry += f';desc="{counts[stage]} calls"'
+        entries.append(entry)
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def propagate(func):
+    """Wrap ``func`` so a pool thread running it reports into the submitting request's timings"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(func, *args, **kwargs)
+
+
+class TimedProxy:
+    """Times every method call on the wrapped object as ``stage`` with an ``op`` label"""
+
+    def __init__(self, target, stage):
+        self._target = target
+        self._stage = stage
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if name.startswith('_') or not callable(value):
+            return value
+
+        if inspect.iscoroutinefunction(value):
+            async def call_async(*args, **kwargs):
+                with timed(self._stage, op=name):
+                    return await value(*args, **kwargs)
+
+            return call_async
+
+        def call(*args, **kwargs):
+            with timed(self._stage, op=name):
+                return value(*args, **kwargs)
+
+        return call
@@ -0,0 +1,190 @@
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+import pytesseract
+
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', str(os.cpu_count() or 2)))
+OCR_PAGE_TIMEOUT = float(os.getenv('OCR_PAGE_TIMEOUT', '60'))
+# Tesseract works best around 300 DPI; anything above is downscaled while decoding
+OCR_TARGET_DPI = int(os.getenv('OCR_TARGET_DPI', '300'))
+# Used when an image carries no DPI information
+OCR_MAX_DIMENSION = int(os.getenv('OCR_MAX_DIMENSION', '3500'))
+OCR_BINARIZE = os.getenv('OCR_BINARIZE', 'true').lower() == 'true'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS)
+        return _pool
+
+
+def otsu_threshold(histogram):
+    """Otsu's threshold for a 256-bin grayscale histogram"""
+    total = sum(histogram)
+    if not total:
+        return 127
+
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    background = 0
+    background_sum = 0
+    best_threshold = 127
+    best_variance = 0.0
+
+    for level, count in enumerate(histogram):
+        background += count
+        if not background:
+            continue
+        foreground = total - background
+        if not foreground:
+            break
+        background_sum += level * count
+        background_mean = background_sum / background
+        foreground_mean = (weighted_total - background_sum) / foreground
+        variance = background * foreground * (background_mean - foreground_mean) ** 2
+        if variance > best_variance:
+            best_variance = variance
+            best_threshold = level
+
+    return best_threshold
+
+
+def target_size(image, source_dpi=None):
+    """Size to decode the image at so it lands near OCR_TARGET_DPI"""
+    width, height = image.size
+    scale = 1.0
+
+    if source_dpi and source_dpi > OCR_TARGET_DPI:
+        scale = OCR_TARGET_DPI / source_dpi
+    if max(width, height) * scale > OCR_MAX_DIMENSION:
+        scale = OCR_MAX_DIMENSION / max(width, height)
+
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def preprocess(image, source_dpi=None):
+    """Downscale, convert to grayscale and binarize an image for tesseract.
+
+    ``draft`` lets JPEG decode directly at a reduced scale in grayscale, so
+    large photos never materialize at full resolution in RGB. Other formats
+    decode at full size and are reduced by a whole factor before the
+    grayscale conversion, which then runs on the smaller frame.
+    """
+    size = target_size(image, source_dpi)
+    if size != image.size:
+        image.draft('L', size)
+
+    factor = min(image.width // size[0], image.height // size[1])
+    if factor >= 2 and image.mode in ('L', 'RGB', 'RGBA'):
+        image = image.reduce(factor)
+
+    image = image.convert('L')
+    if image.size != size:
+        image = image.resize(size, Image.LANCZOS)
+
+    image = ImageOps.autocontrast(image)
+
+    if OCR_BINARIZE:
+        threshold = otsu_threshold(image.histogram())
+        image = image.point([255 if level > threshold else 0 for level in range(256)])
+
+    return image
+
+
+def _run_tesseract(image):
+    try:
+        return pytesseract.image_to_string(image, timeout=OCR_PAGE_TIMEOUT).strip()
+    except RuntimeError as e:
+        # pytesseract raises RuntimeError when the page times out
+        print(f"OCR skipped a page: {e}")
+        return ''
+
+
+def _ocr_image_frame(path, frame):
+    """OCR one frame of the image file at ``path``; runs inside a pool worker"""
+    with Image.open(path) as image:
+        if frame:
+            image.seek(frame)
+        dpi = image.info.get('dpi', (0, 0))[0]
+        return _run_tesseract(preprocess(image, source_dpi=dpi))
+
+
+def _ocr_pdf_page(path, index):
+    """Rasterize one PDF page at OCR_TARGET_DPI and OCR it; runs inside a pool worker"""
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(path)
+    try:
+        bitmap = pdf[index].render(scale=OCR_TARGET_DPI / 72, grayscale=True)
+        image = bitmap.to_pil()
+    finally:
+        pdf.close()
+    return _run_tesseract(preprocess(image))
+
+
+def _map(func, calls, raise_errors=False):
+    """Run the calls on the OCR pool (or inline with a single worker) preserving order.
+
+    A failed page becomes '' unless ``raise_errors`` is set.
+    """
+    results = []
+
+    if OCR_WORKERS <= 1 or len(calls) <= 1:
+        for args in calls:
+            try:
+                results.append(func(*args))
+            except Exception as e:
+                if raise_errors:
+                    raise
+                print(f"OCR page failed: {e}")
+                results.append('')
+        return results
+
+    pool = get_pool()
+    futures = [pool.submit(func, *args) for args in calls]
+    for future in futures:
+        try:
+            # Backstop in case tesseract's own timeout does not fire
+            results.append(future.result(timeout=OCR_PAGE_TIMEOUT * 2 + 30))
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"OCR page failed: {e}")
+            results.append('')
+    return results
+
+
+def ocr_image_frames(path):
+    """OCR every frame of the image file at ``path``; pool tasks get the path and a frame index, not the bytes"""
+    with Image.open(path) as image:
+        frame_count = getattr(image, 'n_frames', 1)
+
+    texts = _map(_ocr_image_frame, [(path, frame) for frame in range(frame_count)], raise_errors=True)
+    return "\n\n".join(text for text in texts if text)
+
+
+def ocr_image(image_file):
+    """OCR every frame of an image file object or path (multi-page TIFFs included), one frame per paragraph block"""
+    if isinstance(image_file, (str, os.PathLike)):
+        return ocr_image_frames(image_file)
+
+    image_file.seek(0)
+    with tempfile.NamedTemporaryFile() as spool:
+        shutil.copyfileobj(image_file, spool)
+        spool.flush()
+        return ocr_image_frames(spool.name)
+
+
+def ocr_pdf_pages(path, page_indexes):
+    """OCR the given pages of a scanned PDF; returns {page_index: text}"""
+    page_indexes = list(page_indexes)
+    texts = _map(_ocr_pdf_page, [(path, index) for index in page_indexes])
+    return dict(zip(page_indexes, texts))
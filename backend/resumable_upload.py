@@ -0,0 +1,204 @@
+import fcntl
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+from bulk_upload import COPY_BLOCK_BYTES
+
+# Where sessions are spooled; worker processes on one host share it
+UPLOAD_SESSION_DIR = os.getenv('UPLOAD_SESSION_DIR', os.path.join(tempfile.gettempdir(), 'upload-sessions'))
+UPLOAD_CHUNK_MAX_BYTES = int(os.getenv('UPLOAD_CHUNK_MAX_BYTES', str(8 * 1024 * 1024)))
+UPLOAD_MAX_FILE_BYTES = int(os.getenv('UPLOAD_MAX_FILE_BYTES', str(100 * 1024 * 1024)))
+# Seconds a session lives after its last chunk
+UPLOAD_SESSION_TTL = int(os.getenv('UPLOAD_SESSION_TTL', str(24 * 60 * 60)))
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadSessionError(Exception):
+    pass
+
+
+class UploadSessionNotFound(UploadSessionError):
+    pass
+
+
+class OffsetMismatchError(UploadSessionError):
+    """A chunk did not start where the upload stands; ``offset`` is where it does"""
+
+    def __init__(self, offset):
+        super().__init__(f"Upload is at offset {offset}")
+        self.offset = offset
+
+
+class ChunkTooLargeError(UploadSessionError):
+    pass
+
+
+class UploadSessions:
+    """Resumable uploads spooled to disk, one chunk at a time.
+
+    A session is a JSON file describing the upload and a ``.part`` file its
+    chunks are appended to, so the offset to resume from is just the size of
+    the part file and a dropped connection loses at most the chunk in flight.
+    Chunks have to arrive in order: one that does not start at the current
+    offset is refused with that offset, which also makes a retried chunk
+    whose answer was lost harmless. Writes to an upload are serialized by a
+    lock on its part file, which holds across worker processes. Sessions
+    expire UPLOAD_SESSION_TTL seconds after their last chunk.
+    """
+
+    def __init__(self, directory=UPLOAD_SESSION_DIR, max_chunk_bytes=UPLOAD_CHUNK_MAX_BYTES,
+                 max_file_bytes=UPLOAD_MAX_FILE_BYTES, ttl=UPLOAD_SESSION_TTL):
+        self.directory = directory
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_file_bytes = max_file_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, upload_id, suffix):
+        return os.path.join(self.directory, f"{upload_id}{suffix}")
+
+    @contextmanager
+    def _lock(self, upload_id):
+        """Hold the upload against every worker process sharing the directory.
+
+        An flock on the part file, which the kernel releases if the holder
+        dies; raises UploadSessionNotFound when there is no such upload.
+        """
+        if not _UPLOAD_ID.match(upload_id or ''):
+            raise UploadSessionNotFound("Upload not found")
+        try:
+            part = open(self._path(upload_id, '.part'), 'rb')
+        except OSError:
+            raise UploadSessionNotFound("Upload not found")
+
+        with part:
+            fcntl.flock(part, fcntl.LOCK_EX)
+            yield
+
+    def _write_meta(self, session):
+        path = self._path(session['upload_id'], '.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(session, f)
+        os.replace(path + '.tmp', path)
+
+    def _load(self, upload_id, user_id):
+        """The user's live session with its current offset; raises UploadSessionNotFound"""
+        if not _UPLOAD_ID.match(upload_id or ''):
+            raise UploadSessionNotFound("Upload not found")
+        try:
+            with open(self._path(upload_id, '.json')) as f:
+                session = json.load(f)
+            offset = os.path.getsize(self._path(upload_id, '.part'))
+        except (OSError, ValueError):
+            raise UploadSessionNotFound("Upload not found")
+
+        if session['user_id'] != user_id:
+            raise UploadSessionNotFound("Upload not found")
+        if session['expires_at'] < time.time():
+            self.discard(upload_id)
+            raise UploadSessionNotFound("Upload has expired")
+
+        session['offset'] = offset
+        return session
+
+    def create(self, user_id, filename, size, fields=None):
+        """Start an upload of ``size`` bytes; ``fields`` are kept for the finished upload"""
+        if size > self.max_file_bytes:
+            raise ChunkTooLargeError(f"File is larger than {self.max_file_bytes // (1024 * 1024)} MB")
+        self.purge_expired()
+
+        session = {
+            'upload_id': uuid.uuid4().hex,
+            'user_id': user_id,
+            'filename': filename,
+            'size': size,
+            'fields': fields or {},
+            'created_at': time.time(),
+            'expires_at': time.time() + self.ttl,
+        }
+        open(self._path(session['upload_id'], '.part'), 'wb').close()
+        self._write_meta(session)
+        session['offset'] = 0
+        return session
+
+    def get(self, upload_id, user_id):
+        return self._load(upload_id, user_id)
+
+    def write_chunk(self, upload_id, user_id, offset, stream, length=None):
+        """Append the chunk read from ``stream`` at ``offset``; returns the session with its new offset"""
+        if length is not None and length > self.max_chunk_bytes:
+            raise ChunkTooLargeError(f"Chunks may be at most {self.max_chunk_bytes} bytes")
+
+        with self._lock(upload_id):
+            session = self._load(upload_id, user_id)
+            if offset != session['offset']:
+                raise OffsetMismatchError(session['offset'])
+            limit = min(self.max_chunk_bytes, session['size'] - offset)
+            if length is not None and length > limit:
+                raise ChunkTooLargeError(f"Chunk runs past the declared size of {session['size']} bytes")
+
+            with open(self._path(upload_id, '.part'), 'ab') as part:
+                written = 0
+                try:
+                    while True:
+                        block = stream.read(min(COPY_BLOCK_BYTES, limit - written + 1))
+                        if not block:
+                            break
+                        written += len(block)
+                        if written > limit:
+                            raise ChunkTooLargeError(f"Chunk is larger than the {limit} bytes allowed at offset {offset}")
+                        part.write(block)
+                except ChunkTooLargeError:
+                    part.truncate(offset)
+                    raise
+                # Without a length a short read is all that arrived; keep it, the client resumes after it
+
+            session['expires_at'] = time.time() + self.ttl
+            self._write_meta({key: value for key, value in session.items() if key != 'offset'})
+            session['offset'] = offset + written
+            return session
+
+    @contextmanager
+    def completing(self, upload_id, user_id):
+        """Hold a fully received upload; yields (session, path of the assembled file).
+
+        Nothing else can touch the upload inside the block. The session is left
+        as it is: the caller discards it once the upload has been turned into a
+        document, so a failed attempt can be retried until the session expires.
+        """
+        with self._lock(upload_id):
+            session = self._load(upload_id, user_id)
+            if session['offset'] != session['size']:
+                raise OffsetMismatchError(session['offset'])
+            yield session, self._path(upload_id, '.part')
+
+    def discard(self, upload_id):
+        for suffix in ('.json', '.part'):
+            try:
+                os.remove(self._path(upload_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    def purge_expired(self):
+        """Remove sessions past their expiry; returns how many"""
+        now = time.time()
+        purged = 0
+        for name in os.listdir(self.directory):
+            upload_id, suffix = os.path.splitext(name)
+            if suffix != '.json' or not _UPLOAD_ID.match(upload_id):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    expired = json.load(f)['expires_at'] < now
+            except (OSError, ValueError, KeyError):
+                continue
+            if expired:
+                self.discard(upload_id)
+                purged += 1
+        return purged
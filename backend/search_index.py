@@ -0,0 +1,229 @@
+import html
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+# SQLite file holding the index; each host keeps its own
+SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH', 'search_index.db')
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '20'))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv('SEARCH_MAX_PAGE_SIZE', '100'))
+SEARCH_SNIPPET_TOKENS = int(os.getenv('SEARCH_SNIPPET_TOKENS', '16'))
+
+# Indexed columns in table order, with their bm25 weight; user_id only scopes queries
+COLUMNS = (
+    ('user_id', 0.0),
+    ('title', 10.0),
+    ('text', 1.0),
+    ('summary', 2.0),
+    ('key_terms', 5.0),
+    ('clauses', 3.0),
+    ('risks', 3.0),
+)
+CONTENT_COLUMNS = [name for name, _ in COLUMNS if name != 'user_id']
+ANALYSIS_COLUMNS = {
+    'summary': 'plain_summary',
+    'key_terms': 'key_terms',
+    'clauses': 'important_clauses',
+    'risks': 'risks_and_concerns',
+}
+
+# snippet() and highlight() mark matches with these, swapped for <mark> once the text is escaped
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+_QUERY_PART = re.compile(r'"([^"]*)"|(\S+)')
+_TOKEN = re.compile(r'\w+')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS search_documents (
+    rowid INTEGER PRIMARY KEY,
+    document_id TEXT NOT NULL UNIQUE,
+    user_id TEXT NOT NULL,
+    title TEXT,
+    type TEXT,
+    filename TEXT,
+    indexed_at TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS search_text USING fts5(
+    {', '.join(name for name, _ in COLUMNS)},
+    tokenize = 'porter unicode61'
+);
+"""
+
+
+class InvalidQueryError(ValueError):
+    pass
+
+
+def _phrase(tokens):
+    return '"' + ' '.join(tokens) + '"'
+
+
+def build_match(user_id, query):
+    """FTS5 MATCH expression for ``query`` limited to the user's documents.
+
+    Words and "quoted phrases" must all match, words in any inflection
+    ("penalties" finds "penalty"). Punctuation is dropped, so FTS5 query
+    syntax in the input is never interpreted. Raises InvalidQueryError when
+    nothing searchable is left.
+    """
+    terms = []
+    for phrase, word in _QUERY_PART.findall(query):
+        tokens = _TOKEN.findall(phrase or word)
+        if tokens:
+            terms.append(_phrase(tokens))
+
+    if not terms:
+        raise InvalidQueryError("Query must contain at least one word")
+
+    user = _phrase(_TOKEN.findall(user_id))
+    return f"user_id : {user} AND {{{' '.join(CONTENT_COLUMNS)}}} : ({' AND '.join(terms)})"
+
+
+def _flatten(value):
+    """Searchable text of an analysis field: strings as they are, lists of dicts by their values"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return '\n'.join(_flatten(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return '\n'.join(_flatten(item) for item in value)
+    return ''
+
+
+def _best_snippet(snippets):
+    """The first column snippet with a match in it; the user_id column is never shown"""
+    return next((snippet for snippet in snippets if snippet and _MARK_START in snippet), snippets[0])
+
+
+def _marked(text):
+    return html.escape(text or '').replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+
+class SearchIndex:
+    """Full-text index of documents and their analyses in SQLite FTS5.
+
+    Kept up to date by the upload, analysis and delete paths, so searching
+    never reads the document store. Matches are ranked with bm25, weighting
+    titles and key terms above body text. One connection is shared by all
+    threads behind a lock; SQLite itself coordinates worker processes
+    writing to the same file.
+    """
+
+    def __init__(self, path=SEARCH_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA busy_timeout = 5000')
+        if path != ':memory:':
+            self._db.execute('PRAGMA journal_mode = WAL')
+        self._db.executescript(SCHEMA)
+
+    def _rowid(self, document_id):
+        row = self._db.execute(
+            'SELECT rowid FROM search_documents WHERE document_id = ?', (document_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _upsert(self, document_id, user_id, document, columns):
+        """Write ``columns`` of the document's row, creating the row when it is not indexed yet"""
+        meta = (document.get('title'), document.get('type'), document.get('filename'), datetime.utcnow().isoformat())
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                rowid = self._rowid(document_id)
+                if rowid is None:
+                    rowid = self._db.execute(
+                        'INSERT INTO search_documents (document_id, user_id, title, type, filename, indexed_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?)',
+                        (document_id, user_id) + meta
+                    ).lastrowid
+                    columns = dict(columns, user_id=user_id, title=document.get('title') or '')
+                    self._db.execute(
+                        f"INSERT INTO search_text (rowid, {', '.join(columns)}) "
+                        f"VALUES (?, {', '.join('?' * len(columns))})",
+                        (rowid, *columns.values())
+                    )
+                else:
+                    self._db.execute(
+                        'UPDATE search_documents SET title = ?, type = ?, filename = ?, indexed_at = ? WHERE rowid = ?',
+                        meta + (rowid,)
+                    )
+                    columns = dict(columns, title=document.get('title') or '')
+                    self._db.execute(
+                        f"UPDATE search_text SET {', '.join(f'{name} = ?' for name in columns)} WHERE rowid = ?",
+                        (*columns.values(), rowid)
+                    )
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def index_document(self, document_id, document, text):
+        """Index a document's title and extracted text"""
+        self._upsert(document_id, document['user_id'], document, {'text': text or ''})
+
+    def index_analysis(self, document_id, document, analysis):
+        """Index the summary, key terms, clauses and risks of the document's analysis"""
+        columns = {column: _flatten(analysis.get(field)) for column, field in ANALYSIS_COLUMNS.items()}
+        self._upsert(document_id, document['user_id'], document, columns)
+
+    def remove_document(self, document_id):
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                rowid = self._rowid(document_id)
+                if rowid is not None:
+                    self._db.execute('DELETE FROM search_text WHERE rowid = ?', (rowid,))
+                    self._db.execute('DELETE FROM search_documents WHERE rowid = ?', (rowid,))
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def search(self, user_id, query, limit=SEARCH_PAGE_SIZE, offset=0):
+        """One page of the user's documents matching ``query``, best first; returns (results, has_more)"""
+        match = build_match(user_id, query)
+        weights = ', '.join(str(weight) for _, weight in COLUMNS)
+        snippets = ', '.join(
+            f"snippet(search_text, {index}, :start, :end, '…', :tokens)"
+            for index, (name, _) in enumerate(COLUMNS) if name not in ('user_id', 'title')
+        )
+
+        with self._lock:
+            rows = self._db.execute(
+                f"""
+                SELECT d.document_id, d.title, d.type, d.filename,
+                       bm25(search_text, {weights}) AS score,
+                       highlight(search_text, 1, :start, :end),
+                       {snippets}
+                FROM search_text JOIN search_documents d ON d.rowid = search_text.rowid
+                WHERE search_text MATCH :match AND d.user_id = :user_id
+                ORDER BY score
+                LIMIT :limit OFFSET :offset
+                """,
+                {
+                    'start': _MARK_START, 'end': _MARK_END, 'tokens': SEARCH_SNIPPET_TOKENS,
+                    'match': match, 'user_id': user_id, 'limit': limit + 1, 'offset': offset,
+                }
+            ).fetchall()
+
+        results = [
+            {
+                "document_id": document_id,
+                "title": title,
+                "type": doc_type,
+                "filename": filename,
+                # bm25 is lower for better matches
+                "score": round(-score, 4),
+                "highlights": {"title": _marked(title_highlight), "snippet": _marked(_best_snippet(snippets))},
+            }
+            for document_id, title, doc_type, filename, score, title_highlight, *snippets in rows[:limit]
+        ]
+        return results, len(rows) > limit
+
+    def stats(self):
+        with self._lock:
+            documents = self._db.execute('SELECT count(*) FROM search_documents').fetchone()[0]
+        return {"path": self.path, "documents": documents}
@@ -0,0 +1,761 @@
+import asyncio
+import contextvars
+import copy
+import os
+import threading
+import time
+import uuid
+import zlib
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+
+from text_store import delete_text, load_text, load_text_async, prepare_text, store_text, write_chunks
+
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'firestore')
+
+# Firestore rejects batches of more than 500 writes, and requests over 10 MiB;
+# text chunks run up to 512 KiB, so batches are also capped by their payload
+FIRESTORE_BATCH_WRITES = 500
+FIRESTORE_BATCH_BYTES = int(os.getenv('FIRESTORE_BATCH_BYTES', str(9 * 1024 * 1024)))
+# Allowance per write for document paths and field names
+FIRESTORE_WRITE_OVERHEAD_BYTES = 1024
+
+
+def _write_bytes(document, chunks):
+    """Rough size of the writes creating ``document`` and its text ``chunks``"""
+    return (
+        len(repr(document))
+        + sum(len(chunk) for chunk in chunks)
+        + FIRESTORE_WRITE_OVERHEAD_BYTES * (len(chunks) + 1)
+    )
+
+
+def _sort_key(document):
+    """(uploaded_at, id) in UTC; documents are listed newest first by this key"""
+    uploaded_at = document.get('uploaded_at') or datetime.min
+    if uploaded_at.tzinfo is None:
+        uploaded_at = uploaded_at.replace(tzinfo=timezone.utc)
+    return uploaded_at, document['id']
+
+
+class Repository(ABC):
+    """Storage interface used by the API routes.
+
+    Records are plain dicts carrying their id under ``'id'``. Methods that touch
+    more than one record (creating a document with its text, saving an analysis
+    and flagging its document, deleting a document with everything hanging off
+    it) commit as a single batch. ``server_timestamp`` is the value to store
+    for "now" in timestamp fields.
+    """
+
+    server_timestamp = None
+
+    # Users
+    @abstractmethod
+    def get_user(self, user_id):
+        ...
+
+    @abstractmethod
+    def find_user_by_email(self, email):
+        ...
+
+    @abstractmethod
+    def create_user(self, user):
+        ...
+
+    @abstractmethod
+    def update_user(self, user_id, fields):
+        ...
+
+    # Documents
+    @abstractmethod
+    def get_document(self, document_id):
+        ...
+
+    @abstractmethod
+    def create_document(self, document, text):
+        ...
+
+    @abstractmethod
+    def create_documents(self, items):
+        """Create a document per (document, text) pair; returns the new ids in order"""
+
+    @abstractmethod
+    def update_document(self, document_id, fields):
+        ...
+
+    @abstractmethod
+    def load_text(self, document_id, document):
+        ...
+
+    @abstractmethod
+    def list_documents(self, user_id, fields, limit, start_after=None):
+        """Newest-first page of a user's documents, projected to ``fields``.
+
+        ``start_after`` is an ``{'uploaded_at', 'id'}`` dict for the last
+        document of the previous page.
+        """
+
+    @abstractmethod
+    def scan_documents(self, filters, limit, start_after=None):
+        """Page of documents of any user, in id order, matching ``(field, value)`` equality filters.
+
+        ``start_after`` is the id of the last document of the previous page.
+        For offline jobs; the API itself only lists one user's documents.
+        """
+
+    @abstractmethod
+    def delete_document(self, document_id, document):
+        ...
+
+    # Analyses and their stored translations
+    @abstractmethod
+    def get_analysis(self, document_id):
+        ...
+
+    @abstractmethod
+    def save_analysis(self, document_id, analysis, document_fields):
+        ...
+
+    @abstractmethod
+    def get_translation(self, document_id, lang):
+        ...
+
+    @abstractmethod
+    def save_translation(self, document_id, lang, translation):
+        ...
+
+    # Named key/value stores for persistent cache tiers
+    @abstractmethod
+    def kv_store(self, name):
+        ...
+
+
+class FirestoreStore:
+    """Key/value store backed by one Firestore collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get(self, key):
+        doc = self.collection.document(key).get()
+        if not doc.exists:
+            return None
+        return doc.to_dict().get('value')
+
+    def set(self, key, value):
+        self.collection.document(key).set({'value': value})
+
+    def delete(self, key):
+        self.collection.document(key).delete()
+
+
+class AsyncFirestoreStore(FirestoreStore):
+    """FirestoreStore with coroutine methods, on a collection of the async client"""
+
+    async def get(self, key):
+        doc = await self.collection.document(key).get()
+        if not doc.exists:
+            return None
+        return doc.to_dict().get('value')
+
+    async def set(self, key, value):
+        await self.collection.document(key).set({'value': value})
+
+    async def delete(self, key):
+        await self.collection.document(key).delete()
+
+
+def _initialize_firebase(service_account_path, storage_bucket=None):
+    import firebase_admin
+    from firebase_admin import credentials
+
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(service_account_path)
+        firebase_admin.initialize_app(cred, {
+            'storageBucket': storage_bucket
+        })
+
+
+class FirestoreRepository(Repository):
+
+    def __init__(self, service_account_path, storage_bucket=None):
+        from firebase_admin import firestore
+
+        _initialize_firebase(service_account_path, storage_bucket)
+
+        self.firestore = firestore
+        self.server_timestamp = firestore.SERVER_TIMESTAMP
+        self.db = firestore.client()
+        self.users = self.db.collection('users')
+        self.documents = self.db.collection('documents')
+        self.analyses = self.db.collection('analyses')
+
+    @staticmethod
+    def _to_dict(snapshot):
+        if not snapshot.exists:
+            return None
+        data = snapshot.to_dict()
+        data['id'] = snapshot.id
+        return data
+
+    def _translations(self, document_id):
+        return self.analyses.document(document_id).collection('translations')
+
+    def get_user(self, user_id):
+        return self._to_dict(self.users.document(user_id).get())
+
+    def find_user_by_email(self, email):
+        for snapshot in self.users.where('email', '==', email).limit(1).stream():
+            return self._to_dict(snapshot)
+        return None
+
+    def create_user(self, user):
+        doc_ref = self.users.document()
+        doc_ref.set(user)
+        return doc_ref.id
+
+    def update_user(self, user_id, fields):
+        self.users.document(user_id).update(fields)
+
+    def get_document(self, document_id):
+        return self._to_dict(self.documents.document(document_id).get())
+
+    def create_document(self, document, text):
+        doc_ref = self.documents.document()
+
+        batch = self.db.batch()
+        document = dict(document, **store_text(batch, doc_ref, text))
+        batch.set(doc_ref, document)
+        batch.commit()
+
+        return doc_ref.id
+
+    def _document_batches(self, items):
+        """Yield (batch, created) groups holding as many documents as fit in one commit.
+
+        ``created`` lists the (doc_ref, document) pairs the batch writes, so
+        they can be rolled back if a later batch fails.
+        """
+        batch = self.db.batch()
+        created = []
+        writes = 0
+        size = 0
+
+        for document, text in items:
+            chunks, fields = prepare_text(text)
+            document = dict(document, **fields)
+            document_bytes = _write_bytes(document, chunks)
+            if created and (
+                writes + len(chunks) + 1 > FIRESTORE_BATCH_WRITES
+                or size + document_bytes > FIRESTORE_BATCH_BYTES
+            ):
+                yield batch, created
+                batch = self.db.batch()
+                created = []
+                writes = 0
+                size = 0
+
+            doc_ref = self.documents.document()
+            write_chunks(batch, doc_ref, chunks)
+            batch.set(doc_ref, document)
+            created.append((doc_ref, document))
+            writes += len(chunks) + 1
+            size += document_bytes
+
+        if created:
+            yield batch, created
+
+    def _rollback_batches(self, created):
+        """Yield batches deleting the (doc_ref, document) pairs in ``created`` and their text"""
+        batch = self.db.batch()
+        writes = 0
+
+        for doc_ref, document in created:
+            deletes = document['text_chunks'] + 1
+            if writes and writes + deletes > FIRESTORE_BATCH_WRITES:
+                yield batch
+                batch = self.db.batch()
+                writes = 0
+
+            delete_text(batch, doc_ref, document)
+            batch.delete(doc_ref)
+            writes += deletes
+
+        if writes:
+            yield batch
+
+    def create_documents(self, items):
+        """All or nothing: when a batch fails, the documents committed before it are deleted"""
+        committed = []
+        try:
+            for batch, created in self._document_batches(items):
+                batch.commit()
+                committed.extend(created)
+        except Exception:
+            for batch in self._rollback_batches(committed):
+                batch.commit()
+            raise
+        return [doc_ref.id for doc_ref, _ in committed]
+
+    def update_document(self, document_id, fields):
+        self.documents.document(document_id).update(fields)
+
+    def load_text(self, document_id, document):
+        return load_text(self.db, self.documents.document(document_id), document)
+
+    def list_documents(self, user_id, fields, limit, start_after=None):
+        query_direction = self.firestore.Query.DESCENDING
+
+        try:
+            query = self.documents.where('user_id', '==', user_id) \
+                .order_by('uploaded_at', direction=query_direction) \
+                .order_by('__name__', direction=query_direction) \
+                .select(fields)
+            if start_after:
+                query = query.start_after({
+                    'uploaded_at': start_after['uploaded_at'],
+                    '__name__': self.documents.document(start_after['id'])
+                })
+            return [self._to_dict(snapshot) for snapshot in query.limit(limit).stream()]
+
+        except Exception as order_error:
+            print(f"Order by failed (index not ready), fetching without ordering: {order_error}")
+            documents = [
+                self._to_dict(snapshot)
+                for snapshot in self.documents.where('user_id', '==', user_id).select(fields).stream()
+            ]
+            documents.sort(key=_sort_key, reverse=True)
+            if start_after:
+                cursor = (start_after['uploaded_at'], start_after['id'])
+                documents = [document for document in documents if _sort_key(document) < cursor]
+            return documents[:limit]
+
+    def scan_documents(self, filters, limit, start_after=None):
+        query = self.documents
+        for field, value in filters:
+            query = query.where(field, '==', value)
+        query = query.order_by('__name__')
+        if start_after:
+            query = query.start_after({'__name__': self.documents.document(start_after)})
+        return [self._to_dict(snapshot) for snapshot in query.limit(limit).stream()]
+
+    def delete_document(self, document_id, document):
+        doc_ref = self.documents.document(document_id)
+
+        batch = self.db.batch()
+        batch.delete(doc_ref)
+        batch.delete(self.analyses.document(document_id))
+        delete_text(batch, doc_ref, document)
+        for translation_doc in self._translations(document_id).stream():
+            batch.delete(translation_doc.reference)
+        batch.commit()
+
+    def get_analysis(self, document_id):
+        return self._to_dict(self.analyses.document(document_id).get())
+
+    def save_analysis(self, document_id, analysis, document_fields):
+        batch = self.db.batch()
+        batch.set(self.analyses.document(document_id), analysis)
+        batch.update(self.documents.document(document_id), document_fields)
+        batch.commit()
+
+    def get_translation(self, document_id, lang):
+        snapshot = self._translations(document_id).document(lang).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def save_translation(self, document_id, lang, translation):
+        self._translations(document_id).document(lang).set(translation)
+
+    def kv_store(self, name):
+        return FirestoreStore(self.db.collection(name))
+
+
+class AsyncFirestoreRepository:
+    """The Repository interface with coroutine methods, on Firestore's async client.
+
+    Used by the ASGI entry point so Firestore round trips do not hold a thread.
+    Its ``kv_store`` stores have coroutine methods as well.
+    """
+
+    def __init__(self, service_account_path, storage_bucket=None):
+        from firebase_admin import firestore, firestore_async
+
+        _initialize_firebase(service_account_path, storage_bucket)
+
+        self.firestore = firestore
+        self.server_timestamp = firestore.SERVER_TIMESTAMP
+        self.db = firestore_async.client()
+        self.users = self.db.collection('users')
+        self.documents = self.db.collection('documents')
+        self.analyses = self.db.collection('analyses')
+
+    _to_dict = staticmethod(FirestoreRepository._to_dict)
+
+    def _translations(self, document_id):
+        return self.analyses.document(document_id).collection('translations')
+
+    async def get_user(self, user_id):
+        return self._to_dict(await self.users.document(user_id).get())
+
+    async def find_user_by_email(self, email):
+        async for snapshot in self.users.where('email', '==', email).limit(1).stream():
+            return self._to_dict(snapshot)
+        return None
+
+    async def create_user(self, user):
+        doc_ref = self.users.document()
+        await doc_ref.set(user)
+        return doc_ref.id
+
+    async def update_user(self, user_id, fields):
+        await self.users.document(user_id).update(fields)
+
+    async def get_document(self, document_id):
+        return self._to_dict(await self.documents.document(document_id).get())
+
+    async def create_document(self, document, text):
+        doc_ref = self.documents.document()
+
+        batch = self.db.batch()
+        document = dict(document, **store_text(batch, doc_ref, text))
+        batch.set(doc_ref, document)
+        await batch.commit()
+
+        return doc_ref.id
+
+    _document_batches = FirestoreRepository._document_batches
+    _rollback_batches = FirestoreRepository._rollback_batches
+
+    async def create_documents(self, items):
+        committed = []
+        try:
+            for batch, created in self._document_batches(items):
+                await batch.commit()
+                committed.extend(created)
+        except Exception:
+            for batch in self._rollback_batches(committed):
+                await batch.commit()
+            raise
+        return [doc_ref.id for doc_ref, _ in committed]
+
+    async def update_document(self, document_id, fields):
+        await self.documents.document(document_id).update(fields)
+
+    async def load_text(self, document_id, document):
+        return await load_text_async(self.db, self.documents.document(document_id), document)
+
+    async def list_documents(self, user_id, fields, limit, start_after=None):
+        query_direction = self.firestore.Query.DESCENDING
+
+        try:
+            query = self.documents.where('user_id', '==', user_id) \
+                .order_by('uploaded_at', direction=query_direction) \
+                .order_by('__name__', direction=query_direction) \
+                .select(fields)
+            if start_after:
+                query = query.start_after({
+                    'uploaded_at': start_after['uploaded_at'],
+                    '__name__': self.documents.document(start_after['id'])
+                })
+            return [self._to_dict(snapshot) async for snapshot in query.limit(limit).stream()]
+
+        except Exception as order_error:
+            print(f"Order by failed (index not ready), fetching without ordering: {order_error}")
+            documents = [
+                self._to_dict(snapshot)
+                async for snapshot in self.documents.where('user_id', '==', user_id).select(fields).stream()
+            ]
+            documents.sort(key=_sort_key, reverse=True)
+            if start_after:
+                cursor = (start_after['uploaded_at'], start_after['id'])
+                documents = [document for document in documents if _sort_key(document) < cursor]
+            return documents[:limit]
+
+    async def scan_documents(self, filters, limit, start_after=None):
+        query = self.documents
+        for field, value in filters:
+            query = query.where(field, '==', value)
+        query = query.order_by('__name__')
+        if start_after:
+            query = query.start_after({'__name__': self.documents.document(start_after)})
+        return [self._to_dict(snapshot) async for snapshot in query.limit(limit).stream()]
+
+    async def delete_document(self, document_id, document):
+        doc_ref = self.documents.document(document_id)
+
+        batch = self.db.batch()
+        batch.delete(doc_ref)
+        batch.delete(self.analyses.document(document_id))
+        delete_text(batch, doc_ref, document)
+        async for translation_doc in self._translations(document_id).stream():
+            batch.delete(translation_doc.reference)
+        await batch.commit()
+
+    async def get_analysis(self, document_id):
+        return self._to_dict(await self.analyses.document(document_id).get())
+
+    async def save_analysis(self, document_id, analysis, document_fields):
+        batch = self.db.batch()
+        batch.set(self.analyses.document(document_id), analysis)
+        batch.update(self.documents.document(document_id), document_fields)
+        await batch.commit()
+
+    async def get_translation(self, document_id, lang):
+        snapshot = await self._translations(document_id).document(lang).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    async def save_translation(self, document_id, lang, translation):
+        await self._translations(document_id).document(lang).set(translation)
+
+    def kv_store(self, name):
+        return AsyncFirestoreStore(self.db.collection(name))
+
+
+class ThreadedAsyncRepository:
+    """Coroutine front end for a synchronous repository, running each call on ``executor``"""
+
+    def __init__(self, repo, executor=None):
+        self._repo = repo
+        self._executor = executor
+
+    @property
+    def server_timestamp(self):
+        return self._repo.server_timestamp
+
+    def __getattr__(self, name):
+        method = getattr(self._repo, name)
+
+        async def call(*args, **kwargs):
+            # Carry context variables (the request's stage timings) into the worker thread
+            context = contextvars.copy_context()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, lambda: context.run(method, *args, **kwargs))
+
+        return call
+
+
+class InlineAsyncRepository:
+    """Coroutine front end for a synchronous repository that runs each call on the calling thread.
+
+    Awaiting its methods never suspends, which lets code written against the
+    async interface run on a plain request thread.
+    """
+
+    def __init__(self, repo):
+        self._repo = repo
+
+    @property
+    def server_timestamp(self):
+        return self._repo.server_timestamp
+
+    def __getattr__(self, name):
+        method = getattr(self._repo, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+
+        return call
+
+
+class MemoryStore:
+    """Thread-safe in-process key/value store"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return copy.deepcopy(self._data.get(key))
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = copy.deepcopy(value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class MemoryRepository(Repository):
+    """In-process backend for local development, load tests and benchmarks.
+
+    Nothing is persisted across restarts. Records are deep-copied on the way
+    in and out so callers cannot mutate stored state by accident, and text is
+    kept compressed like the Firestore backend. ``latency`` seconds are slept
+    once per call to stand in for a Firestore round trip (a batch is one call).
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._lock = threading.RLock()
+        self._users = {}
+        self._documents = {}
+        self._texts = {}
+        self._analyses = {}
+        self._translations = {}
+        self._stores = {}
+
+    @property
+    def server_timestamp(self):
+        return datetime.now(timezone.utc)
+
+    def _round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def _with_id(record, record_id):
+        if record is None:
+            return None
+        record = copy.deepcopy(record)
+        record['id'] = record_id
+        return record
+
+    def get_user(self, user_id):
+        self._round_trip()
+        with self._lock:
+            return self._with_id(self._users.get(user_id), user_id)
+
+    def find_user_by_email(self, email):
+        self._round_trip()
+        with self._lock:
+            for user_id, user in self._users.items():
+                if user.get('email') == email:
+                    return self._with_id(user, user_id)
+        return None
+
+    def create_user(self, user):
+        self._round_trip()
+        user_id = uuid.uuid4().hex[:20]
+        with self._lock:
+            self._users[user_id] = copy.deepcopy(user)
+        return user_id
+
+    def update_user(self, user_id, fields):
+        self._round_trip()
+        with self._lock:
+            if user_id not in self._users:
+                raise KeyError(f"User {user_id} not found")
+            self._users[user_id].update(copy.deepcopy(fields))
+
+    def get_document(self, document_id):
+        self._round_trip()
+        with self._lock:
+            return self._with_id(self._documents.get(document_id), document_id)
+
+    def create_document(self, document, text):
+        self._round_trip()
+        return self._insert_document(document, text)
+
+    def create_documents(self, items):
+        self._round_trip()
+        return [self._insert_document(document, text) for document, text in items]
+
+    def _insert_document(self, document, text):
+        document_id = uuid.uuid4().hex[:20]
+        with self._lock:
+            self._documents[document_id] = dict(copy.deepcopy(document), text_length=len(text))
+            self._texts[document_id] = zlib.compress(text.encode('utf-8'))
+        return document_id
+
+    def update_document(self, document_id, fields):
+        self._round_trip()
+        with self._lock:
+            if document_id not in self._documents:
+                raise KeyError(f"Document {document_id} not found")
+            self._documents[document_id].update(copy.deepcopy(fields))
+
+    def load_text(self, document_id, document):
+        if 'text' in document:
+            return document['text']
+        self._round_trip()
+        with self._lock:
+            compressed = self._texts.get(document_id)
+        return zlib.decompress(compressed).decode('utf-8') if compressed else ''
+
+    def list_documents(self, user_id, fields, limit, start_after=None):
+        self._round_trip()
+        with self._lock:
+            documents = [
+                self._with_id({field: document[field] for field in fields if field in document}, document_id)
+                for document_id, document in self._documents.items()
+                if document.get('user_id') == user_id
+            ]
+
+        documents.sort(key=_sort_key, reverse=True)
+        if start_after:
+            cursor = (start_after['uploaded_at'], start_after['id'])
+            documents = [document for document in documents if _sort_key(document) < cursor]
+        return documents[:limit]
+
+    def scan_documents(self, filters, limit, start_after=None):
+        self._round_trip()
+        with self._lock:
+            matches = [
+                (document_id, document)
+                for document_id, document in sorted(self._documents.items())
+                if (start_after is None or document_id > start_after)
+                and all(document.get(field) == value for field, value in filters)
+            ]
+            return [self._with_id(document, document_id) for document_id, document in matches[:limit]]
+
+    def delete_document(self, document_id, document):
+        self._round_trip()
+        with self._lock:
+            self._documents.pop(document_id, None)
+            self._texts.pop(document_id, None)
+            self._analyses.pop(document_id, None)
+            for key in [key for key in self._translations if key[0] == document_id]:
+                del self._translations[key]
+
+    def get_analysis(self, document_id):
+        self._round_trip()
+        with self._lock:
+            return self._with_id(self._analyses.get(document_id), document_id)
+
+    def save_analysis(self, document_id, analysis, document_fields):
+        self._round_trip()
+        with self._lock:
+            if document_id not in self._documents:
+                raise KeyError(f"Document {document_id} not found")
+            self._analyses[document_id] = copy.deepcopy(analysis)
+            self._documents[document_id].update(copy.deepcopy(document_fields))
+
+    def get_translation(self, document_id, lang):
+        self._round_trip()
+        with self._lock:
+            return copy.deepcopy(self._translations.get((document_id, lang)))
+
+    def save_translation(self, document_id, lang, translation):
+        self._round_trip()
+        with self._lock:
+            self._translations[(document_id, lang)] = copy.deepcopy(translation)
+
+    def kv_store(self, name):
+        with self._lock:
+            if name not in self._stores:
+                self._stores[name] = MemoryStore()
+            return self._stores[name]
+
+
+def create_async_repository(repo, backend=STORAGE_BACKEND, executor=None):
+    """Async counterpart of ``repo``; only Firestore has a native async client, other backends run on ``executor``"""
+    if backend == 'firestore':
+        return AsyncFirestoreRepository(
+            os.getenv('FIREBASE_SERVICE_ACCOUNT_PATH', './serviceAccountKey.json'),
+            os.getenv('FIREBASE_STORAGE_BUCKET')
+        )
+    return ThreadedAsyncRepository(repo, executor)
+
+
+def create_repository(backend=STORAGE_BACKEND):
+    if backend == 'memory':
+        return MemoryRepository(latency=float(os.getenv('MEMORY_STORAGE_LATENCY', '0')))
+    if backend == 'firestore':
+        return FirestoreRepository(
+            os.getenv('FIREBASE_SERVICE_ACCOUNT_PATH', './serviceAccountKey.json'),
+            os.getenv('FIREBASE_STORAGE_BUCKET')
+        )
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
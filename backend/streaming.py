@@ -0,0 +1,134 @@
+import json
+
+
+def sse_event(event, data):
+    """Format one Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class AnalysisStreamParser:
+    """Incrementally pick complete fields out of a streamed JSON analysis.
+
+    Feed the model's text as it arrives; ``feed`` returns the events that
+    became complete with that piece of text:
+
+    * ``('item', section, index, value)`` for each finished element of a
+      top-level array such as ``key_terms``
+    * ``('section', section, value)`` for each finished top-level field
+
+    Anything before the first ``{`` (such as a ```json fence) is ignored.
+    Fragments that fail to parse are skipped; the caller should still parse
+    the full text once the stream ends.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.started = False
+        self.finished = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.expect_key = False
+        self.key_start = None
+        self.key = None
+        self.value_start = None
+        self.in_array = False
+        self.item_start = None
+        self.item_index = 0
+
+    def feed(self, text):
+        self.buffer += text
+        events = []
+
+        while self.pos < len(self.buffer) and not self.finished:
+            index = self.pos
+            ch = self.buffer[index]
+            self.pos += 1
+
+            if not self.started:
+                if ch == '{':
+                    self.started = True
+                    self.depth = 1
+                    self.expect_key = True
+                continue
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.key_start is not None:
+                        self.key = self._load(self.key_start, index + 1)
+                        self.key_start = None
+                continue
+
+            if ch.isspace():
+                continue
+
+            if self.depth == 1:
+                if self.expect_key:
+                    if ch == '"':
+                        self.in_string = True
+                        self.key_start = index
+                    elif ch == ':':
+                        self.expect_key = False
+                        self.value_start = None
+                    elif ch == '}':
+                        self.finished = True
+                    continue
+
+                if ch in ',}':
+                    if self.key is not None and self.value_start is not None:
+                        value = self._load(self.value_start, index)
+                        if value is not None:
+                            events.append(('section', self.key, value))
+                    self.expect_key = True
+                    self.key = None
+                    self.value_start = None
+                    if ch == '}':
+                        self.finished = True
+                    continue
+
+                if self.value_start is None:
+                    self.value_start = index
+                if ch == '"':
+                    self.in_string = True
+                elif ch in '[{':
+                    self.depth += 1
+                    self.in_array = ch == '['
+                    self.item_start = None
+                    self.item_index = 0
+                continue
+
+            if self.depth == 2 and self.in_array:
+                if ch in ',]':
+                    if self.item_start is not None:
+                        value = self._load(self.item_start, index)
+                        if value is not None:
+                            events.append(('item', self.key, self.item_index, value))
+                        self.item_index += 1
+                    self.item_start = None
+                    if ch == ']':
+                        self.depth = 1
+                        self.in_array = False
+                    continue
+                if self.item_start is None:
+                    self.item_start = index
+
+            if ch == '"':
+                self.in_string = True
+            elif ch in '[{':
+                self.depth += 1
+            elif ch in ']}':
+                self.depth -= 1
+
+        return events
+
+    def _load(self, start, end):
+        try:
+            return json.loads(self.buffer[start:end])
+        except ValueError:
+            return None
@@ -0,0 +1,43 @@
+import os
+import sys
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.join(BACKEND_DIR, 'benchmarks')]
+
+# main reads these at import time: keep everything local and deterministic
+os.environ.update({
+    'STORAGE_BACKEND': 'memory',
+    'TRANSLATOR_BACKEND': 'fake',
+    'ANALYSIS_MODE': 'sync',
+    'SERVER_TIMING': 'false',
+    'LLM_USER_RATE_PER_MINUTE': '0',
+})
+os.environ.setdefault('GEMINI_API_KEY', 'test')
+
+import pytest
+
+
+@pytest.fixture
+def main():
+    import main
+    return main
+
+
+@pytest.fixture
+def fake_model(main, monkeypatch):
+    from fakes import FakeGeminiModel
+
+    model = FakeGeminiModel(latency=0)
+    monkeypatch.setattr(main, 'model', model)
+    return model
+
+
+@pytest.fixture
+def client(main):
+    """Test client signed in as a new user, whose id is ``client.user_id``"""
+    client = main.app.test_client()
+    answer = client.post('/api/auth/register', json={'email': f'{uuid.uuid4().hex}@example.com', 'password': 'secret'})
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + answer.get_json()['token']
+    client.user_id = answer.get_json()['user']['id']
+    return client
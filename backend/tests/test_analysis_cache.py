@@ -0,0 +1,61 @@
+import threading
+import uuid
+
+
+def lease_text():
+    """A random tag keeps the text out of other tests' caches"""
+    return f"The tenant pays rent monthly under lease {uuid.uuid4().hex}. The deposit is refundable."
+
+
+def create(main, user_id, text):
+    document_id = main.repo.create_document(main.new_document({'id': user_id}, 'lease.pdf', 'pdf', {}), text)
+    return document_id, main.repo.get_document(document_id)
+
+
+def test_concurrent_analyses_of_a_document_share_one_call(main, fake_model):
+    fake_model.latency = 0.3
+    document_id, document = create(main, 'user-1', lease_text())
+    results = []
+
+    threads = [
+        threading.Thread(target=lambda: results.append(main.analyze_once(document_id, document)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert fake_model.calls == 1
+    assert len(results) == 4
+    assert all(result['plain_summary'] == results[0]['plain_summary'] for result in results)
+
+
+def test_identical_text_is_analyzed_once_across_users(main, fake_model):
+    text = lease_text()
+    main.run_analysis(*create(main, 'user-1', text))
+
+    # Whitespace is normalized before the text is hashed
+    analysis = main.run_analysis(*create(main, 'user-2', text.replace(' ', '   ')))
+
+    assert fake_model.calls == 1
+    assert analysis['plain_summary']
+
+
+def test_a_new_prompt_version_misses_the_cache(main, fake_model, monkeypatch):
+    text = lease_text()
+    main.run_analysis(*create(main, 'user-1', text))
+
+    monkeypatch.setattr(main, 'PROMPT_VERSION', 'next')
+    main.run_analysis(*create(main, 'user-1', text))
+
+    assert fake_model.calls == 2
+
+
+def test_unparsed_answers_are_not_cached(main, fake_model):
+    fake_model.answer = 'The model did not answer with JSON'
+    text = lease_text()
+
+    assert main.compute_analysis(text)['parse_failed']
+    assert main.compute_analysis(text)['parse_failed']
+    assert fake_model.calls == 2
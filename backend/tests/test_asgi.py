@@ -0,0 +1,127 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+
+import pytest
+
+from fakes import FakeGeminiModel
+
+
+@pytest.fixture
+def asgi(main):
+    import asgi
+    return asgi
+
+
+def call(app, method, path, chunks=(b'',), headers=()):
+    messages = [
+        {'type': 'http.request', 'body': chunk, 'more_body': index < len(chunks) - 1}
+        for index, chunk in enumerate(chunks)
+    ]
+    response = {'body': b''}
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        else:
+            response['body'] += message.get('body', b'')
+
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+        'headers': [(name.encode(), value.encode()) for name, value in headers], 'server': ('test', 80),
+    }
+    asyncio.run(app(scope, receive, send))
+    return response['status'], response['body']
+
+
+def register(asgi, email):
+    body = json.dumps({'email': email, 'password': 'secret'}).encode()
+    status, answer = call(asgi.app, 'POST', '/api/auth/register', [body], [('content-type', 'application/json')])
+    assert status == 201
+    answer = json.loads(answer)
+    return [('authorization', 'Bearer ' + answer['token'])], answer['user']['id']
+
+
+def test_async_views_are_the_shared_routes(main, asgi):
+    shared = {endpoint for endpoint, view in main.app.view_functions.items() if hasattr(view, 'coroutine')}
+    assert set(asgi.ASYNC_VIEWS) == shared
+    assert 'api.analyze_document' in shared
+
+
+@pytest.mark.parametrize('owner', ['self', 'someone-else'])
+def test_shared_route_answers_the_same_on_both_servers(main, asgi, owner):
+    headers, user_id = register(asgi, f'shared-route-{owner}@example.com')
+    document = main.new_document({'id': user_id if owner == 'self' else owner}, 'lease.pdf', 'pdf', {})
+    document_id = main.repo.create_document(document, 'Some lease text that is long enough.')
+
+    status, body = call(asgi.app, 'GET', f'/api/documents/{document_id}', headers=headers)
+    response = main.app.test_client().get(f'/api/documents/{document_id}', headers=dict(headers))
+
+    assert status == response.status_code == (200 if owner == 'self' else 404)
+    assert json.loads(body) == response.get_json()
+
+
+def test_bodies_over_the_limit_are_refused(main, asgi, monkeypatch):
+    monkeypatch.setattr(main, 'MAX_REQUEST_BYTES', 1000)
+    headers, _ = register(asgi, 'large-body@example.com')
+
+    status, _ = call(asgi.app, 'POST', '/api/upload', headers=headers + [('content-length', '5000')])
+    assert status == 413
+
+    # Sent in chunks without a Content-Length, refused once the limit is passed
+    status, _ = call(asgi.app, 'POST', '/api/upload', [b'x' * 400] * 5, headers=headers)
+    assert status == 413
+
+
+def test_async_analysis_joins_a_stream_in_flight(main, asgi, monkeypatch):
+    model = FakeGeminiModel(latency=0.5)
+    monkeypatch.setattr(main, 'model', model)
+    saved_on = []
+    analysis_saved = main.analysis_saved
+    monkeypatch.setattr(main, 'analysis_saved', lambda *args: saved_on.append(threading.current_thread().name) or analysis_saved(*args))
+
+    headers, user_id = register(asgi, f'{uuid.uuid4().hex}@example.com')
+    document = main.new_document({'id': user_id}, 'lease.pdf', 'pdf', {})
+    document_id = main.repo.create_document(document, f'The tenant pays rent monthly. {uuid.uuid4().hex}')
+    document = main.repo.get_document(document_id)
+
+    stream = threading.Thread(target=lambda: list(main.stream_analysis_events(document_id, document)))
+    stream.start()
+    time.sleep(0.1)
+    status, body = call(asgi.app, 'POST', f'/api/analyze/{document_id}', headers=headers)
+    stream.join()
+
+    assert status == 200
+    assert model.calls == 1
+    assert json.loads(body)['plain_summary']
+    assert threading.main_thread().name not in saved_on
+
+
+def test_thread_waits_for_a_coroutine_in_flight(main):
+    calls = []
+
+    async def analyze():
+        calls.append('coroutine')
+        await asyncio.sleep(0.2)
+        return {'summary': 'shared'}
+
+    results = []
+
+    async def lead():
+        waiting = threading.Thread(target=lambda: results.append(
+            main.analysis_flight.do('flight-key', lambda: calls.append('thread'))
+        ))
+        leader = asyncio.ensure_future(main.analysis_flight.do_async('flight-key', analyze))
+        await asyncio.sleep(0.05)
+        waiting.start()
+        results.append(await leader)
+        await asyncio.to_thread(waiting.join)
+
+    asyncio.run(lead())
+    assert calls == ['coroutine']
+    assert results == [{'summary': 'shared'}] * 2
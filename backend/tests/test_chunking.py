@@ -0,0 +1,76 @@
+from chunking import merge_analyses, section_hash, section_units, split_for_translation, split_sections
+
+
+def contract(sections=30, edited=None):
+    parts = []
+    for number in range(1, sections + 1):
+        body = f"The tenant agrees to obligation {number}. " * 12
+        if number == edited:
+            body += "This sentence was added later."
+        parts.append(f"{number}. Section {number}\n{body.strip()}")
+    return '\n\n'.join(parts)
+
+
+def test_sections_split_on_blank_lines_and_headings():
+    text = "PREAMBLE TEXT\nintro line\n1. Rent\nPay monthly.\n\n(a) Deposit\nTwo months."
+
+    assert split_sections(text) == ["PREAMBLE TEXT\nintro line", "1. Rent\nPay monthly.", "(a) Deposit\nTwo months."]
+
+
+def test_units_keep_every_section_in_order():
+    text = contract()
+    units = section_units(text, 2000)
+
+    assert len(units) > 1
+    assert '\n\n'.join(units) == '\n\n'.join(split_sections(text))
+
+
+def test_oversized_sections_are_broken_up():
+    line = "word " * 100
+    text = "1. Huge\n" + '\n'.join([line] * 20) + "\n" + "x" * 1500
+
+    units = section_units(text, 1000)
+
+    assert all(len(piece) <= 1000 for unit in units for piece in unit.split('\n\n'))
+    assert ''.join(units).replace('\n', '') == text.replace('\n', '')
+
+
+def test_an_edit_only_changes_the_unit_around_it():
+    before = {section_hash(unit) for unit in section_units(contract(), 2000)}
+    after = [section_hash(unit) for unit in section_units(contract(edited=15), 2000)]
+
+    changed = [unit_hash for unit_hash in after if unit_hash not in before]
+    assert 1 <= len(changed) <= 2
+    assert len(after) - len(changed) >= len(before) - 3
+
+
+def test_translation_chunks_rejoin_exactly():
+    text = "First paragraph. It has sentences!\n\nSecond one\nspans lines. " * 40 + "x" * 700
+
+    chunks = split_for_translation(text, 300)
+
+    assert ''.join(chunks) == text
+    assert all(len(chunk) <= 300 for chunk in chunks)
+
+
+def test_merge_keeps_the_first_of_each_item():
+    merged = merge_analyses([
+        {'key_terms': [{'term': 'Rent', 'explanation': 'first'}], 'unclear_items': ['Who repairs?', '']},
+        {'key_terms': [{'term': '  rent ', 'explanation': 'second'}, {'term': 'Deposit', 'explanation': 'x'}],
+         'risks_and_concerns': None, 'unclear_items': ['WHO  repairs?']},
+    ])
+
+    assert merged['key_terms'] == [{'term': 'Rent', 'explanation': 'first'}, {'term': 'Deposit', 'explanation': 'x'}]
+    assert merged['unclear_items'] == ['Who repairs?']
+    assert merged['risks_and_concerns'] == []
+    assert merged['important_clauses'] == []
+
+
+def test_min_chars_keeps_units_from_closing_early():
+    text = contract(sections=60)
+
+    eager = section_units(text, 4000)
+    patient = section_units(text, 4000, min_chars=3000)
+
+    assert len(patient) < len(eager)
+    assert all(len(unit) >= 3000 for unit in patient[:-1])
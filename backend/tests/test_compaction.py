@@ -0,0 +1,76 @@
+from compaction import compact_for_prompt, compact_text
+
+
+def paged(bodies):
+    return '\n\n'.join(
+        f"ACME Lease Agreement | Page {number} of {len(bodies)}\n{body}\n{number}"
+        for number, body in enumerate(bodies, 1)
+    )
+
+
+BODIES = [
+    "The tenant pays rent on the first day of each month.",
+    "A third-\nparty guarantor signs the lease. The deposit is refund-\nable after inspection.",
+    "Late payments carry a fee . . . . . . . . of fifty dollars.",
+    "The deposit is refundable within thirty days of move out.",
+]
+
+
+def test_headers_footers_and_page_numbers_are_removed():
+    compacted, stats = compact_text(paged(BODIES))
+
+    assert 'ACME Lease Agreement' not in compacted
+    assert stats['repeated_lines_removed'] == len(BODIES)
+    assert stats['page_numbers_removed'] == len(BODIES)
+
+
+def test_body_text_survives_and_nothing_grows():
+    text = paged(BODIES)
+    compacted, stats = compact_text(text)
+
+    for phrase in ('pays rent on the first day', 'of fifty dollars', 'within thirty days of move out'):
+        assert phrase in compacted
+    assert stats['chars_after'] == len(compacted) <= len(text) == stats['chars_before']
+    assert stats['tokens_after'] <= stats['tokens_before']
+
+
+def test_hyphens_are_only_dropped_for_known_words():
+    compacted, stats = compact_text(paged(BODIES))
+
+    assert 'third-party' in compacted
+    assert 'refundable after inspection' in compacted
+    assert stats['hyphens_joined'] == 1
+
+
+def test_compaction_is_idempotent():
+    once, _ = compact_text(paged(BODIES))
+    twice, stats = compact_text(once)
+
+    assert twice == once
+    assert stats['repeated_lines_removed'] == stats['page_numbers_removed'] == 0
+
+
+def test_a_page_is_never_dropped_whole():
+    compacted, _ = compact_text('\n\n'.join(["Schedule A"] * 4))
+
+    assert compacted.count("Schedule A") == 4
+
+
+def test_disabled_compaction_leaves_text_alone():
+    assert compact_for_prompt("Page 1\n  spaced   text", enabled=False) == ("Page 1\n  spaced   text", None)
+
+
+def test_numbers_are_only_dropped_where_they_number_pages():
+    text = paged(BODIES) + "\n\nThe penalty is\n12\npercent of the rent."
+    compacted, stats = compact_text(text)
+
+    assert compacted.endswith("The penalty is\n12\npercent of the rent.")
+    assert stats['page_numbers_removed'] == len(BODIES)
+
+
+def test_a_lone_number_is_kept_without_page_numbering():
+    text = "Clause 4 caps the deposit at\n2\n\nmonths of rent."
+    compacted, stats = compact_text(text)
+
+    assert compacted == text
+    assert stats['page_numbers_removed'] == 0
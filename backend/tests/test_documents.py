@@ -0,0 +1,100 @@
+import gzip
+import json
+
+
+def create_documents(main, user_id, count):
+    return [
+        main.repo.create_document(main.new_document({'id': user_id}, f'lease-{index}.pdf', 'pdf', {}), 'Lease text.')
+        for index in range(count)
+    ]
+
+
+def test_pages_follow_the_cursor_to_the_end(main, client):
+    created = create_documents(main, client.user_id, 5)
+
+    first = client.get('/api/documents?limit=2').get_json()
+    second = client.get(f"/api/documents?limit=2&cursor={first['next_cursor']}").get_json()
+    last = client.get(f"/api/documents?limit=2&cursor={second['next_cursor']}").get_json()
+
+    pages = [first, second, last]
+    assert [len(page['documents']) for page in pages] == [2, 2, 1]
+    assert last['next_cursor'] is None
+    listed = [document['id'] for page in pages for document in page['documents']]
+    assert sorted(listed) == sorted(created)
+    assert listed == [document['id'] for document in client.get('/api/documents').get_json()['documents']]
+
+
+def test_limit_is_capped_and_checked(main, client, monkeypatch):
+    monkeypatch.setattr(main, 'DOCUMENTS_MAX_PAGE_SIZE', 3)
+    create_documents(main, client.user_id, 4)
+
+    assert len(client.get('/api/documents?limit=100').get_json()['documents']) == 3
+    for query in ('limit=0', 'limit=many', 'cursor=not-a-cursor'):
+        assert client.get(f'/api/documents?{query}').status_code == 400
+
+
+def test_documents_of_other_users_are_not_listed(main, client):
+    create_documents(main, 'someone-else', 2)
+    mine = create_documents(main, client.user_id, 1)
+
+    assert [document['id'] for document in client.get('/api/documents').get_json()['documents']] == mine
+
+
+def test_unchanged_list_answers_304_until_a_document_goes(main, client):
+    first, _ = create_documents(main, client.user_id, 2)
+    listing = client.get('/api/documents')
+    etag = listing.headers['ETag']
+
+    assert client.get('/api/documents', headers={'If-None-Match': etag}).status_code == 304
+
+    assert client.delete(f'/api/documents/{first}').status_code == 200
+    changed = client.get('/api/documents', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert len(changed.get_json()['documents']) == 1
+
+
+def test_list_follows_a_change_made_on_another_worker(main, client):
+    create_documents(main, client.user_id, 1)
+    etag = client.get('/api/documents').headers['ETag']
+
+    # Another worker writes the document and replaces the version in the shared store
+    create_documents(main, client.user_id, 1)
+    main.document_list_versions.set(client.user_id, {'version': 'from-another-worker'})
+
+    changed = client.get('/api/documents', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert len(changed.get_json()['documents']) == 2
+
+
+def test_unchanged_document_answers_304_without_its_text(main, client, monkeypatch):
+    document_id, = create_documents(main, client.user_id, 1)
+    etag = client.get(f'/api/documents/{document_id}').headers['ETag']
+
+    def unexpected(*args):
+        raise AssertionError('text loaded for a 304')
+
+    monkeypatch.setattr(main.repo, 'load_text', unexpected)
+    assert client.get(f'/api/documents/{document_id}', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_analysis_changes_the_document_etag(main, client, fake_model):
+    document_id, = create_documents(main, client.user_id, 1)
+    etag = client.get(f'/api/documents/{document_id}').headers['ETag']
+    assert client.post(f'/api/analyze/{document_id}').status_code == 200
+
+    changed = client.get(f'/api/documents/{document_id}', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.get_json()['analysis_version']
+
+    analysis_etag = client.get(f'/api/analysis/{document_id}').headers['ETag']
+    assert client.get(f'/api/analysis/{document_id}', headers={'If-None-Match': analysis_etag}).status_code == 304
+
+
+def test_large_bodies_are_gzipped_with_a_weak_etag(main, client):
+    create_documents(main, client.user_id, 30)
+
+    response = client.get('/api/documents', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'].startswith('W/')
+    assert json.loads(gzip.decompress(response.get_data()))['documents']
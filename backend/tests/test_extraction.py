@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from extraction import extract_pdf_pages, extract_pdf_text
+
+TEST_FILES = os.path.join(os.path.dirname(__file__), '..', '..', 'Test Files')
+POLICY = os.path.join(TEST_FILES, 'Terms&Conditions Agreement.pdf')
+
+pytestmark = pytest.mark.skipif(not os.path.exists(POLICY), reason='sample PDFs not present')
+
+
+@pytest.fixture(scope='module')
+def serial_pages():
+    return extract_pdf_pages(POLICY, parallel=False, ocr_fallback=False)
+
+
+def test_pool_extraction_matches_serial_extraction(serial_pages):
+    pooled = extract_pdf_pages(POLICY, parallel_min_pages=1, ocr_fallback=False)
+
+    assert len(serial_pages) == 9
+    assert all(serial_pages)
+    assert pooled == serial_pages
+
+
+def test_max_pages_stops_early(serial_pages):
+    assert extract_pdf_pages(POLICY, max_pages=2, ocr_fallback=False) == serial_pages[:2]
+
+
+def test_pages_past_the_time_budget_are_left_out():
+    assert extract_pdf_pages(POLICY, time_budget=1e-9, parallel=False) == [None] * 9
+
+
+def test_file_objects_are_spooled_and_pages_become_blocks(serial_pages):
+    with open(POLICY, 'rb') as pdf_file:
+        text = extract_pdf_text(pdf_file, max_pages=2, ocr_fallback=False)
+
+    assert text == '\n\n'.join(serial_pages[:2])
@@ -0,0 +1,24 @@
+import pytest
+
+INTERNAL_ROUTES = ['/api/metrics', '/api/limits', '/api/cache/stats']
+
+
+@pytest.mark.parametrize('path', INTERNAL_ROUTES)
+def test_internal_routes_are_off_without_a_token(main, monkeypatch, path):
+    monkeypatch.setattr(main, 'INTERNAL_API_TOKEN', '')
+
+    assert main.app.test_client().get(path).status_code == 404
+
+
+@pytest.mark.parametrize('path', INTERNAL_ROUTES)
+def test_internal_routes_require_the_token(main, monkeypatch, path):
+    monkeypatch.setattr(main, 'INTERNAL_API_TOKEN', 'scrape-secret')
+    client = main.app.test_client()
+
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get(path, headers={'Authorization': 'Bearer scrape-secret'}).status_code == 200
+
+
+def test_health_stays_open(main):
+    assert main.app.test_client().get('/api/health').status_code == 200
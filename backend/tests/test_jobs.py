@@ -0,0 +1,51 @@
+import threading
+import time
+
+import pytest
+
+from jobs import JOB_DONE, JOB_FAILED, JobOverrunError, JobQueue
+from storage import MemoryStore
+
+
+def wait_for(queue, job_id, status):
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job and job['status'] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}")
+
+
+def test_any_worker_reads_a_job_through_the_store():
+    store = MemoryStore()
+    worker, other_worker = JobQueue(store=store), JobQueue(store=store)
+
+    job = worker.submit('u1', lambda: {'summary': 'ok'}, key='doc')
+    wait_for(worker, job['id'], JOB_DONE)
+
+    seen = other_worker.get(job['id'])
+    assert seen['status'] == JOB_DONE
+    assert seen['result'] == {'summary': 'ok'}
+    assert seen['owner_id'] == 'u1'
+    assert other_worker.get('not-a-job-id') is None
+
+
+def test_timed_out_job_keeps_its_key_until_it_returns():
+    release = threading.Event()
+    queue = JobQueue(max_workers=1, max_queue=1, job_timeout=0.05, store=MemoryStore())
+
+    job = queue.submit('u1', release.wait, key='doc')
+    assert wait_for(queue, job['id'], JOB_FAILED)['error'].startswith('Job timed out')
+    assert queue.stats()['overrunning'] == 1
+
+    with pytest.raises(JobOverrunError):
+        queue.submit('u1', release.wait, key='doc')
+
+    release.set()
+    deadline = time.time() + 5
+    while queue.stats()['overrunning'] and time.time() < deadline:
+        time.sleep(0.01)
+    # The late result is discarded everywhere, and the key is free again
+    assert queue.get(job['id'])['status'] == JOB_FAILED
+    assert queue.submit('u1', lambda: None, key='doc')['id'] != job['id']
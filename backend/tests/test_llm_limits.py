@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from llm_limits import ConcurrencyLimiter, LLMGuard, OverloadedError
+
+
+def test_coroutines_wait_for_a_slot_on_the_event_loop():
+    limiter = ConcurrencyLimiter(max_in_flight=1, queue_timeout=5)
+    limiter.acquire()
+
+    async def main():
+        waiters = [asyncio.ensure_future(limiter.acquire_async()) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        assert limiter.stats()['waiting'] == 3
+        threads = threading.active_count()
+
+        threading.Timer(0.05, limiter.release).start()
+        done, pending = await asyncio.wait(waiters, timeout=2, return_when=asyncio.FIRST_COMPLETED)
+        assert len(done) == 1 and len(pending) == 2
+        assert threading.active_count() <= threads
+        for waiter in pending:
+            waiter.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    asyncio.run(main())
+    assert limiter.stats() == {'max_in_flight': 1, 'queue_timeout': 5, 'in_flight': 1, 'waiting': 0}
+
+
+def test_coroutine_gives_up_after_the_queue_timeout():
+    limiter = ConcurrencyLimiter(max_in_flight=1, queue_timeout=0.05)
+    limiter.acquire()
+
+    with pytest.raises(OverloadedError):
+        asyncio.run(limiter.acquire_async())
+    assert limiter.stats()['waiting'] == 0
+
+
+def test_stream_frees_its_slot_before_the_client_reads_everything():
+    guard = LLMGuard(limiter=ConcurrencyLimiter(max_in_flight=1))
+    stream = guard.stream(lambda: iter(['one', 'two', 'three']))
+
+    assert next(stream) == 'one'
+    deadline = time.time() + 2
+    while guard.limiter.stats()['in_flight'] and time.time() < deadline:
+        time.sleep(0.01)
+    assert guard.limiter.stats()['in_flight'] == 0
+    assert list(stream) == ['two', 'three']
+
+
+def test_stream_raises_what_the_model_raises():
+    def failing():
+        raise ValueError('bad request')
+        yield
+
+    with pytest.raises(ValueError):
+        list(LLMGuard(limiter=ConcurrencyLimiter()).stream(failing))
@@ -0,0 +1,22 @@
+import io
+
+from PIL import Image
+
+import ocr
+
+
+def test_large_non_jpeg_frames_are_reduced_to_the_target(monkeypatch):
+    monkeypatch.setattr(ocr, 'OCR_MAX_DIMENSION', 500)
+    image = Image.new('RGB', (2000, 1000), 'white')
+
+    assert ocr.preprocess(image).size == (500, 250)
+
+
+def test_image_frames_are_read_from_a_path(monkeypatch):
+    monkeypatch.setattr(ocr, 'OCR_WORKERS', 1)
+    monkeypatch.setattr(ocr, '_run_tesseract', lambda image: f'frame {image.size[0]}')
+    frames = [Image.new('L', (width, 100), 'white') for width in (100, 200)]
+    tiff = io.BytesIO()
+    frames[0].save(tiff, format='TIFF', save_all=True, append_images=frames[1:])
+
+    assert ocr.ocr_image(tiff) == 'frame 100\n\nframe 200'
@@ -0,0 +1,93 @@
+import uuid
+
+
+def contract_text(sections=12, edited=None):
+    """A multi-unit document; a random tag keeps its text out of other tests' caches"""
+    tag = uuid.uuid4().hex
+    parts = []
+    for number in range(1, sections + 1):
+        body = f"The tenant agrees to obligation {number} of agreement {tag}. " * 25
+        if number == edited:
+            body += "This sentence was added in the revision."
+        parts.append(f"{number}. Section {number}\n{body}")
+    return '\n\n'.join(parts)
+
+
+def create(main, text, **fields):
+    document = main.new_document({'id': 'revision-user'}, 'lease.pdf', 'pdf', {})
+    document.update(fields)
+    document_id = main.repo.create_document(document, text)
+    return document_id, main.repo.get_document(document_id)
+
+
+def revise(main, base_id, base, text):
+    return create(main, text, **main.revision_fields(base_id, base))
+
+
+def test_every_analysis_stores_section_hashes(main, fake_model):
+    text = contract_text()
+    document_id, document = create(main, text)
+
+    analysis = main.run_analysis(document_id, document)
+
+    units = main.revision_units(main.compact_for_prompt(text, record=False)[0])
+    assert len(units) > 1
+    assert len(analysis['section_hashes']) == len(units)
+
+
+def test_identical_revision_makes_no_new_section_calls(main, fake_model):
+    text = contract_text()
+    base_id, base = create(main, text)
+    main.run_analysis(base_id, base)
+    calls = fake_model.calls
+
+    revision_id, revision = revise(main, base_id, base, text)
+    analysis = main.run_analysis(revision_id, revision)
+
+    assert fake_model.calls == calls
+    sections = analysis['revision_diff']['sections']
+    assert sections['changed'] == 0
+    assert sections['unchanged'] == sections['total'] > 1
+
+
+def test_documents_within_the_prompt_budget_take_one_call(main, fake_model):
+    text = contract_text()
+    document_id, document = create(main, text)
+
+    analysis = main.run_analysis(document_id, document)
+
+    assert len(text) < main.ANALYSIS_CHUNK_THRESHOLD
+    assert fake_model.calls == 1
+    assert len(analysis['section_hashes']) > 1
+
+
+def test_edited_revision_only_sends_changed_units(main, fake_model, monkeypatch):
+    # Fan out at the revision unit size so the changed units are the changed chunks
+    monkeypatch.setattr(main, 'ANALYSIS_CHUNK_THRESHOLD', 1000)
+    monkeypatch.setattr(main, 'ANALYSIS_CHUNK_SIZE', main.REVISION_SECTION_CHARS)
+    text = contract_text()
+    base_id, base = create(main, text)
+    main.run_analysis(base_id, base)
+    calls = fake_model.calls
+
+    edited = text.replace('Section 6\n', 'Section 6\nA new opening line for this section.\n', 1)
+    revision_id, revision = revise(main, base_id, base, edited)
+    analysis = main.run_analysis(revision_id, revision)
+
+    sections = analysis['revision_diff']['sections']
+    assert 1 <= sections['changed'] < sections['total']
+    # The changed units, plus the summary pass unless the unit summaries came out the same
+    assert sections['changed'] <= fake_model.calls - calls <= sections['changed'] + 1
+
+
+def test_revision_of_analysis_without_section_hashes(main, fake_model):
+    text = contract_text()
+    base_id, base = create(main, text)
+    analysis = main.run_analysis(base_id, base)
+    legacy = {key: value for key, value in analysis.items() if key != 'section_hashes'}
+    main.repo.save_analysis(base_id, legacy, {})
+
+    revision_id, revision = revise(main, base_id, base, text)
+    sections = main.run_analysis(revision_id, revision)['revision_diff']['sections']
+
+    assert sections['unchanged'] == sections['total']
@@ -0,0 +1,67 @@
+import re
+import uuid
+
+import pytest
+
+from search_index import InvalidQueryError, SearchIndex, build_match
+
+HOSTILE_QUERIES = [
+    'rent OR *',
+    'title:rent',
+    'NEAR(rent deposit)',
+    '"unterminated phrase',
+    '-deposit ^rent',
+    'rent" OR user_id : "other',
+    '{title text} : rent',
+]
+
+
+def test_words_and_phrases_become_quoted_terms():
+    assert build_match('user-1', 'late "security deposit"') == (
+        'user_id : "user 1" AND {title text summary key_terms clauses risks} : ("late" AND "security deposit")'
+    )
+
+
+@pytest.mark.parametrize('query', HOSTILE_QUERIES)
+def test_query_syntax_is_never_interpreted(query):
+    match = build_match('user-1', query)
+    terms = match.split(' : (', 1)[1]
+
+    # Only quoted runs of words joined by AND remain; a quoted OR is just a word
+    assert re.fullmatch(r'"\w+( \w+)*"( AND "\w+( \w+)*")*\)', terms)
+
+
+@pytest.mark.parametrize('query', ['', '   ', '*', '"" -', '^:()'])
+def test_queries_without_words_are_refused(query):
+    with pytest.raises(InvalidQueryError):
+        build_match('user-1', query)
+
+
+@pytest.mark.parametrize('query', HOSTILE_QUERIES)
+def test_hostile_queries_only_search_the_users_documents(query):
+    index = SearchIndex(':memory:')
+    for user_id in ('user-1', 'other'):
+        index.index_document(f'{user_id}-lease', {'user_id': user_id, 'title': 'Lease'}, 'rent deposit title near')
+
+    results, _ = index.search('user-1', query)
+
+    assert {result['document_id'] for result in results} <= {'user-1-lease'}
+
+
+def test_reindex_backfills_stored_documents_without_analyzing(main, fake_model, tmp_path, monkeypatch):
+    import batch
+
+    monkeypatch.setattr(main, 'text_index', SearchIndex(':memory:'))
+    monkeypatch.setattr(main, 'search_index', main.text_index)
+    user_id = uuid.uuid4().hex
+    document = main.new_document({'id': user_id}, 'lease.pdf', 'pdf', {})
+    document_id = main.repo.create_document(document, 'The tenant forfeits the security deposit.')
+    analysis = main.analysis_record(document_id, document, {'plain_summary': 'A strict landlord.'})
+    main.repo.save_analysis(document_id, analysis, main.analyzed_document_fields(analysis))
+
+    assert batch.main_cli(['--query', '--reindex', '--checkpoint', str(tmp_path / 'reindex.checkpoint')]) == 0
+
+    assert fake_model.calls == 0
+    for query in ('deposit', 'landlord'):
+        results, _ = main.search_index.search(user_id, query)
+        assert [result['document_id'] for result in results] == [document_id]
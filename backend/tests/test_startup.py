@@ -0,0 +1,71 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from lazy import LazyObject
+
+HEAVY_MODULES = ['pdfplumber', 'PyPDF2', 'PIL', 'pytesseract', 'google.generativeai', 'deep_translator',
+                 'firebase_admin']
+
+
+def run_python(code):
+    """Run ``code`` in a fresh interpreter from backend/ with the test environment; returns its JSON output"""
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', code], cwd=backend, env=os.environ.copy(),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_importing_main_loads_no_heavy_module_or_client():
+    loaded = run_python(
+        "import json, sys, main\n"
+        f"heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]\n"
+        "print(json.dumps({'heavy': heavy, 'clients': [main.repository.loaded, main.model.loaded]}))"
+    )
+
+    assert loaded == {'heavy': [], 'clients': [False, False]}
+
+
+def test_warm_up_loads_the_clients():
+    loaded = run_python(
+        "import json, main\n"
+        "main.warm_up()\n"
+        "print(json.dumps([main.repository.loaded, main.model.loaded, main.text_index.loaded]))"
+    )
+
+    assert loaded == [True, True, True]
+
+
+def test_lazy_object_is_built_once_on_first_use():
+    built = []
+    barrier = threading.Barrier(8)
+
+    def factory():
+        built.append(1)
+        return {'ready': True}
+
+    lazy = LazyObject(factory, 'client')
+    assert not lazy.loaded
+
+    def use():
+        barrier.wait()
+        lazy.get('ready')
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert built == [1]
+    assert lazy.get('ready') is True
+
+
+def test_create_app_builds_independent_apps(main):
+    first, second = main.create_app(), main.create_app()
+
+    assert first is not second
+    assert first.url_map.bind('').match('/api/health', method='GET')[0] == 'api.health_check'
+    assert second.test_client().get('/api/health').status_code == 200
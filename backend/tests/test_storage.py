@@ -0,0 +1,182 @@
+import inspect
+import itertools
+import os
+
+import pytest
+
+import storage
+import text_store
+from storage import AsyncFirestoreRepository, FirestoreRepository, MemoryRepository, Repository
+
+
+class FakeRef:
+    ids = itertools.count()
+
+    def __init__(self, path):
+        self.id = f'{next(self.ids):05d}'
+        self.path = f'{path}/{self.id}'
+
+    def collection(self, name):
+        return FakeCollection(f'{self.path}/{name}')
+
+
+class FakeCollection:
+    def __init__(self, path):
+        self.path = path
+
+    def document(self, document_id=None):
+        ref = FakeRef(self.path)
+        if document_id is not None:
+            ref.id, ref.path = document_id, f'{self.path}/{document_id}'
+        return ref
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.writes = []
+
+    def set(self, ref, data):
+        self.writes.append(('set', ref.path, data))
+
+    def delete(self, ref):
+        self.writes.append(('delete', ref.path, None))
+
+    def commit(self):
+        if len(self.db.committed) == self.db.fail_at:
+            self.db.fail_at = None
+            raise RuntimeError('Request payload size exceeds the limit')
+        self.db.committed.append(self.writes)
+        for action, path, data in self.writes:
+            if action == 'set':
+                self.db.data[path] = data
+            else:
+                self.db.data.pop(path, None)
+
+
+class FakeSnapshot:
+    def __init__(self, ref, data):
+        self.id = ref.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeDB:
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.committed = []
+        self.data = {}
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def get_all(self, refs):
+        return [FakeSnapshot(ref, self.data.get(ref.path)) for ref in refs]
+
+
+def firestore_repository(db):
+    repo = FirestoreRepository.__new__(FirestoreRepository)
+    repo.db = db
+    repo.documents = FakeCollection('documents')
+    return repo
+
+
+def incompressible(size):
+    return os.urandom(size).decode('latin-1')
+
+
+def test_repository_is_abstract():
+    with pytest.raises(TypeError):
+        Repository()
+
+
+@pytest.mark.parametrize('name', sorted(Repository.__abstractmethods__))
+def test_async_firestore_repository_has_every_operation(name):
+    method = getattr(AsyncFirestoreRepository, name, None)
+    assert method is not None
+    # kv_store hands out a store; everything else is a round trip
+    assert inspect.iscoroutinefunction(method) == (name != 'kv_store')
+
+
+def test_memory_repository_scans_across_users():
+    repo = MemoryRepository()
+    ids = [repo.create_document({'user_id': user, 'analyzed': False}, 'text') for user in ('a', 'b', 'a')]
+
+    first = repo.scan_documents([('analyzed', False)], limit=2)
+    rest = repo.scan_documents([('analyzed', False)], limit=2, start_after=first[-1]['id'])
+
+    assert sorted(document['id'] for document in first + rest) == sorted(ids)
+
+
+def test_document_batches_respect_the_byte_budget(monkeypatch):
+    monkeypatch.setattr(storage, 'FIRESTORE_BATCH_BYTES', 3 * 1024 * 1024)
+    db = FakeDB()
+    items = [({'user_id': 'a'}, incompressible(1024 * 1024)) for _ in range(5)]
+
+    ids = firestore_repository(db).create_documents(items)
+
+    assert len(ids) == 5
+    # Each text compresses to about 1 MiB, so three or more batches
+    assert len(db.committed) >= 3
+    for writes in db.committed:
+        payload = sum(len(data['data']) for _, _, data in writes if 'data' in data)
+        assert payload <= storage.FIRESTORE_BATCH_BYTES
+
+
+def test_document_batches_respect_the_write_limit(monkeypatch):
+    monkeypatch.setattr(storage, 'FIRESTORE_BATCH_WRITES', 10)
+    db = FakeDB()
+
+    ids = firestore_repository(db).create_documents([({'user_id': 'a'}, 'text')] * 12)
+
+    assert len(ids) == 12
+    assert [len(writes) for writes in db.committed] == [10, 10, 4]
+
+
+def test_failed_batch_rolls_back_earlier_documents(monkeypatch):
+    monkeypatch.setattr(storage, 'FIRESTORE_BATCH_WRITES', 4)
+    db = FakeDB(fail_at=2)
+
+    with pytest.raises(RuntimeError):
+        firestore_repository(db).create_documents([({'user_id': 'a'}, 'text')] * 6)
+
+    # Two batches of two documents landed, then were deleted again
+    assert len(db.committed) == 4
+    assert db.data == {}
+
+
+def test_text_is_stored_compressed_in_chunks_outside_the_document(monkeypatch):
+    monkeypatch.setattr(text_store, 'TEXT_CHUNK_BYTES', 1024)
+    db = FakeDB()
+    repo = firestore_repository(db)
+    text = incompressible(5000)
+
+    document_id = repo.create_document({'user_id': 'a'}, text)
+
+    document = db.data[f'documents/{document_id}']
+    assert 'text' not in document
+    assert document['text_length'] == len(text)
+    chunks = [data for path, data in db.data.items() if path.startswith(f'documents/{document_id}/text_chunks/')]
+    assert len(chunks) == document['text_chunks'] > 1
+    assert all(len(chunk['data']) <= 1024 for chunk in chunks)
+    assert repo.load_text(document_id, document) == text
+
+
+def test_documents_with_inline_text_still_load():
+    repo = firestore_repository(FakeDB())
+
+    assert repo.load_text('legacy', {'user_id': 'a', 'text': 'Stored before chunking.'}) == 'Stored before chunking.'
+    assert repo.load_text('empty', {'user_id': 'a'}) == ''
+
+
+def test_memory_repository_lists_documents_without_their_text():
+    repo = MemoryRepository()
+    document_id = repo.create_document({'user_id': 'a', 'title': 'Lease'}, 'The tenant pays rent.')
+
+    listed, = repo.list_documents('a', ['title', 'user_id'], limit=10)
+
+    assert 'text' not in listed
+    assert repo.load_text(document_id, repo.get_document(document_id)) == 'The tenant pays rent.'
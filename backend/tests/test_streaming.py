@@ -0,0 +1,89 @@
+import json
+import threading
+import uuid
+
+from fakes import FakeGeminiModel
+from streaming import AnalysisStreamParser
+
+ANALYSIS = {
+    'plain_summary': 'Rent is due on the 1st, "no exceptions" {really}, [see 2].',
+    'key_terms': [
+        {'term': 'Deposit', 'explanation': 'Held, then returned \\ minus damage'},
+        {'term': 'Lease, term', 'explanation': 'One year'},
+    ],
+    'important_clauses': [],
+    'risks_and_concerns': [{'risk': 'Late fee', 'explanation': 'Nested', 'details': {'amounts': [50, 75]}}],
+    'unclear_items': ['Who pays for \u00e9lectricit\u00e9?', 'Repairs]'],
+}
+
+
+def events_of(stream):
+    events = []
+    for message in stream:
+        kind, data = message.strip().split('\n', 1)
+        events.append((kind.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+    return events
+
+
+def parsed(pieces):
+    parser = AnalysisStreamParser()
+    return [event for piece in pieces for event in parser.feed(piece)]
+
+
+def test_parser_emits_every_field_and_item_in_order():
+    text = "```json\n" + json.dumps(ANALYSIS, indent=2) + "\n```"
+
+    events = parsed([text])
+
+    assert [event[1:] for event in events if event[0] == 'section'] == list(ANALYSIS.items())
+    items = [event[1:] for event in events if event[0] == 'item']
+    assert items == [
+        (section, index, value)
+        for section, values in ANALYSIS.items() if isinstance(values, list)
+        for index, value in enumerate(values)
+    ]
+
+
+def test_parser_gives_the_same_events_however_the_text_is_split():
+    text = json.dumps(ANALYSIS)
+
+    # One character at a time, in uneven pieces and all at once
+    assert parsed(text) == parsed([text[:37], text[37:120], text[120:]]) == parsed([text])
+
+
+def test_parser_ignores_what_follows_the_object():
+    text = json.dumps({'plain_summary': 'Done'}) + ' {"plain_summary": "again"}'
+
+    assert parsed([text]) == [('section', 'plain_summary', 'Done')]
+
+
+def test_parser_skips_fragments_it_cannot_parse():
+    events = parsed(['{"plain_summary": nonsense, "unclear_items": ["ok", oops]}'])
+
+    assert events == [('item', 'unclear_items', 0, 'ok')]
+
+
+def test_concurrent_streams_share_one_model_call(main, monkeypatch):
+    model = FakeGeminiModel(latency=0.3)
+    monkeypatch.setattr(main, 'model', model)
+    document = main.new_document({'id': 'stream-user'}, 'lease.pdf', 'pdf', {})
+    document_id = main.repo.create_document(document, f"The tenant pays rent monthly. {uuid.uuid4().hex}")
+    document = main.repo.get_document(document_id)
+
+    results = [None, None]
+
+    def read(index):
+        results[index] = events_of(main.stream_analysis_events(document_id, document))
+
+    threads = [threading.Thread(target=read, args=(index,)) for index in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert model.calls == 1
+    for events in results:
+        sections = {data['section'] for kind, data in events if kind == 'section'}
+        assert sections == set(main.ANALYSIS_FIELDS)
+        assert events[-1][0] == 'done'
+    assert results[0][-1][1]['plain_summary'] == results[1][-1][1]['plain_summary']
@@ -0,0 +1,145 @@
+import json
+
+from storage import MemoryStore
+from translation import FakeTranslatorBackend, TranslationService, translate_analysis
+
+
+class RecordingBackend(FakeTranslatorBackend):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def translate_batch(self, texts, target_lang):
+        self.batches.append(list(texts))
+        return super().translate_batch(texts, target_lang)
+
+
+ANALYSIS = {
+    'plain_summary': 'The tenant pays rent every month.',
+    'key_terms': [
+        {'term': 'Rent', 'explanation': 'Money paid for the home'},
+        {'term': 'Deposit', 'explanation': 'Money paid for the home'},
+    ],
+    'important_clauses': [{'clause': 'Rent', 'explanation': 'Due on the first', 'section': '2'}],
+    'risks_and_concerns': [],
+    'unclear_items': ['Who pays for repairs'],
+}
+
+
+def create_legacy_analysis(main):
+    """A document analyzed before analyses carried a version"""
+    document = main.new_document({'id': 'translation-user'}, 'lease.pdf', 'pdf', {})
+    document_id = main.repo.create_document(document, 'The tenant pays rent monthly.')
+    analysis = {
+        'plain_summary': 'The tenant pays rent every month.',
+        'key_terms': [{'term': 'Rent', 'explanation': 'Money paid for the home'}],
+        'important_clauses': [],
+        'risks_and_concerns': [{'risk': 'Late fees', 'explanation': 'Paying late costs extra'}],
+        'unclear_items': ['Who pays for repairs'],
+    }
+    main.repo.save_analysis(document_id, analysis, {'analyzed': True})
+    return document_id
+
+
+def test_unversioned_analysis_is_translated_once(main, monkeypatch):
+    document_id = create_legacy_analysis(main)
+    built = []
+    build = main.build_translated_analysis
+    monkeypatch.setattr(main, 'build_translated_analysis', lambda *args: built.append(args) or build(*args))
+
+    first = main.get_translated_analysis(document_id, 'es')
+    second = main.get_translated_analysis(document_id, 'es')
+
+    assert len(built) == 1
+    assert second == first
+    assert first['analysis_version'] == main.analysis_version(main.repo.get_analysis(document_id))
+
+
+def test_stale_translation_is_rebuilt(main, monkeypatch):
+    document_id = create_legacy_analysis(main)
+    main.get_translated_analysis(document_id, 'es')
+    analysis = main.repo.get_analysis(document_id)
+    analysis['plain_summary'] = 'A revised summary'
+    main.repo.save_analysis(document_id, analysis, {})
+
+    translation = main.get_translated_analysis(document_id, 'es')
+
+    assert translation['analysis_version'] == main.analysis_version(analysis)
+
+
+def test_analysis_strings_are_translated_once_each_in_batches():
+    backend = RecordingBackend()
+    service = TranslationService(backend, batch_chars=40)
+
+    translated = translate_analysis(ANALYSIS, 'es', service)
+
+    sent = [text for batch in backend.batches for text in batch]
+    assert sorted(sent) == sorted(set(sent))
+    assert 'Money paid for the home' in sent and 'Rent' in sent
+    assert len(backend.batches) > 1
+    assert all(sum(len(text) + 1 for text in batch) <= 40 or len(batch) == 1 for batch in backend.batches)
+    assert translated['key_terms'][1] == {'term': '[es] Deposit', 'explanation': '[es] Money paid for the home'}
+    assert translated['important_clauses'][0]['clause'] == '[es] Rent'
+
+
+def test_translations_are_reused_from_memory_and_the_store():
+    store = MemoryStore()
+    first = TranslationService(RecordingBackend(), store=store)
+    translate_analysis(ANALYSIS, 'es', first)
+    translate_analysis(ANALYSIS, 'es', first)
+    assert first.backend.calls == 1
+
+    # Another worker with an empty memory tier answers from the shared store
+    second = TranslationService(RecordingBackend(), store=store)
+    assert translate_analysis(ANALYSIS, 'es', second) == translate_analysis(ANALYSIS, 'es', first)
+    assert second.backend.calls == 0
+
+    translate_analysis(ANALYSIS, 'fr', second)
+    assert second.backend.calls == 1
+
+
+def long_text(edited=None):
+    paragraphs = [f"Paragraph {number} says the tenant keeps the garden tidy. " * 6 for number in range(12)]
+    if edited is not None:
+        paragraphs[edited] += "The landlord pays for the hedge."
+    return '\n\n'.join(paragraphs)
+
+
+def test_long_text_is_translated_in_chunks_and_reassembled_in_order():
+    backend = RecordingBackend()
+    service = TranslationService(backend, batch_chars=1000)
+    text = long_text()
+
+    translated = service.translate_text(text, 'es')
+
+    assert len(backend.batches) > 1
+    assert all(len(batch) == 1 and len(batch[0]) <= 1000 for batch in backend.batches)
+    # The fake backend prefixes each chunk, so the output is the input with one marker per chunk
+    assert translated.replace('[es] ', '') == text
+
+
+def test_an_edited_text_only_sends_the_changed_chunk():
+    backend = RecordingBackend()
+    service = TranslationService(backend, batch_chars=1000)
+    service.translate_text(long_text(), 'es')
+    sent = len(backend.batches)
+
+    service.translate_text(long_text(edited=5), 'es')
+
+    assert len(backend.batches) == sent + 1
+    assert 'hedge' in backend.batches[-1][0]
+
+
+def test_translation_streams_chunks_as_events(main, client, monkeypatch):
+    monkeypatch.setattr(main, 'translation_service', TranslationService(FakeTranslatorBackend(), batch_chars=1000))
+    text = long_text()
+
+    response = client.post('/api/translate', json={'text': text, 'target_lang': 'es'},
+                           headers={'Accept': 'text/event-stream'})
+
+    events = [json.loads(line[len('data: '):]) for line in response.get_data(as_text=True).splitlines()
+              if line.startswith('data: ')]
+    chunks, done = events[:-1], events[-1]
+    assert [chunk['index'] for chunk in chunks] == list(range(len(chunks)))
+    assert done == {'target_lang': 'es', 'chunks': len(chunks)}
+    assert ''.join(chunk['text'] for chunk in chunks).replace('[es] ', '') == text
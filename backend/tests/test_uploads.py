@@ -0,0 +1,148 @@
+import io
+import multiprocessing
+import time
+import zipfile
+
+import pytest
+
+import bulk_upload
+from bulk_upload import BulkUploadError, Spooler
+from resumable_upload import OffsetMismatchError, UploadSessions
+
+
+@pytest.fixture(autouse=True)
+def sessions(main, monkeypatch, tmp_path):
+    sessions = UploadSessions(str(tmp_path))
+    monkeypatch.setattr(main, 'upload_sessions', sessions)
+    return sessions
+
+
+def uploaded(client, body):
+    upload_id = client.post('/api/uploads', json={'filename': 'lease.pdf', 'size': len(body)}).get_json()['upload_id']
+    response = client.put(f'/api/uploads/{upload_id}', data=body, headers={'Upload-Offset': '0'})
+    assert response.status_code == 200
+    return upload_id
+
+
+def test_failed_completion_keeps_the_upload(main, client, monkeypatch):
+    upload_id = uploaded(client, b'%PDF-1.4 lease')
+
+    def broken(path, filename):
+        raise RuntimeError('OCR pool crashed')
+
+    monkeypatch.setattr(main, 'extract_file_text', broken)
+    assert client.post(f'/api/uploads/{upload_id}/complete').status_code == 400
+    session = client.get(f'/api/uploads/{upload_id}').get_json()
+    assert session['offset'] == session['size']
+
+    monkeypatch.setattr(main, 'extract_file_text', lambda path, filename: ('The tenant pays rent monthly.', 'pdf'))
+    assert client.post(f'/api/uploads/{upload_id}/complete').status_code == 201
+    assert client.get(f'/api/uploads/{upload_id}').status_code == 404
+
+
+def archive(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zip_file:
+        for name, body in members.items():
+            zip_file.writestr(name, body)
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.fixture
+def extracted(main, monkeypatch):
+    monkeypatch.setattr(main, 'extract_file_text', lambda path, filename: (f'The text of {filename}, in full.', 'pdf'))
+
+
+def test_bulk_upload_reports_every_file(main, client, extracted):
+    bundle = archive({
+        'leases/lease.pdf': b'%PDF-1.4 lease',
+        'leases/notes.txt': b'notes',
+        'leases/older.zip': b'PK',
+        '__MACOSX/leases/._lease.pdf': b'',
+    })
+    response = client.post('/api/upload/bulk', data={'files': [
+        (io.BytesIO(b'%PDF-1.4 offer'), 'offer.pdf'),
+        (bundle, 'bundle.zip'),
+        (io.BytesIO(b'not a zip'), 'broken.zip'),
+    ]})
+
+    assert response.status_code == 201
+    body = response.get_json()
+    results = {result['filename']: result for result in body['results']}
+    assert (body['created'], body['failed']) == (2, 3)
+    assert set(results) == {
+        'offer.pdf', 'bundle.zip/leases/lease.pdf', 'bundle.zip/leases/notes.txt',
+        'bundle.zip/leases/older.zip', 'broken.zip',
+    }
+    assert results['bundle.zip/leases/notes.txt']['error'].endswith('Unsupported file format')
+    assert results['bundle.zip/leases/older.zip']['error'].endswith('Nested archives are not supported')
+    assert results['broken.zip']['error'].endswith('Not a valid ZIP archive')
+
+    document = main.repo.get_document(results['bundle.zip/leases/lease.pdf']['document_id'])
+    assert document['user_id'] == client.user_id
+    assert document['filename'] == 'lease.pdf'
+    assert main.repo.load_text(document['id'], document) == 'The text of bundle.zip/leases/lease.pdf, in full.'
+
+
+def test_bulk_upload_without_usable_files_creates_nothing(main, client, extracted):
+    response = client.post('/api/upload/bulk', data={'files': [(io.BytesIO(b'notes'), 'notes.txt')]})
+
+    assert response.status_code == 400
+    assert response.get_json()['created'] == 0
+    assert client.get('/api/documents').get_json()['documents'] == []
+
+
+def test_bulk_upload_failed_write_creates_nothing(main, client, extracted, monkeypatch):
+    def failed(items):
+        raise RuntimeError('Request payload size exceeds the limit')
+
+    monkeypatch.setattr(main.repo, 'create_documents', failed)
+    response = client.post('/api/upload/bulk', data={'files': [(io.BytesIO(b'%PDF-1.4 offer'), 'offer.pdf')]})
+
+    assert response.status_code == 500
+    assert client.get('/api/documents').get_json()['documents'] == []
+
+
+def test_spooler_caps_the_file_count(tmp_path):
+    spooler = Spooler(str(tmp_path), ('.pdf',), max_files=2)
+    bundle = archive({f'{index}.pdf': b'%PDF-1.4' for index in range(3)})
+
+    with pytest.raises(BulkUploadError):
+        spooler._add_archive(bundle, 'bundle.zip')
+
+
+def test_spooler_rejects_oversized_members(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_upload, 'BULK_UPLOAD_MAX_FILE_BYTES', 4)
+    spooler = Spooler(str(tmp_path), ('.pdf',))
+
+    spooler._add_archive(archive({'large.pdf': b'%PDF-1.4', 'small.pdf': b'%PDF'}), 'bundle.zip')
+
+    large, small = spooler.entries
+    assert 'path' not in large and large['error'].startswith('File is larger than')
+    assert open(small['path'], 'rb').read() == b'%PDF'
+
+
+def hold_completing(sessions, upload_id, user_id, held, seconds):
+    with sessions.completing(upload_id, user_id):
+        held.set()
+        time.sleep(seconds)
+
+
+def test_upload_lock_holds_across_processes(sessions):
+    session = sessions.create('user', 'lease.pdf', 4)
+    sessions.write_chunk(session['upload_id'], 'user', 0, io.BytesIO(b'%PDF'))
+
+    context = multiprocessing.get_context('fork')
+    held = context.Event()
+    worker = context.Process(target=hold_completing, args=(sessions, session['upload_id'], 'user', held, 0.5))
+    worker.start()
+    assert held.wait(5)
+
+    started = time.monotonic()
+    with pytest.raises(OffsetMismatchError):
+        sessions.write_chunk(session['upload_id'], 'user', 0, io.BytesIO(b'%PDF'))
+    waited = time.monotonic() - started
+    worker.join()
+
+    assert waited > 0.3
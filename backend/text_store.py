@@ -0,0 +1,92 @@
+import os
+import zlib
+
+# Firestore documents are capped at 1 MiB, so compressed text is split into
+# chunk documents well under that
+TEXT_CHUNK_BYTES = int(os.getenv('TEXT_CHUNK_BYTES', str(512 * 1024)))
+TEXT_COMPRESSION_LEVEL = int(os.getenv('TEXT_COMPRESSION_LEVEL', '6'))
+
+TEXT_STORAGE_CHUNKED = 'zlib-chunked'
+
+
+def text_chunks_collection(doc_ref):
+    return doc_ref.collection('text_chunks')
+
+
+def _chunk_id(index):
+    return f"{index:05d}"
+
+
+def prepare_text(text):
+    """Compress and split the text; returns (chunks, metadata fields to store on the document)"""
+    compressed = zlib.compress(text.encode('utf-8'), TEXT_COMPRESSION_LEVEL)
+    chunks = [
+        compressed[start:start + TEXT_CHUNK_BYTES]
+        for start in range(0, len(compressed), TEXT_CHUNK_BYTES)
+    ] or [b'']
+
+    return chunks, {
+        'text_storage': TEXT_STORAGE_CHUNKED,
+        'text_chunks': len(chunks),
+        'text_length': len(text),
+        'text_compressed_bytes': len(compressed),
+    }
+
+
+def write_chunks(batch, doc_ref, chunks):
+    collection = text_chunks_collection(doc_ref)
+    for index, chunk in enumerate(chunks):
+        batch.set(collection.document(_chunk_id(index)), {'index': index, 'data': chunk})
+
+
+def store_text(batch, doc_ref, text):
+    """Queue the compressed text chunks on ``batch``; returns the metadata fields to store on the document"""
+    chunks, fields = prepare_text(text)
+    write_chunks(batch, doc_ref, chunks)
+    return fields
+
+
+def _chunk_refs(doc_ref, document):
+    collection = text_chunks_collection(doc_ref)
+    return [collection.document(_chunk_id(index)) for index in range(document.get('text_chunks', 0))]
+
+
+def _join_chunks(refs, snapshots):
+    snapshots = {snapshot.id: snapshot for snapshot in snapshots}
+    compressed = b''.join(
+        bytes(snapshots[ref.id].to_dict()['data'])
+        for ref in refs
+        if ref.id in snapshots and snapshots[ref.id].exists
+    )
+    return zlib.decompress(compressed).decode('utf-8') if compressed else ''
+
+
+def load_text(db, doc_ref, document):
+    """Return the document's text, whether it is stored inline (older documents) or chunked"""
+    if 'text' in document:
+        return document['text']
+
+    if document.get('text_storage') != TEXT_STORAGE_CHUNKED:
+        return ''
+
+    refs = _chunk_refs(doc_ref, document)
+    return _join_chunks(refs, db.get_all(refs))
+
+
+async def load_text_async(db, doc_ref, document):
+    """load_text for the async Firestore client"""
+    if 'text' in document:
+        return document['text']
+
+    if document.get('text_storage') != TEXT_STORAGE_CHUNKED:
+        return ''
+
+    refs = _chunk_refs(doc_ref, document)
+    return _join_chunks(refs, [snapshot async for snapshot in db.get_all(refs)])
+
+
+def delete_text(batch, doc_ref, document):
+    """Queue deletion of the document's text chunks on ``batch``"""
+    collection = text_chunks_collection(doc_ref)
+    for index in range(document.get('text_chunks', 0)):
+        batch.delete(collection.document(_chunk_id(index)))
@@ -0,0 +1,246 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from cache import TieredCache
+from chunking import split_for_translation
+
+TRANSLATOR_BACKEND = os.getenv('TRANSLATOR_BACKEND', 'google')
+TRANSLATION_CONCURRENCY = int(os.getenv('TRANSLATION_CONCURRENCY', '8'))
+# Google's web endpoint rejects requests over 5000 characters
+TRANSLATION_BATCH_CHARS = int(os.getenv('TRANSLATION_BATCH_CHARS', '4500'))
+TRANSLATION_CACHE_SIZE = int(os.getenv('TRANSLATION_CACHE_SIZE', '4096'))
+
+BATCH_SEPARATOR = '\n'
+
+translation_strings = metrics.registry.counter(
+    'translation_strings_total', 'Distinct strings translated, by whether the cache or the backend answered'
+)
+
+
+class GoogleTranslatorBackend:
+    """deep-translator's GoogleTranslator, packing several strings into one request.
+
+    Single-line strings are joined with newlines and sent as one text; the
+    answer is split back on newlines. If the line count does not survive the
+    round-trip the batch is retried one string per request.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _translator(self, target_lang):
+        from deep_translator import GoogleTranslator
+
+        translators = getattr(self._local, 'translators', None)
+        if translators is None:
+            translators = self._local.translators = {}
+        if target_lang not in translators:
+            translators[target_lang] = GoogleTranslator(source='auto', target=target_lang)
+        return translators[target_lang]
+
+    def translate_batch(self, texts, target_lang):
+        translator = self._translator(target_lang)
+
+        if len(texts) > 1 and not any(BATCH_SEPARATOR in text for text in texts):
+            translated = translator.translate(BATCH_SEPARATOR.join(texts)) or ''
+            parts = translated.split(BATCH_SEPARATOR)
+            if len(parts) == len(texts):
+                return [part.strip() for part in parts]
+
+        return [translator.translate(text) for text in texts]
+
+
+class FakeTranslatorBackend:
+    """Deterministic local translator for tests and benchmarks"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def translate_batch(self, texts, target_lang):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [f"[{target_lang}] {text}" for text in texts]
+
+
+def create_backend(name=TRANSLATOR_BACKEND):
+    if name == 'fake':
+        return FakeTranslatorBackend(latency=float(os.getenv('FAKE_TRANSLATOR_LATENCY', '0')))
+    return GoogleTranslatorBackend()
+
+
+def translation_key(text, target_lang):
+    return f"{target_lang}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+
+class TranslationService:
+    """Deduplicating, batching and caching front end for a translator backend"""
+
+    def __init__(self, backend, store=None, max_workers=TRANSLATION_CONCURRENCY,
+                 batch_chars=TRANSLATION_BATCH_CHARS, cache_size=TRANSLATION_CACHE_SIZE):
+        self.backend = backend
+        self.batch_chars = batch_chars
+        self.cache = TieredCache(store=store, max_size=cache_size)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='translate')
+
+    def _lookup(self, texts, target_lang):
+        """Split the distinct non-empty strings into ({text: cached translation}, [uncached texts])"""
+        translations = {}
+        pending = []
+
+        for text in dict.fromkeys(t for t in texts if t and t.strip()):
+            cached = self.cache.get(translation_key(text, target_lang))
+            if cached is not None:
+                translations[text] = cached
+            else:
+                pending.append(text)
+
+        translation_strings.inc(len(translations), source='cache')
+        translation_strings.inc(len(pending), source='backend')
+        return translations, pending
+
+    def _submit(self, batch, target_lang):
+        return self._executor.submit(metrics.propagate(self._translate_batch), batch, target_lang)
+
+    def _store(self, text, translated, target_lang):
+        translated = translated or text
+        self.cache.set(translation_key(text, target_lang), translated)
+        return translated
+
+    def translate_many(self, texts, target_lang):
+        """Translate every distinct non-empty string once; returns {text: translation}"""
+        translations, pending = self._lookup(texts, target_lang)
+
+        batches = list(self._batches(pending))
+        futures = [self._submit(batch, target_lang) for batch in batches]
+        for batch, future in zip(batches, futures):
+            for text, translated in zip(batch, future.result()):
+                translations[text] = self._store(text, translated, target_lang)
+
+        return translations
+
+    def translate_chunks(self, text, target_lang):
+        """Translate long text in chunks, yielding each translated chunk in order as soon as it is ready.
+
+        The text is split on paragraph, line and sentence breaks into chunks
+        under the backend's request limit, which are translated concurrently
+        and cached one by one, so translating an edited text again only sends
+        the chunks that changed. Whitespace around each chunk is kept as it
+        was, so the chunks join up into the whole translation.
+        """
+        chunks = []
+        for chunk in split_for_translation(text or '', self.batch_chars):
+            core = chunk.strip()
+            start = chunk.index(core) if core else len(chunk)
+            chunks.append((chunk[:start], core, chunk[start + len(core):]))
+
+        translations, pending = self._lookup([core for _, core, _ in chunks], target_lang)
+        futures = {core: self._submit([core], target_lang) for core in pending}
+        try:
+            for lead, core, trail in chunks:
+                if core in futures:
+                    translations[core] = self._store(core, futures.pop(core).result()[0], target_lang)
+                yield lead + translations.get(core, core) + trail
+        finally:
+            # The caller stopped reading (a closed stream); drop what has not started
+            for future in futures.values():
+                future.cancel()
+
+    def translate_text(self, text, target_lang):
+        """Translate text of any length; see translate_chunks"""
+        return ''.join(self.translate_chunks(text, target_lang))
+
+    def _translate_batch(self, batch, target_lang):
+        started = time.perf_counter()
+        with metrics.timed('translate_batch'):
+            translated = self.backend.translate_batch(batch, target_lang)
+
+        per_string = (time.perf_counter() - started) / len(batch)
+        for _ in batch:
+            metrics.stage_seconds.observe(per_string, stage='translate_string')
+        return translated
+
+    def translate(self, text, target_lang):
+        if not text:
+            return text
+        return self.translate_many([text], target_lang).get(text, text)
+
+    def _batches(self, texts):
+        batch = []
+        size = 0
+        for text in texts:
+            if batch and size + len(text) + len(BATCH_SEPARATOR) > self.batch_chars:
+                yield batch
+                batch = []
+                size = 0
+            batch.append(text)
+            size += len(text) + len(BATCH_SEPARATOR)
+        if batch:
+            yield batch
+
+
+def _analysis_strings(analysis):
+    yield analysis.get('plain_summary')
+    for term in analysis.get('key_terms') or []:
+        yield term.get('term')
+        yield term.get('explanation')
+    for clause in analysis.get('important_clauses') or []:
+        yield clause.get('clause')
+        yield clause.get('explanation')
+        yield clause.get('section')
+    for risk in analysis.get('risks_and_concerns') or []:
+        yield risk.get('risk')
+        yield risk.get('explanation')
+    for item in analysis.get('unclear_items') or []:
+        yield item
+
+
+def translate_analysis(analysis, target_lang, service):
+    """Translate every user-facing field of an analysis in one batched pass"""
+    translations = service.translate_many(list(_analysis_strings(analysis)), target_lang)
+
+    def tr(text):
+        if not text:
+            return ''
+        return translations.get(text, text)
+
+    translated_analysis = {}
+
+    if analysis.get('plain_summary'):
+        translated_analysis['plain_summary'] = tr(analysis['plain_summary'])
+
+    if analysis.get('key_terms'):
+        translated_analysis['key_terms'] = [
+            {'term': tr(term.get('term', '')), 'explanation': tr(term.get('explanation', ''))}
+            for term in analysis['key_terms']
+        ]
+
+    if analysis.get('important_clauses'):
+        translated_analysis['important_clauses'] = [
+            {
+                'clause': tr(clause.get('clause', '')),
+                'explanation': tr(clause.get('explanation', '')),
+                'section': tr(clause.get('section', ''))
+            }
+            for clause in analysis['important_clauses']
+        ]
+
+    if analysis.get('risks_and_concerns'):
+        translated_analysis['risks_and_concerns'] = [
+            {'risk': tr(risk.get('risk', '')), 'explanation': tr(risk.get('explanation', ''))}
+            for risk in analysis['risks_and_concerns']
+        ]
+
+    if analysis.get('unclear_items'):
+        translated_analysis['unclear_items'] = [tr(item) for item in analysis['unclear_items']]
+
+    translated_analysis['title'] = analysis.get('title', '')
+    translated_analysis['analyzed_at'] = analysis.get('analyzed_at', '')
+    translated_analysis['document_id'] = analysis.get('document_id', '')
+
+    return translated_analysis
@@ -6,6 +6,7 @@ export const ENDPOINTS = {
   VERIFY: '/auth/verify',
   
   UPLOAD: '/upload',
+  UPLOADS: '/uploads',
   DOCUMENTS: '/documents',
   ANALYZE: '/analyze',
   
@@ -13,3 +14,6 @@ export const ENDPOINTS = {
   TRANSLATE_ANALYSIS: '/translate-analysis',
   LANGUAGES: '/languages',
 };
+
+// Files larger than this are sent in resumable chunks
+export const RESUMABLE_UPLOAD_MIN_BYTES = 5 * 1024 * 1024;
@@ -16,12 +16,15 @@ export default function DocumentsScreen({ navigation, onDocumentSelect }) {
   const [documents, setDocuments] = useState([]);
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const fetchDocuments = async () => {
     try {
       const data = await apiService.getDocuments();
       console.log('Documents fetched:', data);
       setDocuments(data.documents || []);
+      setNextCursor(data.next_cursor || null);
     } catch (error) {
       console.error('Error fetching documents:', error);
       console.error('Error response:', error.response?.data);
@@ -45,6 +48,22 @@ export default function DocumentsScreen({ navigation, onDocumentSelect }) {
     fetchDocuments();
   }, []);
 
+  const fetchMoreDocuments = async () => {
+    if (!nextCursor || loadingMore) {
+      return;
+    }
+    setLoadingMore(true);
+    try {
+      const data = await apiService.getDocuments(nextCursor);
+      setDocuments((current) => [...current, ...(data.documents || [])]);
+      setNextCursor(data.next_cursor || null);
+    } catch (error) {
+      console.error('Error fetching more documents:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const onRefresh = useCallback(() => {
     setRefreshing(true);
     fetchDocuments();
@@ -138,6 +157,11 @@ export default function DocumentsScreen({ navigation, onDocumentSelect }) {
         renderItem={renderDocument}
         keyExtractor={(item) => item._id}
         contentContainerStyle={styles.listContainer}
+        onEndReached={fetchMoreDocuments}
+        onEndReachedThreshold={0.5}
+        ListFooterComponent={
+          loadingMore ? <ActivityIndicator style={styles.footerLoader} color="#00838d" /> : null
+        }
         refreshControl={
           <RefreshControl
             refreshing={refreshing}
@@ -185,6 +209,9 @@ const styles = StyleSheet.create({
   listContainer: {
     padding: 16,
   },
+  footerLoader: {
+    marginVertical: 16,
+  },
   documentCard: {
     backgroundColor: '#fff',
     borderRadius: 12,
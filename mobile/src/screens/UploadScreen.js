@@ -12,12 +12,14 @@ import {
 import * as DocumentPicker from 'expo-document-picker';
 import * as ImagePicker from 'expo-image-picker';
 import { apiService } from '../services/apiService';
+import { RESUMABLE_UPLOAD_MIN_BYTES } from '../config/api';
 
 export default function UploadScreen({ navigation, onDocumentUploaded }) {
   const [title, setTitle] = useState('');
   const [type, setType] = useState('general');
   const [selectedFile, setSelectedFile] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [progress, setProgress] = useState(null);
 
   const pickDocument = async () => {
     try {
@@ -109,11 +111,19 @@ export default function UploadScreen({ navigation, onDocumentUploaded }) {
 
     setLoading(true);
     try {
-      const data = await apiService.uploadDocument(
-        selectedFile,
-        title || selectedFile.name,
-        type
-      );
+      const data =
+        (selectedFile.size || 0) > RESUMABLE_UPLOAD_MIN_BYTES
+          ? await apiService.uploadDocumentResumable(
+              selectedFile,
+              title || selectedFile.name,
+              type,
+              setProgress
+            )
+          : await apiService.uploadDocument(
+              selectedFile,
+              title || selectedFile.name,
+              type
+            );
       Alert.alert('Success', 'Document uploaded successfully!');
       setTitle('');
       setType('general');
@@ -129,6 +139,7 @@ export default function UploadScreen({ navigation, onDocumentUploaded }) {
       );
     } finally {
       setLoading(false);
+      setProgress(null);
     }
   };
 
@@ -245,6 +256,14 @@ export default function UploadScreen({ navigation, onDocumentUploaded }) {
             <Text style={styles.buttonText}>Upload & Analyze Document</Text>
           )}
         </TouchableOpacity>
+
+        {progress !== null && (
+          <Text style={styles.progressText}>
+            {progress < 1
+              ? `Uploading... ${Math.round(progress * 100)}%`
+              : 'Extracting text...'}
+          </Text>
+        )}
       </View>
     </ScrollView>
   );
@@ -393,4 +412,10 @@ const styles = StyleSheet.create({
     fontSize: 16,
     fontWeight: '600',
   },
+  progressText: {
+    fontSize: 14,
+    color: '#00838d',
+    textAlign: 'center',
+    marginTop: 8,
+  },
 });
@@ -1,4 +1,5 @@
 import axios from 'axios';
+import { File } from 'expo-file-system';
 import { API_URL, ENDPOINTS } from '../config/api';
 import { authService } from './authService';
 
@@ -80,8 +81,64 @@ export const apiService = {
     return response.data;
   },
 
-  async getDocuments() {
-    const response = await apiClient.get(ENDPOINTS.DOCUMENTS);
+  // Sends the file in chunks and resumes from the server's offset after a
+  // network error, so a dropped connection only repeats the chunk in flight
+  async uploadDocumentResumable(file, title, type, onProgress) {
+    const source = new File(file.uri);
+    const size = file.size || source.size;
+    const { data: session } = await apiClient.post(ENDPOINTS.UPLOADS, {
+      filename: file.name || 'document.pdf',
+      size,
+      title,
+      type,
+    });
+    const uploadUrl = `${ENDPOINTS.UPLOADS}/${session.upload_id}`;
+
+    let offset = session.offset;
+    let failures = 0;
+    const handle = source.open();
+    try {
+      while (offset < size) {
+        handle.offset = offset;
+        const chunk = handle.readBytes(Math.min(session.chunk_size, size - offset));
+        try {
+          const response = await apiClient.put(uploadUrl, chunk, {
+            headers: {
+              'Content-Type': 'application/octet-stream',
+              'Upload-Offset': String(offset),
+            },
+          });
+          offset = response.data.offset;
+          failures = 0;
+          if (onProgress) {
+            onProgress(offset / size);
+          }
+        } catch (error) {
+          if (error.response?.status === 409) {
+            offset = error.response.data.offset;
+            continue;
+          }
+          if (error.response || ++failures > 5) {
+            throw error;
+          }
+          await new Promise((resolve) => setTimeout(resolve, 1000 * 2 ** failures));
+          const status = await apiClient.get(uploadUrl);
+          offset = status.data.offset;
+        }
+      }
+    } finally {
+      handle.close();
+    }
+
+    const response = await apiClient.post(`${uploadUrl}/complete`);
+    return response.data;
+  },
+
+  // One page of documents, newest first; pass the previous page's next_cursor for the next one
+  async getDocuments(cursor = null) {
+    const response = await apiClient.get(ENDPOINTS.DOCUMENTS, {
+      params: cursor ? { cursor } : {},
+    });
     return response.data;
   },
 
@@ -8,6 +8,7 @@ import Login from './components/Login';
 function App() {
   const [view, setView] = useState('upload');
   const [documents, setDocuments] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [selectedDocument, setSelectedDocument] = useState(null);
   const [analysis, setAnalysis] = useState(null);
   const [loading, setLoading] = useState(false);
@@ -61,22 +62,29 @@ function App() {
     setIsAuthenticated(false);
     setView('upload');
     setDocuments([]);
+    setNextCursor(null);
     setSelectedDocument(null);
     setAnalysis(null);
   };
 
-  const fetchDocuments = async () => {
+  // Pass the previous page's next_cursor to append the page after it
+  const fetchDocuments = async (cursor = null) => {
     try {
-      const response = await fetch(`${API_URL}/documents`, {
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await fetch(`${API_URL}/documents${query}`, {
         headers: {
           'Authorization': `Bearer ${token}`
         }
       });
       const data = await response.json();
-      setDocuments(data.documents || []);
+      const page = data.documents || [];
+      setDocuments((current) => (cursor ? [...current, ...page] : page));
+      setNextCursor(data.next_cursor || null);
     } catch (error) {
       console.error('Error fetching documents:', error);
-      setDocuments([]);
+      if (!cursor) {
+        setDocuments([]);
+      }
     }
   };
 
@@ -224,6 +232,7 @@ function App() {
             documents={documents}
             onDocumentSelect={handleDocumentSelect}
             onDeleteDocument={handleDeleteDocument}
+            onLoadMore={nextCursor ? () => fetchDocuments(nextCursor) : null}
           />
         )}
         
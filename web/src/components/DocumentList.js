@@ -1,7 +1,7 @@
 import React from 'react';
 import './DocumentList.css';
 
-function DocumentList({ documents, onDocumentSelect, onDeleteDocument }) {
+function DocumentList({ documents, onDocumentSelect, onDeleteDocument, onLoadMore }) {
   const formatDate = (dateString) => {
     const date = new Date(dateString);
     return date.toLocaleDateString('en-US', {
@@ -84,6 +84,14 @@ function DocumentList({ documents, onDocumentSelect, onDeleteDocument }) {
             </div>
           ))}
         </div>
+
+        {onLoadMore && (
+          <div className="load-more">
+            <button className="btn btn-secondary" onClick={onLoadMore}>
+              Load more
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );